@@ -0,0 +1,310 @@
+"""Micro-benchmarks of harness hot paths with committed baselines
+
+Examples:
+    python benchmark.py                          # compare with benchmark_baseline.json
+    python benchmark.py --sizes 100MB 2GB        # larger fixtures
+    python benchmark.py --update-baseline        # store current results as the baseline
+
+The baseline holds absolute throughput of the machine it was recorded on;
+comparison is refused on a machine with another CPU, CPU count or Python
+(--ignore-machine compares anyway).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common.dataset import parse_size
+from config import CONFIG
+
+BASELINE_PATH = "benchmark_baseline.json"
+FIXTURES_DIR = "./benchmark_fixtures"
+
+LOGIN_PAGE = (
+    "<html><head><title>Sign in</title></head><body>"
+    + "<div class=\"decor\"></div>" * 200
+    + "<form id=\"kc-form-login\" onsubmit=\"login.disabled = true; return true;\" "
+      "action=\"https://auth.example.com/realms/main/login-actions/authenticate?"
+      "session_code=abc&amp;execution=def&amp;client_id=superset&amp;tab_id=xyz\" method=\"post\">"
+      "<input name=\"username\"/><input name=\"password\" type=\"password\"/></form></body></html>"
+)
+
+
+def generate_fixture(size):
+    """CSV with the upload_columns header of about the given size, cached between runs"""
+    path = os.path.join(FIXTURES_DIR, f"fixture_{size}.csv")
+    target = parse_size(size)
+    if os.path.exists(path) and os.path.getsize(path) >= target:
+        return path
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    rng = random.Random(42)
+    columns = [column["column_name"] for column in CONFIG.get("upload_columns", [])] or ["case_id", "activity"]
+    start = datetime(2024, 1, 1)
+    rows = []
+    for index in range(10_000):
+        timestamp = start + timedelta(minutes=index * 7)
+        values = {
+            "case_id": str(index // 8 + 1),
+            "timestamp_start": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "timestamp_end": (timestamp + timedelta(minutes=rng.randint(1, 90))).strftime("%Y-%m-%d %H:%M:%S"),
+            "activity": rng.choice(["Регистрация", "Проверка", "Согласование", "Оплата", "Закрытие"]),
+        }
+        rows.append(",".join(values.get(column, str(rng.randint(0, 100000))) for column in columns))
+    block = ("\n".join(rows) + "\n").encode("utf-8")
+
+    with open(path, "wb") as file:
+        file.write((",".join(columns) + "\n").encode("utf-8"))
+        written = 0
+        while written < target:
+            file.write(block)
+            written += len(block)
+    return path
+
+
+def measure(function, repeats):
+    """Best wall time of several runs"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def throughput(function, megabytes):
+    return lambda repeats: {"value": megabytes / measure(function, repeats), "unit": "MB/s"}
+
+
+def operations(function, count):
+    def run():
+        for _ in range(count):
+            function()
+
+    return lambda repeats: {"value": count / measure(run, repeats), "unit": "ops/s"}
+
+
+def csv_benchmarks(sizes):
+    from common.csv_utils import count_chunks, count_csv_lines, split_csv_generator
+    from common.transforms import case_id_prefix_transform
+
+    benchmarks = {}
+    chunk_size = CONFIG.get("chunk_size", 4 * 1024 * 1024)
+    for size in sizes:
+        path = generate_fixture(size)
+        megabytes = os.path.getsize(path) / 1024 ** 2
+
+        def consume(path=path):
+            for _ in split_csv_generator(path, chunk_size):
+                pass
+
+        benchmarks[f"split_csv_generator[{size}]"] = throughput(consume, megabytes)
+        benchmarks[f"count_chunks[{size}]"] = throughput(lambda path=path: count_chunks(path, chunk_size), megabytes)
+        benchmarks[f"count_csv_lines[{size}]"] = throughput(lambda path=path: count_csv_lines(path), megabytes)
+
+        def prefix_case_ids(path=path, transform=case_id_prefix_transform(1234)):
+            for chunk in split_csv_generator(path, chunk_size):
+                transform(chunk)
+
+        benchmarks[f"split + case_id prefix[{size}]"] = throughput(prefix_case_ids, megabytes)
+    return benchmarks
+
+
+def api_benchmarks():
+    from locust.env import Environment
+
+    from common.api import Api, ServiceUser
+
+    # Запросы не отправляются: замеряем только код харнесса
+    api = Api(ServiceUser(Environment()))
+    api.username = "benchmark_user"
+    api.session_id = "1234"
+    api.user_iteration_count = 1
+    api.max_user_iterations = 10
+    api._retry_request = lambda *args, **kwargs: None
+
+    def in_log_sandbox(benchmark, log_verbose):
+        """Run with log_verbose in a temporary ./logs, console output discarded"""
+
+        def run(repeats):
+            saved_verbose, working_dir, stdout = CONFIG.get("log_verbose"), os.getcwd(), sys.stdout
+            with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+                os.chdir(directory)
+                os.makedirs("logs")
+                CONFIG["log_verbose"] = log_verbose
+                sys.stdout = devnull
+                try:
+                    return benchmark(repeats)
+                finally:
+                    sys.stdout = stdout
+                    CONFIG["log_verbose"] = saved_verbose
+                    os.chdir(working_dir)
+
+        return run
+
+    return {
+        "Api.log[quiet]": in_log_sandbox(operations(lambda: api.log("Chunk 1/10 uploaded"), 2_000_000), False),
+        "Api.log[verbose]": in_log_sandbox(operations(lambda: api.log("Chunk 1/10 uploaded"), 20_000), True),
+        "Api._start_pm_flow": in_log_sandbox(operations(
+            lambda: api._start_pm_flow(1, "conn", "schema", "storage", "compute", "Tube_1"), 20_000
+        ), True),
+        "Api._update_flow": operations(
+            lambda: api._update_flow(1, "Tube_1", "conn", "schema", count_chunks_val=10), 20_000
+        ),
+    }
+
+
+def auth_benchmarks():
+    from common.auth import extract_login_form
+
+    return {
+        "extract_login_form": operations(lambda: extract_login_form(LOGIN_PAGE, "user", "password"), 50_000),
+    }
+
+
+def metrics_benchmarks():
+    from common.metrics import CHUNK_UPLOADS, REQUEST_COUNT, REQUEST_DURATION
+
+    def update():
+        REQUEST_DURATION.labels(method="POST", endpoint="Upload chunk 1").observe(0.05)
+        REQUEST_COUNT.labels(method="POST", endpoint="Upload chunk 1", status=200).inc()
+        CHUNK_UPLOADS.labels(flow_id="1", status="success").inc()
+
+    return {"metrics label updates": operations(update, 100_000)}
+
+
+def collect_benchmarks(sizes):
+    """Benchmark name -> function(repeats) returning {"value", "unit"}"""
+    benchmarks = csv_benchmarks(sizes)
+    for group in (api_benchmarks, auth_benchmarks, metrics_benchmarks):
+        try:
+            benchmarks.update(group())
+        except ImportError as error:
+            print(f"Skipping {group.__name__}: {error}")
+    return benchmarks
+
+
+def run_benchmarks(benchmarks, repeats, baseline=None, tolerance=0.0, confirm_runs=0):
+    """
+    Run every benchmark; a result below the baseline tolerance is re-measured
+    up to confirm_runs times and the best value is kept, so one noisy run
+    does not fail the suite.
+    """
+    results = {}
+    for name, benchmark in benchmarks.items():
+        result = benchmark(repeats)
+        expected = (baseline or {}).get("results", {}).get(name)
+        for _ in range(confirm_runs):
+            if not expected or result["value"] >= expected["value"] * (1 - tolerance):
+                break
+            retry = benchmark(repeats)
+            if retry["value"] > result["value"]:
+                result = retry
+        results[name] = result
+    return results
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "processor": platform.processor(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "platform": platform.platform(),
+    }
+
+
+def machine_differences(recorded, current):
+    """["key: baseline X, here Y"] for the properties that change absolute throughput"""
+    differences = []
+    for key in ("processor", "machine", "cpu_count", "python"):
+        expected, actual = recorded.get(key), current.get(key)
+        if key == "python":
+            # Патч-версия Python на скорость не влияет
+            expected = ".".join(str(expected).split(".")[:2]) if expected else None
+            actual = ".".join(actual.split(".")[:2])
+        if expected != actual:
+            differences.append(f"{key}: baseline {expected!r}, here {actual!r}")
+    return differences
+
+
+def compare(results, baseline, tolerance):
+    """Print results against the baseline; returns the number of regressions"""
+    regressions = 0
+    print(f"{'benchmark':<36} {'baseline':>14} {'current':>14} {'change':>8}  verdict")
+    for name, result in results.items():
+        expected = baseline.get("results", {}).get(name)
+        current = f"{result['value']:.1f} {result['unit']}"
+        if not expected:
+            print(f"{name:<36} {'-':>14} {current:>14} {'-':>8}  no baseline")
+            continue
+
+        change = result["value"] / expected["value"] - 1
+        verdict = "ok"
+        if change < -tolerance:
+            verdict = "REGRESSION"
+            regressions += 1
+        print(f"{name:<36} {expected['value']:>10.1f} {expected['unit']:<3} {current:>14} {change:>+8.1%}  {verdict}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harness micro-benchmarks")
+    parser.add_argument("--sizes", nargs="*", default=["100MB"], help="CSV fixture sizes, e.g. 100MB 2GB")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per benchmark, the best one counts")
+    parser.add_argument("--tolerance", type=float, help="Allowed throughput drop, baseline value by default")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--confirm-runs", type=int, default=2, help="Re-measurements before flagging a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Store current results as the baseline")
+    parser.add_argument("--ignore-machine", action="store_true",
+                        help="Compare even if the baseline was recorded on another machine")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", 0.15)
+
+    differences = machine_differences(baseline.get("machine", {}), machine_info()) if baseline else []
+    if differences and not args.update_baseline:
+        print(f"Baseline {args.baseline} was recorded on another machine:")
+        for difference in differences:
+            print(f"  {difference}")
+        if not args.ignore_machine:
+            print("Absolute throughput is not comparable: record a baseline here with --update-baseline "
+                  "or pass --ignore-machine")
+            sys.exit(2)
+
+    benchmarks = collect_benchmarks(args.sizes)
+    if args.update_baseline:
+        results = run_benchmarks(benchmarks, args.repeats)
+    else:
+        results = run_benchmarks(benchmarks, args.repeats, baseline, tolerance, args.confirm_runs)
+
+    if args.update_baseline:
+        baseline = {
+            "machine": machine_info(),
+            "tolerance": tolerance,
+            "results": {**baseline.get("results", {}), **results},
+        }
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, ensure_ascii=False)
+            file.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, tolerance)
+    print(f"Verdict: {'REGRESSION' if regressions else 'OK'} ({regressions} regressed, tolerance {tolerance:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Cleanup of objects left on the stand by load test runs
+
+Examples:
+    python cleanup.py --run-id 20250101_120000
+    python cleanup.py --all-runs --dry-run
+    python cleanup.py --sweep "Tube_*" --users user_1 user_2
+"""
+
+import argparse
+
+from locust.env import Environment
+
+from common.cleanup import run_cleanup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete flows, Tube tables and dashboards created by load tests")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--run-id", help="Delete objects of this run from the run ledger")
+    target.add_argument("--all-runs", action="store_true", help="Delete every object of the run ledger")
+    target.add_argument("--sweep", metavar="PATTERN", help="Delete objects whose name matches the glob pattern")
+    parser.add_argument("--users", nargs="*", help="Accounts to sweep, all users from config by default")
+    parser.add_argument("--schemas", nargs="*", help="Schemas to sweep for tables in addition to the ledger ones")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be deleted")
+    args = parser.parse_args()
+
+    environment = Environment()
+    if args.sweep:
+        run_cleanup.sweep(environment, args.sweep, usernames=args.users, schemas=args.schemas, dry_run=args.dry_run)
+    else:
+        run_cleanup.cleanup_run(environment, run_id=args.run_id, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
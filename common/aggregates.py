@@ -0,0 +1,239 @@
+"""Expected aggregates of CSV datasets and their check against the loaded table"""
+
+import csv
+import hashlib
+import io
+import itertools
+import json
+import math
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from common.csv_utils import split_csv_generator
+from common.transforms import get_upload_transform_settings
+from config import CONFIG
+
+# Токены date_format (Java SimpleDateFormat) -> strftime
+STRFTIME_TOKENS = [("yyyy", "%Y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"), ("ss", "%S")]
+
+SQL_FUNCTIONS = {
+    "distinct": 'COUNT(DISTINCT "{}")',
+    "min": 'MIN("{}")',
+    "max": 'MAX("{}")',
+    "sum": 'SUM("{}")',
+}
+
+
+def get_result_validation_settings():
+    return CONFIG.get("result_validation", {})
+
+
+def upload_timezone():
+    """Timezone of the dataset dates: upload_settings.default_timezone when the flow converts dates, else UTC"""
+    settings = CONFIG.get("upload_settings", {})
+    if not settings.get("date_convert", True) or not settings.get("default_timezone"):
+        return timezone.utc
+    return ZoneInfo(settings["default_timezone"])
+
+
+def aggregate_spec(settings=None):
+    """[(function, column)] of the checked aggregates besides COUNT(*)"""
+    settings = settings if settings is not None else get_result_validation_settings()
+    return (
+        [("distinct", column) for column in settings.get("distinct", [])]
+        + [(function, column) for column in settings.get("min_max", []) for function in ("min", "max")]
+        + [("sum", column) for column in settings.get("sum", [])]
+    )
+
+
+def aggregate_name(function, column):
+    """Key of the aggregate in results and its alias in SQL"""
+    return f"{function}_{column}"
+
+
+def spec_hash(spec):
+    """Key of the aggregates in the dataset manifest"""
+    return hashlib.sha1(json.dumps(spec).encode("utf-8")).hexdigest()[:12]
+
+
+def strftime_format(date_format):
+    for token, directive in STRFTIME_TOKENS:
+        date_format = date_format.replace(token, directive)
+    return date_format
+
+
+def parse_number(value):
+    """int or float of a CSV value, None if it is not a number"""
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+
+def parse_numbers(values):
+    """(numbers, count of values that are not numbers); int is the fast path"""
+    try:
+        return list(map(int, values)), 0
+    except ValueError:
+        numbers = [parse_number(value) for value in values]
+        parsed = [number for number in numbers if number is not None]
+        return parsed, len(numbers) - len(parsed)
+
+
+def aggregate_sql(target_schema, table_name, spec):
+    """One query returning COUNT(*) as "count" and every aggregate of spec under its name"""
+    select = ['COUNT(*) AS "count"'] + [
+        f'{SQL_FUNCTIONS[function].format(column)} AS "{aggregate_name(function, column)}"'
+        for function, column in spec
+    ]
+    return f'SELECT {", ".join(select)} FROM "{target_schema}"."{table_name}"'
+
+
+class AggregateAccumulator:
+    """
+    Агрегаты CSV по чанкам:
+    - count, min/max и sum считаются по каждому чанку отдельно, из них
+      собираются ожидаемые значения для любого набора целых чанков
+    - distinct копится множествами по всему файлу
+    - строки разбираются csv.reader, значения обрабатываются по колонкам
+      (zip, map, sum, min, max), без цикла Python по ячейкам
+    - пустые значения пропускаются, как NULL в SQL
+    - числовые колонки разбираются как int или float независимо от
+      column_type; значения, которые не являются числом, считаются
+      в invalid и при проверке дают расхождение
+    """
+
+    def __init__(self, spec, columns=None, delimiter=None):
+        columns = columns if columns is not None else CONFIG.get("upload_columns", [])
+        indexes = {column["column_name"]: index for index, column in enumerate(columns)}
+        numeric = {column["column_name"]: column.get("column_type") in ("int", "float") for column in columns}
+
+        self.delimiter = delimiter or CONFIG.get("upload_settings", {}).get("delimiter", ",")
+        self._aggregates = [
+            (aggregate_name(function, column), function, indexes[column], numeric[column])
+            for function, column in spec
+        ]
+        self._distinct = {name: set() for name, function, _, _ in self._aggregates if function == "distinct"}
+        self.invalid = {name: 0 for name, _, _, _ in self._aggregates}
+
+    def add(self, text, has_header=False):
+        """Aggregates of the rows of text except distinct: {"count", name: value}"""
+        rows = [row for row in csv.reader(io.StringIO(text), delimiter=self.delimiter) if row]
+        if has_header:
+            rows = rows[1:]
+        partial = {"count": len(rows)}
+        columns = list(itertools.zip_longest(*rows, fillvalue=""))
+
+        for name, function, index, is_numeric in self._aggregates:
+            values = list(filter(None, columns[index])) if index < len(columns) else []
+            if is_numeric:
+                values, invalid = parse_numbers(values)
+                self.invalid[name] += invalid
+            if function == "distinct":
+                self._distinct[name].update(values)
+            elif not values:
+                partial[name] = None
+            elif function == "sum":
+                partial[name] = sum(values)
+            else:
+                partial[name] = min(values) if function == "min" else max(values)
+        return partial
+
+    def distinct_counts(self):
+        return {name: len(values) for name, values in self._distinct.items()}
+
+
+def scan_aggregates(file_path, chunk_size=4 * 1024 * 1024, spec=None):
+    """Per-chunk count/min/max/sum and whole-file distinct counts of the CSV in a single pass"""
+    accumulator = AggregateAccumulator(spec if spec is not None else aggregate_spec())
+    chunks = [
+        accumulator.add(chunk["chunk_text"], has_header=chunk["chunk_number"] == 1)
+        for chunk in split_csv_generator(file_path, chunk_size)
+        if chunk
+    ]
+    return {"chunks": chunks, "distinct": accumulator.distinct_counts(), "invalid": accumulator.invalid}
+
+
+def combine(function, values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    if function == "sum":
+        return sum(values)
+    return min(values) if function == "min" else max(values)
+
+
+def expected_aggregates(aggregates, dataset, spec=None):
+    """
+    {name: value} expected in the table after uploading the dataset (with its volume
+    selection); None marks aggregates the upload does not let us predict,
+    {"unparsable": N} those of columns with N values in the dataset that are not numbers
+    """
+    spec = spec if spec is not None else aggregate_spec()
+    chunks = aggregates["chunks"]
+    selection = dataset.get("selection")
+    numbers = selection["numbers"] if selection else range(1, len(chunks) + 1)
+    max_rows = selection.get("max_rows") if selection else None
+
+    # Последний чанк, обрезанный по max_rows, известен только числом строк
+    whole_chunks = max_rows is None or max_rows == sum(chunks[number - 1]["count"] for number in numbers)
+    whole_file = whole_chunks and len(numbers) == len(chunks)
+    # Префикс flow_id меняет значения case_id (первая колонка), но не их число
+    prefixed = None
+    if get_upload_transform_settings().get("case_id_prefix", False) and CONFIG.get("upload_columns"):
+        prefixed = CONFIG["upload_columns"][0]["column_name"]
+
+    expected = {"count": dataset["total_lines"]}
+    for function, column in spec:
+        name = aggregate_name(function, column)
+        if aggregates.get("invalid", {}).get(name):
+            # Значения, не являющиеся числом, в таблице дают NULL или ошибку загрузки
+            expected[name] = {"unparsable": aggregates["invalid"][name]}
+        elif function == "distinct":
+            expected[name] = aggregates["distinct"][name] if whole_file else None
+        elif whole_chunks and column != prefixed:
+            expected[name] = combine(function, (chunks[number - 1][name] for number in numbers))
+        else:
+            expected[name] = None
+    return expected
+
+
+def aggregate_matches(expected, actual, date_format=None, tz=timezone.utc):
+    """Whether the value returned by SQL Lab equals the expected one; epoch dates are shown in tz"""
+    if actual is None:
+        return False
+    try:
+        if isinstance(expected, float):
+            return math.isclose(float(actual), expected, rel_tol=1e-9, abs_tol=1e-6)
+        if isinstance(expected, int):
+            return int(float(actual)) == expected if isinstance(actual, float) else int(actual) == expected
+    except (TypeError, ValueError):
+        return False
+
+    # Даты: SQL Lab отдаёт строку или миллисекунды epoch момента, в который flow
+    # перевёл время датасета из default_timezone
+    if isinstance(actual, (int, float)) and date_format:
+        actual = datetime.fromtimestamp(actual / 1000, tz).strftime(strftime_format(date_format))
+    return str(actual).replace("T", " ")[:len(expected)] == expected
+
+
+def compare_aggregates(expected, actual, columns=None):
+    """["name: table X, expected Y"] for every predicted aggregate that does not match"""
+    columns = columns if columns is not None else CONFIG.get("upload_columns", [])
+    date_formats = {column["column_name"]: column.get("date_format") for column in columns}
+    tz = upload_timezone()
+
+    mismatches = []
+    for name, value in expected.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            mismatches.append(f"{name}: {value['unparsable']} values in the dataset are not numbers")
+            continue
+        column = name.split("_", 1)[1] if "_" in name else None
+        if not aggregate_matches(value, actual.get(name), date_formats.get(column), tz):
+            mismatches.append(f"{name}: table {actual.get(name)!r}, expected {value!r}")
+    return mismatches
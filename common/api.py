@@ -2,15 +2,34 @@
 
 import copy
 import logging
+import random
 import time
 from datetime import datetime
 from urllib.parse import quote
 
-from locust import SequentialTaskSet
-
-from common.csv_utils import split_csv_generator
-from common.managers import FlowManager, stop_manager
+import gevent
+from locust import HttpUser, SequentialTaskSet
+from locust.clients import HttpSession
+
+from common.aggregates import aggregate_spec, aggregate_sql, compare_aggregates, get_result_validation_settings
+from common.arrivals import arrival_scheduler
+from common.auth import authenticate, establish_session, is_session_expired, refresh_session
+from common.chunk_io import read_chunks
+from common.dashboard import DashboardRenderer, dashboard_id_from_url
+from common.dataset import dataset_catalog
+from common.flow_pool import flow_pool
+from common.inflight import inflight_controller
+from common.leasing import credential_leasing
+from common.load_shape import get_load_profile, max_profile_users
+from common.managers import FlowManager, split_users, stop_manager, worker_index
+from common.ratelimit import endpoint_class_for, rate_limiter
+from common.registry import dashboard_registry, run_ledger, table_registry
+from common.results import results_store
+from common.throughput import upload_throughput
+from common.transforms import chunk_transform
 from common.metrics import (
+    ACTIVE_USERS,
+    SESSION_STATUS,
     REQUEST_COUNT,
     REQUEST_DURATION,
     FLOW_CREATIONS,
@@ -19,20 +38,95 @@ from common.metrics import (
     UPLOAD_PROGRESS,
     CHUNK_UPLOAD_DURATION,
     DB_ROW_COUNT,
+    EXPECTED_ROWS,
     COUNT_VALIDATION_RESULT,
+    AGGREGATE_MISMATCHES,
     FLOW_PROCESSING_DURATION,
 )
 from config import CONFIG
 
+# Блок PM flow, артефакты которого содержат URL созданного дашборда
+PM_DASHBOARD_BLOCK_ID = "spm_dashboard_creation_v_0_2[0]"
+
 
 class Api(SequentialTaskSet):
     def __init__(self, parent):
         super().__init__(parent)
+        self.user_id = f"user_{random.randint(10000, 99999)}"
+        self.session_id = f"{random.randint(1000, 9999)}"
+        self.worker_id = 0
         self.username = None
         self.password = None
-        self.session_id = None
+        self.credential_lease_id = None
+        self.user_iteration_count = 0
         self.logged_in = False
         self.session_valid = False
+        self.user_stop_triggered = False
+        self.global_stop_triggered = False
+        self.dataset = None
+        self._flow_client = None
+
+    @property
+    def client(self):
+        """HTTP session of the user, or of the background flow for a _flow_view() copy"""
+        return self._flow_client or self.user.client
+
+    def _flow_view(self):
+        """
+        Copy of the task set for a flow finished in a background greenlet:
+        own HTTP session with the user's cookies and own per-flow attributes
+        (flow_id, dataset), so the user's next iteration does not overwrite them
+        """
+        view = copy.copy(self)
+        user_client = self.user.client
+        client = HttpSession(base_url=user_client.base_url, request_event=user_client.request_event, user=self.user)
+        client.verify = user_client.verify
+        client.cookies.update(user_client.cookies)
+        view._flow_client = client
+        return view
+
+    def establish_session(self):
+        """Establish user session with authentication"""
+        success = establish_session(
+            client=self.client,
+            username=self.username,
+            password=self.password,
+            session_id=self.session_id,
+            log_function=self.log
+        )
+
+        if success:
+            self.logged_in = True
+            self.session_valid = True
+            self.log(f"Authentication successful for {self.username}")
+        else:
+            self.log("Authentication failed", logging.ERROR)
+            self.interrupt()
+
+    def on_start(self):
+        """Lease an account and log in; scenarios extend it with their own setup"""
+        self.worker_id = worker_index(self.user.environment.runner)
+
+        self.credential_lease_id, creds = credential_leasing.acquire()
+        if not creds:
+            self.log("No free account to lease", logging.ERROR)
+            self.interrupt()
+            return
+
+        self.username = creds["username"]
+        self.password = creds["password"]
+        self.client.verify = False
+        self.establish_session()
+
+    def on_stop(self):
+        """Clean up session metrics and release the leased account"""
+        if self.logged_in:
+            ACTIVE_USERS.dec()
+            SESSION_STATUS.labels(username=self.username).set(0)
+
+        credential_leasing.release(self.credential_lease_id)
+        self.credential_lease_id = None
+        self.log(f"User stopping. Completed {self.user_iteration_count} iterations")
 
     def log(self, message, level=logging.INFO):
         """Logging with session context"""
@@ -67,18 +161,33 @@ class Api(SequentialTaskSet):
         except Exception as error:
             print(f"Log file error: {error}")
 
-    def _retry_request(self, method, url, name, **kwargs):
-        """Retry mechanism with timeouts and metrics"""
+    def _retry_request(self, method, url, name, expected_statuses=(), **kwargs):
+        """
+        Retry mechanism with timeouts and metrics.
+        expected_statuses: 4xx codes the caller handles itself, returned as successful responses
+        """
         timeout = kwargs.pop("timeout", CONFIG["request_timeout"])
         start_time = time.time()
+        reauthenticated = False
+        endpoint_class = endpoint_class_for(url)
+        throttled = 0.0
 
         for attempt in range(CONFIG["max_retries"]):
             try:
                 kwargs["timeout"] = timeout
+                # Ожидание лимитера не входит в latency запроса
+                throttled += rate_limiter.throttle(endpoint_class)
                 with method(url, name=name, catch_response=True, **kwargs) as response:
-                    if response.status_code < 400:
+                    if is_session_expired(response) and not reauthenticated:
+                        response.failure("Session expired")
+                        reauthenticated = True
+                        if self._refresh_session():
+                            continue
+
+                    if response.status_code < 400 or response.status_code in expected_statuses:
+                        response.success()
                         # Записываем метрики успешного запроса
-                        duration = time.time() - start_time
+                        duration = time.time() - start_time - throttled
                         REQUEST_DURATION.labels(
                             method=method.__name__.upper(), endpoint=name
                         ).observe(duration)
@@ -132,6 +241,116 @@ class Api(SequentialTaskSet):
         self.log(f"All attempts for {name} failed", logging.ERROR)
         return None
 
+    @classmethod
+    def iteration_limit(cls, user_class):
+        """Iterations per user of the scenario counted in StopManager, None - not counted"""
+        return None
+
+    def _setup_stop_manager(self):
+        """Size StopManager once per process: users of every scenario class with an iteration limit"""
+        environment = self.user.environment
+        if not hasattr(environment, 'stop_manager_initialized'):
+            try:
+                limits = {}
+                for user_class in environment.user_classes:
+                    for task_set in getattr(user_class, "tasks", []):
+                        if isinstance(task_set, type) and issubclass(task_set, Api):
+                            limit = task_set.iteration_limit(user_class)
+                            if limit:
+                                limits[user_class.__name__] = limit
+
+                # На воркере и после разгона Locust знает точное число пользователей каждого класса
+                users = dict(getattr(environment.runner, "target_user_classes_count", None) or {})
+                if not sum(users.values()):
+                    if get_load_profile().get("enabled", False):
+                        total_users = max_profile_users()
+                    else:
+                        total_users = getattr(environment.parsed_options, "num_users", None) or 1
+                    users = split_users(environment.user_classes, total_users)
+
+                total_users = {name: users.get(name, 0) for name in limits}
+                stop_manager.setup_scenario(total_users)
+                environment.stop_manager_initialized = True
+
+                print(f"\n=== TEST CONFIGURATION ===")
+                for name, limit in limits.items():
+                    print(f"{name}: {total_users[name]} users x {limit} iterations")
+                print(f"Total iterations needed: {sum(total_users[name] * limits[name] for name in limits)}")
+                print("==========================\n")
+            except Exception as e:
+                print(f"Error initializing stop manager: {e}")
+                stop_manager.setup_scenario({self.user.__class__.__name__: 1})
+                environment.stop_manager_initialized = True
+
+    def _safe_stop_runner(self, message):
+        """Безопасная остановка runner с защитой от повторных срабатываний"""
+        if self.user_stop_triggered or self.global_stop_triggered:
+            return
+
+        self.global_stop_triggered = True
+        self.log(f"Global stop: {message}")
+
+        runner = self.user.environment.runner
+        if runner and not stop_manager.is_stop_called():
+            stop_manager.set_stop_called()
+            print(f"Test stopped: {message}")
+            # runner.stop() останавливает и greenlet этого пользователя
+            gevent.spawn(runner.stop)
+
+    def _run_admitted(self, iteration, deferred=False):
+        """
+        Run one iteration behind the enabled admission gates
+        (arrival schedule, in-flight jobs target).
+        deferred=True: iteration(release) finishes in the background and
+        calls release() itself when it is over.
+        Returns False when the arrival schedule is over.
+        """
+        arrival = arrival_scheduler.enabled
+        if arrival and not arrival_scheduler.admit():
+            return False
+
+        admission = inflight_controller.admit() if inflight_controller.enabled else None
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            if admission is not None:
+                inflight_controller.release(admission)
+            if arrival:
+                arrival_scheduler.complete()
+
+        try:
+            if deferred:
+                iteration(release)
+            else:
+                iteration()
+        except BaseException:
+            release()
+            raise
+        if not deferred:
+            release()
+        return True
+
+    def _record_phase(self, phase, duration, success=True):
+        """Store a phase timing of this scenario in the run results store; never raises"""
+        try:
+            results_store.record(type(self).__name__, phase, duration, success)
+        except Exception as e:
+            self.log(f"Phase timing {phase} dropped: {e}", logging.WARNING)
+
+    def _refresh_session(self):
+        """Re-authenticate after the server rejected the shared session"""
+        self.log("Session expired, re-authenticating", logging.WARNING)
+        self.session_valid = refresh_session(
+            self.client, self.username, self.password, log_function=self.log
+        )
+        if not self.session_valid:
+            self.log("Re-authentication failed", logging.ERROR)
+        return self.session_valid
+
     def _get_user_database_id(self):
         """Get user's database ID by username pattern"""
         resp = self._retry_request(
@@ -182,6 +401,7 @@ class Api(SequentialTaskSet):
 
         new_flow_id = resp.json().get("id")
         FLOW_CREATIONS.labels(status="success").inc()
+        run_ledger.record("flow", new_flow_id, name=flow_name, username=self.username)
         return flow_name, new_flow_id
 
     def _get_dag_import_params(self, flow_id):
@@ -217,13 +437,14 @@ class Api(SequentialTaskSet):
         """Update flow configuration"""
         update_data = copy.deepcopy(CONFIG["flow_template"])
         update_data["label"] = flow_name
+        upload_settings = CONFIG.get("upload_settings", {})
         update_data["config_inactive"]["blocks"] = [
             {
                 "block_id": CONFIG["block"]["block_id"],
                 "config": {
-                    "date_convert": True,
-                    "default_timezone": "Europe/Moscow",
-                    "delimiter": ",",
+                    "date_convert": upload_settings.get("date_convert", True),
+                    "default_timezone": upload_settings.get("default_timezone", "Europe/Moscow"),
+                    "delimiter": upload_settings.get("delimiter", ","),
                     "encoding": "UTF-8",
                     "file_type": "CSV",
                     "if_exists": "replace",
@@ -259,16 +480,115 @@ class Api(SequentialTaskSet):
             timeout=20,
         )
 
-    def _upload_chunks(self, flow_id, db_id, target_schema, total_chunks):
-        """Upload CSV chunks to server with progress tracking"""
+    def _choose_dataset(self):
+        """Draw the dataset of the next upload from the dataset pool"""
+        self.dataset = dataset_catalog.choose()
+        self.total_chunks = self.dataset["total_chunks"]
+        self.total_lines = self.dataset["total_lines"]
+        return self.dataset
+
+    def _prepare_upload_flow(self, total_chunks):
+        """Ready-configured flow for a file upload: leased from the flow pool or created now"""
+        flow = flow_pool.acquire(self.username)
+        if flow:
+            self.log(f"Flow leased from pool: {flow['flow_name']} (ID: {flow['flow_id']})")
+            return flow if self._set_flow_chunks(flow, total_chunks) else None
+        return self._provision_upload_flow(total_chunks, getattr(self, "worker_id", 0))
+
+    def _set_flow_chunks(self, flow, total_chunks):
+        """
+        Point count_chunks of a ready flow at the upload about to start:
+        pooled and reused flows were configured for another dataset or slice.
+        Updates the flow only when the count differs.
+        """
+        if flow.get("count_chunks") == total_chunks:
+            return True
+
+        update_resp = self._update_flow(
+            flow["flow_id"],
+            flow["flow_name"],
+            flow["target_connection"],
+            flow["target_schema"],
+            file_uploaded=False,
+            count_chunks_val=total_chunks,
+        )
+        if not update_resp or not update_resp.ok:
+            self.log(f"Failed to set count_chunks of flow {flow['flow_id']}", logging.ERROR)
+            return False
+
+        flow["count_chunks"] = total_chunks
+        return True
+
+    def _provision_upload_flow(self, total_chunks, worker_id=0, db_id=None):
+        """
+        Шаги 1-4: создание flow, параметры DAG, обновление flow перед загрузкой
+        и id БД пользователя. Возвращает параметры flow или None.
+        """
+        # 1. Создание flow
+        flow_name, flow_id = self._create_flow(worker_id=worker_id)
+        if not flow_id:
+            self.log("Failed to create flow", logging.ERROR)
+            return None
+
+        self.log(f"Flow created: {flow_name} (ID: {flow_id})")
+
+        # 2. Получение параметров DAG
+        target_connection, target_schema = self._get_dag_import_params(flow_id)
+        if not target_connection or not target_schema:
+            self.log("Missing DAG parameters", logging.ERROR)
+            return None
+
+        # 3. Обновление flow перед загрузкой
+        update_resp = self._update_flow(
+            flow_id,
+            flow_name,
+            target_connection,
+            target_schema,
+            file_uploaded=False,
+            count_chunks_val=total_chunks,
+        )
+        if not update_resp or not update_resp.ok:
+            self.log("Failed to update flow before upload", logging.ERROR)
+            return None
+
+        # 4. Получение ID базы данных пользователя
+        db_id = db_id or self._get_user_database_id()
+        if not db_id:
+            self.log("User database not found", logging.ERROR)
+            return None
+
+        # Таблица Tube_<id> появится при загрузке файла в этот flow
+        run_ledger.record(
+            "table", f"{target_schema}.Tube_{flow_id}",
+            name=f"Tube_{flow_id}", schema=target_schema, db_id=db_id, username=self.username,
+        )
+
+        return {
+            "username": self.username,
+            "flow_name": flow_name,
+            "flow_id": flow_id,
+            "target_connection": target_connection,
+            "target_schema": target_schema,
+            "db_id": db_id,
+            "count_chunks": total_chunks,
+        }
+
+    def _upload_chunks(self, flow_id, db_id, target_schema, total_chunks, chunks=None):
+        """Upload CSV chunks (whole dataset by default) to server with progress tracking"""
         uploaded_chunks = 0
         chunk_timeout = 30
 
+        if chunks is None:
+            dataset = self.dataset or {}
+            chunks = read_chunks(
+                dataset.get("path"), transform=chunk_transform(flow_id, dataset), selection=dataset.get("selection")
+            )
+
         # Увеличиваем счетчик активных загрузок
         CHUNKS_IN_PROGRESS.inc()
 
         try:
-            for chunk in split_csv_generator(CONFIG["csv_file_path"], CONFIG["chunk_size"]):
+            for chunk in chunks:
                 if not chunk or not chunk["chunk_text"]:
                     continue
 
@@ -305,23 +625,7 @@ class Api(SequentialTaskSet):
                         )
 
                         if resp and resp.ok:
-                            uploaded_chunks += 1
                             success = True
-
-                            # Записываем метрики успешной загрузки
-                            chunk_duration = time.time() - chunk_start_time
-                            CHUNK_UPLOAD_DURATION.observe(chunk_duration)
-                            CHUNK_UPLOADS.labels(
-                                flow_id=str(flow_id), status="success"
-                            ).inc()
-
-                            # Обновляем прогресс
-                            progress = (uploaded_chunks / total_chunks) * 100
-                            UPLOAD_PROGRESS.labels(flow_id=str(flow_id)).set(progress)
-
-                            self.log(
-                                f"Chunk {chunk['chunk_number']}/{total_chunks} uploaded"
-                            )
                             break
 
                     except Exception as e:
@@ -336,7 +640,26 @@ class Api(SequentialTaskSet):
                     if not success and attempt < CONFIG["max_retries"] - 1:
                         time.sleep(CONFIG["retry_delay"] * (attempt + 1))
 
-                if not success:
+                chunk_duration = time.time() - chunk_start_time
+                self._record_phase("chunk_upload", chunk_duration, success)
+                if success:
+                    uploaded_chunks += 1
+
+                    # Записываем метрики успешной загрузки
+                    CHUNK_UPLOAD_DURATION.observe(chunk_duration)
+                    upload_throughput.add(chunk["size_bytes"])
+                    CHUNK_UPLOADS.labels(
+                        flow_id=str(flow_id), status="success"
+                    ).inc()
+
+                    # Обновляем прогресс
+                    progress = (uploaded_chunks / total_chunks) * 100
+                    UPLOAD_PROGRESS.labels(flow_id=str(flow_id)).set(progress)
+
+                    self.log(
+                        f"Chunk {chunk['chunk_number']}/{total_chunks} uploaded"
+                    )
+                else:
                     self.log(
                         f"Failed to upload chunk {chunk['chunk_number']} "
                         f"after {CONFIG['max_retries']} attempts",
@@ -433,11 +756,24 @@ class Api(SequentialTaskSet):
             self.log("No run_id in response", logging.ERROR)
             return None
 
+        inflight_controller.job_started(run_id, "file")
         return run_id
 
     def _monitor_processing_status(self, run_id, timeout, flow_id, db_id=None, target_schema=None,
-                                   total_lines=None, flow_processing_start=None, is_pm_flow=None):
+                                   total_lines=None, flow_processing_start=None, is_pm_flow=None, dataset=None):
         """Universal method to monitor processing status with auto-detection"""
+        try:
+            return self._poll_processing_status(
+                run_id, timeout, flow_id, db_id, target_schema,
+                total_lines, flow_processing_start, is_pm_flow, dataset
+            )
+        finally:
+            # Мониторинг окончен (успех, ошибка или таймаут) - run больше не считаем в полёте
+            inflight_controller.job_finished(run_id)
+
+    def _poll_processing_status(self, run_id, timeout, flow_id, db_id=None, target_schema=None,
+                                total_lines=None, flow_processing_start=None, is_pm_flow=None, dataset=None):
+        """Poll file or PM run status until success, failure or timeout"""
 
         # Автоматически определяем тип потока если не указан явно
         if is_pm_flow is None:
@@ -525,7 +861,7 @@ class Api(SequentialTaskSet):
 
                     if not is_pm_flow and db_id and target_schema and total_lines is not None:
                         validation_result = self._validate_row_count(
-                            db_id, target_schema, flow_id, total_lines
+                            db_id, target_schema, flow_id, total_lines, dataset
                         )
 
                         if flow_processing_start:
@@ -533,6 +869,17 @@ class Api(SequentialTaskSet):
                             FLOW_PROCESSING_DURATION.labels(flow_id=str(flow_id)).observe(total_processing_time)
                             self.log(f"Validation: {'PASS' if validation_result else 'FAIL'}")
 
+                        if validation_result:
+                            # Проверенная таблица годится для PM-only сценария
+                            table_registry.add({
+                                "base_url": CONFIG["api"]["base_url"],
+                                "username": self.username,
+                                "table_name": f"Tube_{flow_id}",
+                                "flow_id": flow_id,
+                                "schema": target_schema,
+                                "rows": total_lines,
+                            })
+
                     # Возвращаем block_run_ids для PM потоков
                     if is_pm_flow:
                         return {"success": True, "block_run_ids": block_run_ids}
@@ -582,10 +929,20 @@ class Api(SequentialTaskSet):
                  logging.ERROR)
         return False
 
-    def _validate_row_count(self, db_id, target_schema, flow_id, expected_rows):
-        """Validate row count in database table"""
+    def _validate_row_count(self, db_id, target_schema, flow_id, expected_rows, dataset=None):
+        """
+        Validate the table loaded from the dataset: row count, and with
+        result_validation.aggregates the other aggregates of one query
+        """
         try:
             self.log(f"Start validating data for the table Tube_{flow_id}")
+            EXPECTED_ROWS.labels(flow_id=str(flow_id)).set(expected_rows)
+
+            expected = {"count": expected_rows}
+            sql = f'SELECT COUNT(*) FROM "{target_schema}"."Tube_{flow_id}"'
+            if dataset and get_result_validation_settings().get("aggregates", False):
+                expected = dict(dataset_catalog.expected_aggregates(dataset), count=expected_rows)
+                sql = aggregate_sql(target_schema, f"Tube_{flow_id}", aggregate_spec())
 
             payload = {
                 "client_id": "",
@@ -593,7 +950,7 @@ class Api(SequentialTaskSet):
                 "json": True,
                 "runAsync": False,
                 "schema": target_schema,
-                "sql": f'SELECT COUNT(*) FROM "{target_schema}"."Tube_{flow_id}"',
+                "sql": sql,
                 "sql_editor_id": "4",
                 "tab": "Locust Validation",
                 "tmp_table_name": "",
@@ -616,18 +973,25 @@ class Api(SequentialTaskSet):
             if resp and resp.status_code == 200:
                 data = resp.json()
                 if data.get("data") and data["data"]:
-                    db_count = data["data"][0].get("count()", 0)
+                    row = data["data"][0]
+                    db_count = row.get("count", row.get("count()", 0))
 
                     # Записываем метрики валидации
                     DB_ROW_COUNT.labels(flow_id=str(flow_id)).set(db_count)
 
-                    validation_success = db_count == expected_rows
+                    mismatches = compare_aggregates(expected, dict(row, count=db_count))
+                    for mismatch in mismatches:
+                        AGGREGATE_MISMATCHES.labels(aggregate=mismatch.split(":", 1)[0]).inc()
+                        self.log(f"Aggregate mismatch in Tube_{flow_id}: {mismatch}", logging.WARNING)
+
+                    validation_success = not mismatches
                     COUNT_VALIDATION_RESULT.labels(flow_id=str(flow_id)).set(
                         1 if validation_success else 0
                     )
 
                     self.log(
-                        f"Rows in DB: {db_count}, expected: {expected_rows}"
+                        f"Rows in DB: {db_count}, expected: {expected_rows}, "
+                        f"aggregates checked: {sum(value is not None for value in expected.values())}"
                     )
                     return validation_success
 
@@ -723,6 +1087,7 @@ class Api(SequentialTaskSet):
 
             new_flow_id = resp.json().get("id")
             FLOW_CREATIONS.labels(status="success").inc()
+            run_ledger.record("flow", new_flow_id, name=flow_name, username=self.username)
             self.log(f"Created PM-only flow: {flow_name} (ID: {new_flow_id})")
             return flow_name, new_flow_id
 
@@ -806,12 +1171,48 @@ class Api(SequentialTaskSet):
                 return None
 
             self.log(f"PM flow {pm_flow_id} started successfully with run_id: {run_id}")
+            inflight_controller.job_started(run_id, "pm")
             return run_id
 
         except Exception as e:
             self.log(f"Error starting PM flow: {str(e)}", logging.ERROR)
             return None
 
+    def _register_pm_dashboard(self, pm_flow_id, pm_run_id, pm_result, table_name):
+        """
+        URL of the dashboard created by a successful PM run, recorded in the
+        dashboards registry and the run ledger; None if it is not found
+        """
+        block_run_id = pm_result.get("block_run_ids", {}).get(PM_DASHBOARD_BLOCK_ID)
+        if not block_run_id:
+            self.log(f"block_run_id not found for block {PM_DASHBOARD_BLOCK_ID}", logging.WARNING)
+            return None
+
+        self.log(f"Fetching dashboard URL for block {PM_DASHBOARD_BLOCK_ID}...")
+        dashboard_url = self._get_dashboard_url_from_artefacts(
+            pm_flow_id=pm_flow_id,
+            block_id=PM_DASHBOARD_BLOCK_ID,
+            block_run_id=block_run_id,
+            run_id=pm_run_id
+        )
+        if not dashboard_url:
+            self.log("Could not retrieve dashboard URL from artefacts", logging.WARNING)
+            return None
+
+        # Дашборд для read-heavy сценариев следующих запусков и для очистки стенда
+        dashboard_registry.add({
+            "base_url": CONFIG["api"]["base_url"],
+            "username": self.username,
+            "dashboard_url": dashboard_url,
+            "pm_flow_id": pm_flow_id,
+            "table_name": table_name,
+        })
+        run_ledger.record(
+            "dashboard", dashboard_id_from_url(dashboard_url),
+            name=dashboard_url, username=self.username,
+        )
+        return dashboard_url
+
     def _get_dashboard_url_from_artefacts(self, pm_flow_id, block_id, block_run_id, run_id):
         """Extracting the dashboard URL from PM flow artifacts."""
 
@@ -882,6 +1283,7 @@ class Api(SequentialTaskSet):
             return False
 
         self.log(f"Opening dashboard: {dashboard_url}")
+        render_start = time.time()
 
         response = self._retry_request(
             self.client.get,
@@ -892,8 +1294,35 @@ class Api(SequentialTaskSet):
 
         if response and response.ok:
             self.log(f"Dashboard loaded successfully: {dashboard_url}")
+            if CONFIG.get("dashboard_render", {}).get("enabled", False):
+                # Как браузер: метаданные и данные всех чартов после HTML
+                return DashboardRenderer(self).render(dashboard_url, render_start)
             return True
         else:
             status = response.status_code if response else 'No response'
             self.log(f"Failed to load dashboard: {status}", logging.ERROR)
-            return False
\ No newline at end of file
+            return False
+
+
+class ServiceUser(HttpUser):
+    """HTTP client of setup and cleanup phases, never spawned by Locust"""
+
+    abstract = True
+    host = CONFIG["api"]["base_url"]
+
+
+def open_api_session(environment, account):
+    """Api with a logged-in client of the account, outside of virtual users; None on failure"""
+    api = Api(ServiceUser(environment))
+    api.username = account["username"]
+    api.password = account["password"]
+    api.session_id = "service"
+    api.client.verify = False
+
+    if not authenticate(api.client, api.username, api.password, log_function=api.log):
+        api.log(f"Authentication failed for {api.username}", logging.ERROR)
+        return None
+
+    api.logged_in = True
+    api.session_valid = True
+    return api
@@ -0,0 +1,149 @@
+"""Open-model arrival-rate scheduling of flow iterations"""
+
+import random
+import threading
+import time
+
+from common.cluster import register_worker_share
+from common.metrics import (
+    ARRIVALS_STARTED,
+    ARRIVALS_IN_FLIGHT,
+    ARRIVAL_LATENESS,
+    ARRIVAL_TARGET_RATE,
+)
+from config import CONFIG
+
+ARRIVAL_RATE_SHARE = "arrival_rate_share"
+
+
+def get_arrival_settings():
+    return CONFIG.get("arrival_model", {})
+
+
+class ArrivalScheduler:
+    """
+    Открытая модель нагрузки:
+    - итерации запускаются по расписанию прибытий (flows/min), а не по
+      завершению предыдущей итерации пользователя
+    - интервалы constant или poisson, rate постоянный или по schedule
+    - rate задаётся на весь кластер, master делит его между workers
+    - пользователи служат пулом исполнителей, max_in_flight ограничивает
+      число одновременных итераций на worker
+    - опоздание = фактический старт минус запланированное время прибытия
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = None
+        self._share = 1.0
+        self._started_at = None
+        self._next_arrival = None
+
+    @property
+    def enabled(self):
+        return get_arrival_settings().get("enabled", False)
+
+    def setup(self, environment):
+        """Register cluster coordination handlers (call from events.init)"""
+        register_worker_share(environment, ARRIVAL_RATE_SHARE, self._on_share)
+        environment.events.test_start.add_listener(self._on_test_start)
+
+        max_in_flight = get_arrival_settings().get("max_in_flight", 0)
+        if max_in_flight:
+            self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def admit(self):
+        """
+        Wait for the next scheduled arrival and a free in-flight slot.
+        Returns False when the schedule is over.
+        """
+        scheduled_at = self._take_arrival()
+        if scheduled_at is None:
+            return False
+
+        delay = scheduled_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+        if self._slots is not None:
+            self._slots.acquire()
+
+        ARRIVAL_LATENESS.observe(max(0.0, time.time() - scheduled_at))
+        ARRIVALS_STARTED.inc()
+        ARRIVALS_IN_FLIGHT.inc()
+        return True
+
+    def complete(self):
+        """Mark an admitted iteration as finished"""
+        ARRIVALS_IN_FLIGHT.dec()
+        if self._slots is not None:
+            self._slots.release()
+
+    def _take_arrival(self):
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.time()
+                self._next_arrival = self._started_at
+
+            scheduled_at = self._next_arrival
+            if scheduled_at is not None:
+                self._next_arrival = self._following_arrival(scheduled_at)
+            return scheduled_at
+
+    def _following_arrival(self, previous):
+        settings = get_arrival_settings()
+        elapsed = previous - self._started_at
+
+        while True:
+            rate, segment_end = self._rate_at(elapsed)
+            if rate is None:
+                return None
+            if rate <= 0:
+                if segment_end is None:
+                    return None
+                elapsed = segment_end
+                continue
+
+            ARRIVAL_TARGET_RATE.set(rate)
+            if settings.get("distribution", "constant") == "poisson":
+                gap = random.expovariate(rate / 60.0)
+            else:
+                gap = 60.0 / rate
+            return self._started_at + elapsed + gap
+
+    def _rate_at(self, elapsed):
+        """Per-worker rate (flows/min) and end of its schedule segment"""
+        settings = get_arrival_settings()
+        schedule = settings.get("schedule")
+        if not schedule:
+            return settings.get("rate", 0) * self._share, None
+
+        segment_end = 0
+        for segment in schedule:
+            segment_end += segment["duration"]
+            if elapsed < segment_end:
+                return segment["rate"] * self._share, segment_end
+        return None, None
+
+    def _on_test_start(self, environment, **kwargs):
+        with self._lock:
+            self._started_at = None
+            self._next_arrival = None
+
+    def _on_share(self, share):
+        with self._lock:
+            self._share = share
+
+
+def arrival_wait_time(closed_wait_time):
+    """Use closed-model wait_time only when the arrival model is off"""
+
+    def wait_time(instance):
+        if arrival_scheduler.enabled:
+            return 0
+        return closed_wait_time(instance)
+
+    return wait_time
+
+
+arrival_scheduler = ArrivalScheduler()
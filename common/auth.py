@@ -1,20 +1,98 @@
 """Authentication helpers"""
 
+import html
+import re
+import threading
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 import time
 import logging
+
+from requests.utils import dict_from_cookiejar
+
 from config import CONFIG
-from common.metrics import AUTH_ATTEMPTS, AUTH_DURATION, SESSION_STATUS, ACTIVE_USERS
+from common.ratelimit import LOGIN, rate_limiter
+from common.metrics import (
+    AUTH_ATTEMPTS,
+    AUTH_DURATION,
+    SESSION_STATUS,
+    ACTIVE_USERS,
+    SESSION_CACHE_LOOKUPS,
+)
+
+# Ищем только первый <form ... action="..."> - DOM страницы логина не строим
+FORM_ACTION_RE = re.compile(
+    r"""<form\b[^>]*?\baction\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""",
+    re.IGNORECASE,
+)
+
+
+class SessionCache:
+    """
+    Кэш авторизованных сессий по аккаунтам:
+    - пользователи одного аккаунта переиспользуют cookies вместо нового логина
+    - сессия считается просроченной по max_age или истёкшим cookie
+    - одновременно логинится только один пользователь аккаунта
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._account_locks = {}
+
+    def account_lock(self, username):
+        with self._lock:
+            if username not in self._account_locks:
+                self._account_locks[username] = threading.Lock()
+            return self._account_locks[username]
+
+    def restore(self, client, username):
+        """Copy a valid cached session into client cookies"""
+        settings = CONFIG.get("session_cache", {})
+        with self._lock:
+            entry = self._sessions.get(username)
+            if entry is None:
+                SESSION_CACHE_LOOKUPS.labels(result="miss").inc()
+                return False
+
+            cookies, created_at = entry
+            expired = (
+                time.time() - created_at > settings.get("max_age", 1800)
+                or any(cookie.is_expired() for cookie in cookies)
+            )
+            if expired:
+                del self._sessions[username]
+                SESSION_CACHE_LOOKUPS.labels(result="expired").inc()
+                return False
+
+            client.cookies.clear()
+            client.cookies.update(cookies)
+            SESSION_CACHE_LOOKUPS.labels(result="hit").inc()
+            return True
+
+    def store(self, username, cookies):
+        with self._lock:
+            self._sessions[username] = (cookies.copy(), time.time())
+
+    def invalidate(self, username, cookies):
+        """Drop the cached session if the client still holds it"""
+        with self._lock:
+            entry = self._sessions.get(username)
+            if entry and dict_from_cookiejar(entry[0]) == dict_from_cookiejar(cookies):
+                del self._sessions[username]
 
 
-def extract_login_form(html, username, password):
+session_cache = SessionCache()
+
+
+def extract_login_form(html_text, username, password):
     """Extract login form data from HTML"""
-    soup = BeautifulSoup(html, features="html.parser")
-    form = soup.find("form")
-    if not form or not form.get("action"):
+    match = FORM_ACTION_RE.search(html_text)
+    if not match:
         return None
-    action_url = urljoin(CONFIG["api"]["base_url"], form["action"])
+    action = html.unescape(next(group for group in match.groups() if group is not None))
+    if not action:
+        return None
+    action_url = urljoin(CONFIG["api"]["base_url"], action)
     return {
         "action": action_url,
         "payload": {
@@ -26,18 +104,73 @@ def extract_login_form(html, username, password):
     }
 
 
+def is_session_expired(response):
+    """Server rejected the session: 401 or API call redirected to login"""
+    if response is None:
+        return False
+    if response.status_code == 401:
+        return True
+    # API не редиректит в нормальном режиме - редирект означает страницу логина
+    return bool(response.history) and "/api/" in response.history[0].request.url
+
+
 def establish_session(client, username, password, session_id, log_function=None):
     """Establish user session with authentication"""
+    if not _authenticate(client, username, password, log_function):
+        SESSION_STATUS.labels(username=username).set(0)
+        return False
+
+    SESSION_STATUS.labels(username=username).set(1)
+    ACTIVE_USERS.inc()
+    return True
+
+
+def authenticate(client, username, password, log_function=None):
+    """Log in a service client: no virtual user metrics (ACTIVE_USERS, SESSION_STATUS)"""
+    return _authenticate(client, username, password, log_function)
+
+
+def refresh_session(client, username, password, log_function=None):
+    """Drop an expired cached session and authenticate again"""
+    session_cache.invalidate(username, client.cookies)
+    return _authenticate(client, username, password, log_function)
+
+
+def _authenticate(client, username, password, log_function=None):
+    """Reuse a cached session of the account or log in and cache it"""
+    if not CONFIG.get("session_cache", {}).get("enabled", True):
+        return _login(client, username, password, log_function)
+
+    if session_cache.restore(client, username):
+        return True
+
+    with session_cache.account_lock(username):
+        # Пока ждали блокировку, другой пользователь мог уже залогиниться
+        if session_cache.restore(client, username):
+            return True
+
+        if not _login(client, username, password, log_function):
+            return False
+
+        session_cache.store(username, client.cookies)
+        return True
+
+
+def _login(client, username, password, log_function=None):
+    """Full login: GET login page, POST credentials, follow redirect"""
     auth_start_time = time.time()
+    # Ожидание лимитера LOGIN не входит в AUTH_DURATION
+    throttled = 0.0
 
     for attempt in range(CONFIG["max_retries"]):
         try:
             client.cookies.clear()
 
             # 1) GET login page
-            resp = _retry_request(
+            resp, waited = _retry_request(
                 client, client.get, "/", "Get login page", timeout=10
             )
+            throttled += waited
             if not resp or resp.status_code != 200:
                 AUTH_ATTEMPTS.labels(username=username, success="false").inc()
                 continue
@@ -48,7 +181,7 @@ def establish_session(client, username, password, session_id, log_function=None)
                 continue
 
             # 2) POST credentials
-            resp = _retry_request(
+            resp, waited = _retry_request(
                 client,
                 client.post,
                 form["action"],
@@ -57,6 +190,7 @@ def establish_session(client, username, password, session_id, log_function=None)
                 allow_redirects=False,
                 timeout=15,
             )
+            throttled += waited
             if not resp or resp.status_code != 302:
                 AUTH_ATTEMPTS.labels(username=username, success="false").inc()
                 continue
@@ -67,21 +201,20 @@ def establish_session(client, username, password, session_id, log_function=None)
                 continue
 
             # 3) Complete redirect
-            resp = _retry_request(
+            resp, waited = _retry_request(
                 client,
                 client.get,
                 urljoin(form["action"], location),
                 "Complete auth redirect",
                 timeout=10,
             )
+            throttled += waited
             if resp and resp.status_code == 200:
 
                 # Записываем метрики успешной аутентификации
-                auth_duration = time.time() - auth_start_time
+                auth_duration = time.time() - auth_start_time - throttled
                 AUTH_DURATION.observe(auth_duration)
                 AUTH_ATTEMPTS.labels(username=username, success="true").inc()
-                SESSION_STATUS.labels(username=username).set(1)
-                ACTIVE_USERS.inc()
 
                 return True
 
@@ -91,25 +224,26 @@ def establish_session(client, username, password, session_id, log_function=None)
             AUTH_ATTEMPTS.labels(username=username, success="false").inc()
             time.sleep(CONFIG["retry_delay"])
 
-    SESSION_STATUS.labels(username=username).set(0)
     return False
 
 
 def _retry_request(client, method, url, name, **kwargs):
-    """Retry mechanism with timeouts (вспомогательная функция)"""
+    """Retry mechanism with timeouts; returns (response or None, seconds waited for the rate limiter)"""
     timeout = kwargs.pop("timeout", CONFIG["request_timeout"])
-    
+    throttled = 0.0
+
     for attempt in range(CONFIG["max_retries"]):
         try:
             kwargs["timeout"] = timeout
+            throttled += rate_limiter.throttle(LOGIN)
             with method(url, name=name, catch_response=True, **kwargs) as response:
                 if response.status_code < 400:
-                    return response
+                    return response, throttled
                 elif 400 <= response.status_code < 500:
-                    return response
+                    return response, throttled
         except Exception as e:
             if attempt < CONFIG["max_retries"] - 1:
                 delay = CONFIG["retry_delay"] * (2 ** attempt)
                 time.sleep(min(delay, 10))
-    
-    return None
\ No newline at end of file
+
+    return None, throttled
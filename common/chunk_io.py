@@ -0,0 +1,125 @@
+"""Chunk reads off the gevent hub and hub stall monitoring"""
+
+import time
+
+import gevent
+
+from common.csv_utils import select_chunks, split_csv_generator
+from common.metrics import CHUNK_READ_WAIT, HUB_BLOCKED_SECONDS, HUB_LOOP_LAG
+from common.page_cache import page_cache_reader
+from config import CONFIG
+
+
+def get_chunk_io_settings():
+    return CONFIG.get("chunk_io", {})
+
+
+def _advance(iterator):
+    """Next item or StopIteration instance; runs in the thread pool"""
+    try:
+        return next(iterator)
+    except StopIteration as stop:
+        return stop
+
+
+def read_ahead(chunks):
+    """
+    Iterate chunks advancing the source iterator in the hub thread pool:
+    chunk N+1 is read while the caller is sending chunk N
+    """
+    threadpool = gevent.get_hub().threadpool
+    iterator = iter(chunks)
+    pending = threadpool.spawn(_advance, iterator)
+    try:
+        while True:
+            wait_start = time.time()
+            chunk = pending.get()
+            CHUNK_READ_WAIT.observe(time.time() - wait_start)
+            pending = None
+            if isinstance(chunk, StopIteration):
+                return
+            pending = threadpool.spawn(_advance, iterator)
+            yield chunk
+    finally:
+        # Генератор-источник нельзя закрыть, пока он читает в потоке:
+        # закрываем после завершения чтения, не блокируя вызывающего
+        close = getattr(iterator, "close", None)
+        if close and pending is not None:
+            pending.rawlink(lambda result: close())
+        elif close:
+            close()
+
+
+def transform_chunks(chunks, transform):
+    """Apply transform(chunk) to every chunk"""
+    try:
+        for chunk in chunks:
+            yield transform(chunk)
+    finally:
+        chunks.close()
+
+
+def read_chunks(file_path=None, chunk_size=None, transform=None, selection=None):
+    """
+    CSV chunks of the dataset, read ahead in a thread unless chunk_io.read_ahead is off.
+    selection (select_chunks arguments) narrows the chunks to a data volume,
+    transform(chunk) runs in the reading thread together with the read.
+    """
+    file_path = file_path or CONFIG["csv_file_path"]
+    chunk_size = chunk_size or CONFIG["chunk_size"]
+    if page_cache_reader.enabled:
+        # Читает блоки в пуле потоков сам, selection и transform выполняются в hub
+        chunks = page_cache_reader.chunks(file_path, chunk_size)
+        if selection:
+            chunks = select_chunks(chunks, **selection)
+        return transform_chunks(chunks, transform) if transform else chunks
+
+    chunks = split_csv_generator(file_path, chunk_size)
+    if selection:
+        chunks = select_chunks(chunks, **selection)
+    if transform:
+        chunks = transform_chunks(chunks, transform)
+    if not get_chunk_io_settings().get("read_ahead", True):
+        return chunks
+    return read_ahead(chunks)
+
+
+class HubMonitor:
+    """
+    Замер блокировок gevent hub: greenlet засыпает на interval и считает,
+    насколько позже он проснулся. Задержка выше threshold - время, когда
+    hub не обслуживал другие greenlets (блокирующий вызов в event loop).
+    """
+
+    def __init__(self):
+        self._greenlet = None
+
+    def setup(self, environment):
+        """Start monitoring for the process lifetime (call from events.init)"""
+        settings = get_chunk_io_settings()
+        threadpool = gevent.get_hub().threadpool
+        threadpool.maxsize = max(threadpool.maxsize, settings.get("read_threads", 16))
+
+        if settings.get("hub_monitor_interval", 0.1) > 0 and self._greenlet is None:
+            self._greenlet = gevent.spawn(self._monitor)
+            environment.events.quitting.add_listener(self._on_quitting)
+
+    def _monitor(self):
+        settings = get_chunk_io_settings()
+        interval = settings.get("hub_monitor_interval", 0.1)
+        threshold = settings.get("hub_blocked_threshold", 0.05)
+        while True:
+            start_time = time.perf_counter()
+            gevent.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start_time - interval)
+            HUB_LOOP_LAG.observe(lag)
+            if lag > threshold:
+                HUB_BLOCKED_SECONDS.inc(lag)
+
+    def _on_quitting(self, **kwargs):
+        if self._greenlet is not None:
+            self._greenlet.kill(block=False)
+            self._greenlet = None
+
+
+hub_monitor = HubMonitor()
@@ -0,0 +1,274 @@
+"""Bulk deletion of flows, Tube tables and dashboards left by test runs"""
+
+import fnmatch
+import logging
+from collections import defaultdict
+
+from gevent.pool import Pool
+from locust.runners import MasterRunner
+
+from common.api import open_api_session
+from common.dashboard import dashboard_id_from_url
+from common.managers import worker_index
+from common.metrics import CLEANUP_DELETIONS
+from common.registry import dashboard_registry, run_ledger, table_registry
+from config import CONFIG
+
+# Сначала дашборды, затем flows, последними - таблицы, которые они читают
+CLEANUP_ORDER = ("dashboard", "flow", "table")
+
+
+def get_cleanup_settings():
+    return CONFIG.get("cleanup", {})
+
+
+class RunCleanup:
+    """
+    Очистка стенда:
+    - по run ledger: объекты текущего или указанного запуска
+    - sweep: flows, дашборды и таблицы аккаунтов по шаблону имени
+    Удаление идёт параллельно, не больше concurrency запросов, с повторами
+    _retry_request; 404 считается успешным удалением. На test_stop каждый
+    процесс удаляет только объекты, созданные им самим (worker в ledger). Удалённые таблицы и дашборды убираются
+    и из registries, чтобы PmOnly и DashboardReader их не выбирали.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+
+    def setup(self, environment):
+        """Register cleanup on test_stop (call from events.init)"""
+        if isinstance(environment.runner, MasterRunner):
+            return
+        environment.events.test_stop.add_listener(self._on_test_stop)
+
+    def cleanup_run(self, environment, run_id=None, worker=None, dry_run=False):
+        """
+        Delete pending ledger objects of run_id (None - of every run)
+        created by worker (None - by any); returns (deleted, failed)
+        """
+        return self.delete(environment, run_ledger.pending(run_id, worker), dry_run=dry_run)
+
+    def sweep(self, environment, pattern, usernames=None, schemas=None, dry_run=False):
+        """Delete objects of the accounts whose name matches the glob pattern"""
+        records = []
+        for account in self._accounts(usernames):
+            api = self._session(environment, account)
+            if api is None:
+                continue
+            records.extend(self._list_flows(api, pattern))
+            records.extend(self._list_dashboards(api, pattern))
+            records.extend(self._list_tables(api, pattern, schemas))
+        return self.delete(environment, records, dry_run=dry_run)
+
+    def delete(self, environment, records, dry_run=False):
+        """Delete records kind by kind in CLEANUP_ORDER; returns (deleted, failed)"""
+        settings = get_cleanup_settings()
+        by_kind = defaultdict(list)
+        for record in records:
+            by_kind[record["kind"]].append(record)
+
+        deleted = failed = 0
+        for kind in CLEANUP_ORDER:
+            if not by_kind[kind]:
+                continue
+            if dry_run:
+                for record in by_kind[kind]:
+                    print(f"[dry-run] {kind} {record['object_id']} ({record.get('name', '')}) of {record.get('username')}")
+                continue
+
+            pool = Pool(settings.get("concurrency", 10))
+            for success in pool.imap_unordered(lambda record: self._delete_one(environment, record), by_kind[kind]):
+                if success:
+                    deleted += 1
+                else:
+                    failed += 1
+
+        if not dry_run:
+            print(f"Cleanup finished: {deleted} objects deleted, {failed} failed")
+        return deleted, failed
+
+    def _delete_one(self, environment, record):
+        api = self._session(environment, {"username": record.get("username")})
+        if api is None:
+            CLEANUP_DELETIONS.labels(kind=record["kind"], status="failed").inc()
+            return False
+
+        # Повторы при ошибках сервера делает _retry_request
+        resp = self._send_delete(api, record)
+        if resp is not None and resp.ok:
+            run_ledger.mark_deleted(record)
+            self._prune_registries(record)
+            CLEANUP_DELETIONS.labels(kind=record["kind"], status="success").inc()
+            return True
+
+        api.log(f"Failed to delete {record['kind']} {record['object_id']}", logging.ERROR)
+        CLEANUP_DELETIONS.labels(kind=record["kind"], status="failed").inc()
+        return False
+
+    @staticmethod
+    def _prune_registries(record):
+        base_url = CONFIG["api"]["base_url"]
+        if record["kind"] == "table":
+            table_registry.remove(base_url=base_url, schema=record["schema"], table_name=record["name"])
+        elif record["kind"] == "dashboard":
+            # В registry дашборд записан URL-ом, в ledger и при sweep - id
+            urls = {
+                registered["dashboard_url"] for registered in dashboard_registry.load(base_url=base_url)
+                if dashboard_id_from_url(registered["dashboard_url"]) == str(record["object_id"])
+            }
+            for url in urls:
+                dashboard_registry.remove(base_url=base_url, dashboard_url=url)
+
+    @staticmethod
+    def _send_delete(api, record):
+        kind = record["kind"]
+        if kind == "flow":
+            return api._retry_request(
+                api.client.delete,
+                url=f"{CONFIG['api']['flow_endpoint']}{record['object_id']}",
+                name="Cleanup flow",
+                expected_statuses=(404,),
+                timeout=30,
+            )
+        if kind == "dashboard":
+            return api._retry_request(
+                api.client.delete,
+                url=f"/api/v1/dashboard/{record['object_id']}",
+                name="Cleanup dashboard",
+                expected_statuses=(404,),
+                timeout=30,
+            )
+        if kind == "table":
+            return api._retry_request(
+                api.client.post,
+                url="/api/v1/sqllab/execute/",
+                name="Cleanup table",
+                json=_sql_payload(record["db_id"], record["schema"],
+                                  f'DROP TABLE IF EXISTS "{record["schema"]}"."{record["name"]}"'),
+                timeout=60,
+            )
+        raise ValueError(f"Unknown object kind in run ledger: {kind}")
+
+    def _session(self, environment, account):
+        """Logged-in Api of the account, one per process"""
+        username = account.get("username")
+        if username not in self._sessions:
+            credentials = next((user for user in CONFIG["users"] if user["username"] == username), None)
+            self._sessions[username] = open_api_session(environment, credentials) if credentials else None
+        return self._sessions[username]
+
+    @staticmethod
+    def _accounts(usernames):
+        return [user for user in CONFIG["users"] if not usernames or user["username"] in usernames]
+
+    @staticmethod
+    def _list_flows(api, pattern):
+        records = []
+        page = 0
+        while True:
+            resp = api._retry_request(
+                api.client.get,
+                url=f"{CONFIG['api']['flow_endpoint']}?q=(page:{page},page_size:100)",
+                name="Cleanup list flows",
+                timeout=30,
+            )
+            if not resp or not resp.ok:
+                break
+            result = resp.json().get("result", [])
+            records.extend(
+                {"kind": "flow", "object_id": flow["id"], "name": flow.get("label", ""), "username": api.username}
+                for flow in result
+                if fnmatch.fnmatch(flow.get("label", ""), pattern)
+            )
+            if len(result) < 100:
+                break
+            page += 1
+        return records
+
+    @staticmethod
+    def _list_dashboards(api, pattern):
+        records = []
+        page = 0
+        while True:
+            resp = api._retry_request(
+                api.client.get,
+                url=f"/api/v1/dashboard/?q=(page:{page},page_size:100)",
+                name="Cleanup list dashboards",
+                timeout=30,
+            )
+            if not resp or not resp.ok:
+                break
+            result = resp.json().get("result", [])
+            records.extend(
+                {"kind": "dashboard", "object_id": dashboard["id"],
+                 "name": dashboard.get("dashboard_title", ""), "username": api.username}
+                for dashboard in result
+                if fnmatch.fnmatch(dashboard.get("dashboard_title", ""), pattern)
+            )
+            if len(result) < 100:
+                break
+            page += 1
+        return records
+
+    @staticmethod
+    def _list_tables(api, pattern, schemas):
+        db_id = api._get_user_database_id()
+        if not db_id:
+            return []
+
+        # Схемы из ledger этого аккаунта и из cleanup.sweep_schemas
+        schemas = set(schemas or get_cleanup_settings().get("sweep_schemas", []))
+        schemas.update(
+            record["schema"] for record in run_ledger.load(kind="table", username=api.username)
+            if record.get("schema")
+        )
+
+        records = []
+        for schema in schemas:
+            resp = api._retry_request(
+                api.client.post,
+                url="/api/v1/sqllab/execute/",
+                name="Cleanup list tables",
+                json=_sql_payload(
+                    db_id, schema,
+                    f"SELECT table_name FROM information_schema.tables WHERE table_schema = '{schema}'",
+                ),
+                timeout=60,
+            )
+            if not resp or not resp.ok:
+                continue
+            for row in resp.json().get("data") or []:
+                table_name = row.get("table_name", "")
+                if fnmatch.fnmatch(table_name, pattern):
+                    records.append({
+                        "kind": "table", "object_id": f"{schema}.{table_name}", "name": table_name,
+                        "schema": schema, "db_id": db_id, "username": api.username,
+                    })
+        return records
+
+    def _on_test_stop(self, environment, **kwargs):
+        if get_cleanup_settings().get("on_test_stop", False):
+            # Workers одного хоста делят ledger: каждый удаляет только свои объекты
+            self.cleanup_run(environment, run_ledger.run_id, worker_index(environment.runner))
+
+
+def _sql_payload(db_id, schema, sql):
+    return {
+        "client_id": "",
+        "database_id": str(db_id),
+        "json": True,
+        "runAsync": False,
+        "schema": schema,
+        "sql": sql,
+        "sql_editor_id": "4",
+        "tab": "Locust Cleanup",
+        "tmp_table_name": "",
+        "select_as_cta": False,
+        "ctas_method": "TABLE",
+        "queryLimit": 100000,
+        "expand_data": True,
+    }
+
+
+run_cleanup = RunCleanup()
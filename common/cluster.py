@@ -0,0 +1,49 @@
+"""Splitting cluster-wide settings between Locust workers"""
+
+from locust.runners import STATE_MISSING, MasterRunner, WorkerRunner
+
+
+def register_worker_share(environment, message_type, on_share):
+    """
+    Master сообщает каждому worker его долю (1 / число workers) при старте теста,
+    worker передаёт полученную долю в on_share(share).
+    """
+    runner = environment.runner
+
+    if isinstance(runner, MasterRunner):
+        def send_share(environment, **kwargs):
+            worker_count = max(environment.runner.worker_count, 1)
+            environment.runner.send_message(message_type, {"share": 1.0 / worker_count})
+
+        environment.events.test_start.add_listener(send_share)
+
+    elif isinstance(runner, WorkerRunner):
+        def receive_share(environment, msg, **kwargs):
+            on_share(msg.data["share"])
+
+        runner.register_message(message_type, receive_share)
+
+
+def register_worker_slot(environment, message_type, on_slot):
+    """
+    Master сообщает каждому worker его номер и число workers при старте теста,
+    worker передаёт их в on_slot(index, count): так целое значение делится без
+    округления на каждом worker.
+    """
+    runner = environment.runner
+
+    if isinstance(runner, MasterRunner):
+        def send_slots(environment, **kwargs):
+            workers = sorted(client.id for client in environment.runner.clients.all if client.state != STATE_MISSING)
+            for index, client_id in enumerate(workers):
+                environment.runner.send_message(
+                    message_type, {"index": index, "count": len(workers)}, client_id=client_id
+                )
+
+        environment.events.test_start.add_listener(send_slots)
+
+    elif isinstance(runner, WorkerRunner):
+        def receive_slot(environment, msg, **kwargs):
+            on_slot(msg.data["index"], msg.data["count"])
+
+        runner.register_message(message_type, receive_slot)
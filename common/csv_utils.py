@@ -1,45 +1,75 @@
 """CSV utilities for file processing"""
 
 import os
+import re
 
 
 def split_csv_generator(file_path, chunk_size=4 * 1024 * 1024):
     """Generate CSV chunks preserving complete lines"""
-    chunk_number = 1
-    leftover = ""
-
     if not os.path.exists(file_path):
         yield None
         return
 
     with open(file_path, "r", encoding="utf-8") as file:
-        while True:
-            chunk_data = file.read(chunk_size)
-            if not chunk_data:
-                if leftover:
-                    yield {
-                        "chunk_number": chunk_number,
-                        "chunk_text": leftover,
-                        "size_bytes": len(leftover.encode("utf-8")),
-                    }
-                break
-
-            chunk_text = leftover + chunk_data
-            last_newline = chunk_text.rfind("\n")
-            if last_newline != -1:
-                complete_part = chunk_text[: last_newline + 1]
-                leftover = chunk_text[last_newline + 1 :]
-            else:
-                complete_part = ""
-                leftover = chunk_text
-
-            if complete_part:
+        yield from split_text_chunks(file.read, chunk_size)
+
+
+def split_text_chunks(read, chunk_size=4 * 1024 * 1024):
+    """Chunks of complete lines from read(chunk_size) calls returning text"""
+    chunk_number = 1
+    leftover = ""
+
+    while True:
+        chunk_data = read(chunk_size)
+        if not chunk_data:
+            if leftover:
                 yield {
                     "chunk_number": chunk_number,
-                    "chunk_text": complete_part,
-                    "size_bytes": len(complete_part.encode("utf-8")),
+                    "chunk_text": leftover,
+                    "size_bytes": len(leftover.encode("utf-8")),
                 }
-                chunk_number += 1
+            break
+
+        chunk_text = leftover + chunk_data
+        last_newline = chunk_text.rfind("\n")
+        if last_newline != -1:
+            complete_part = chunk_text[: last_newline + 1]
+            leftover = chunk_text[last_newline + 1 :]
+        else:
+            complete_part = ""
+            leftover = chunk_text
+
+        if complete_part:
+            yield {
+                "chunk_number": chunk_number,
+                "chunk_text": complete_part,
+                "size_bytes": len(complete_part.encode("utf-8")),
+            }
+            chunk_number += 1
+
+
+def slice_chunks(chunks, first_chunk=1, max_chunks=0, header=""):
+    """
+    Chunks first_chunk..first_chunk+max_chunks-1 renumbered from 1 (max_chunks=0 - to the end).
+    The header line is prepended to part 1 when first_chunk > 1; chunk_text may be str or bytes.
+    """
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if chunk["chunk_number"] < first_chunk:
+            continue
+        part_num = chunk["chunk_number"] - first_chunk + 1
+        if max_chunks and part_num > max_chunks:
+            break
+        if part_num == 1 and first_chunk > 1 and header:
+            text = chunk["chunk_text"]
+            encoded = header.encode("utf-8")
+            chunk = dict(
+                chunk,
+                chunk_text=(encoded if isinstance(text, bytes) else header) + text,
+                size_bytes=chunk["size_bytes"] + len(encoded),
+            )
+        yield dict(chunk, chunk_number=part_num)
 
 
 def count_chunks(file_path, chunk_size=4 * 1024 * 1024):
@@ -55,4 +85,82 @@ def count_csv_lines(file_path):
         return 0
     with open(file_path, "r", encoding="utf-8") as f:
         total = sum(1 for _ in f)
-    return max(0, total - 1)
\ No newline at end of file
+    return max(0, total - 1)
+
+
+def select_chunks(chunks, numbers, header="", max_rows=None):
+    """
+    Chunks with the given numbers renumbered from 1. The header line is
+    prepended when chunk 1 is not selected; max_rows cuts data rows to exactly max_rows.
+    """
+    wanted = set(numbers)
+    last_number = max(numbers) if numbers else 0
+    part_num = 0
+    rows_left = max_rows
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if chunk["chunk_number"] > last_number or rows_left == 0:
+            break
+        if chunk["chunk_number"] not in wanted:
+            continue
+
+        part_num += 1
+        text = chunk["chunk_text"]
+        if part_num == 1 and chunk["chunk_number"] != 1:
+            text = header + text
+        if rows_left is not None:
+            text, rows = cut_rows(text, rows_left, has_header=part_num == 1)
+            rows_left -= rows
+
+        size_bytes = chunk["size_bytes"] if text is chunk["chunk_text"] else len(text.encode("utf-8"))
+        yield {"chunk_number": part_num, "chunk_text": text, "size_bytes": size_bytes}
+
+
+def cut_rows(text, max_rows, has_header=False):
+    """(text with at most max_rows data rows, data rows in it)"""
+    position = text.find("\n") + 1 if has_header else 0
+    if has_header and not position:
+        return text, 0
+
+    rows = 0
+    while rows < max_rows and position < len(text):
+        newline = text.find("\n", position)
+        position = len(text) if newline == -1 else newline + 1
+        rows += 1
+    return (text if position >= len(text) else text[:position]), rows
+
+
+def scan_csv(file_path, chunk_size=4 * 1024 * 1024, delimiter=","):
+    """
+    Chunks, data rows, size, header, per-chunk data rows/bytes and the widest
+    first column (case_id) of the data rows of the CSV in a single pass
+    """
+    header = ""
+    chunk_rows = []
+    chunk_bytes = []
+    case_id_digits = 0
+    first_column = re.compile(rf"^[^{re.escape(delimiter)}\n]*", re.MULTILINE)
+
+    if os.path.exists(file_path):
+        for chunk in split_csv_generator(file_path, chunk_size):
+            text = chunk["chunk_text"]
+            rows = text.count("\n") + (0 if text.endswith("\n") else 1)
+            if chunk["chunk_number"] == 1:
+                header = text[: text.find("\n") + 1] or text
+                rows -= 1
+                text = text[len(header):]
+            case_id_digits = max(case_id_digits, max(map(len, first_column.findall(text)), default=0))
+            chunk_rows.append(rows)
+            chunk_bytes.append(chunk["size_bytes"])
+
+    return {
+        "total_chunks": len(chunk_rows),
+        "total_lines": sum(chunk_rows),
+        "size_bytes": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
+        "header": header,
+        "chunk_rows": chunk_rows,
+        "chunk_bytes": chunk_bytes,
+        "case_id_digits": case_id_digits,
+    }
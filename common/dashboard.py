@@ -0,0 +1,121 @@
+"""Browser-like dashboard render emulation"""
+
+import json
+import logging
+import re
+import time
+
+import gevent
+from gevent.pool import Pool
+
+from common.metrics import (
+    DASHBOARD_TIME_TO_FIRST_CHART,
+    DASHBOARD_TIME_TO_LAST_CHART,
+    DASHBOARD_CHART_LOADS,
+)
+from config import CONFIG
+
+DASHBOARD_ID_RE = re.compile(r"/dashboard/([^/?#]+)")
+
+
+def dashboard_id_from_url(dashboard_url):
+    """Dashboard id or slug from /superset/dashboard/<id>/ URL"""
+    match = DASHBOARD_ID_RE.search(dashboard_url or "")
+    return match.group(1) if match else None
+
+
+class DashboardRenderer:
+    """
+    Эмуляция отрисовки дашборда браузером:
+    - метаданные дашборда и список чартов, параллельно
+    - запросы данных всех чартов параллельно, не больше parallelism одновременно
+    - time-to-first-chart / time-to-last-chart от начала открытия дашборда
+    """
+
+    # Чарты без сохранённого query_context: сразу идём в explore_json
+    _legacy_charts = set()
+
+    def __init__(self, task_set):
+        self.task_set = task_set
+
+    def render(self, dashboard_url, render_start=None):
+        """Fetch metadata and all chart data of the dashboard; True if every chart loaded"""
+        settings = CONFIG.get("dashboard_render", {})
+        dashboard_id = dashboard_id_from_url(dashboard_url)
+        if not dashboard_id:
+            self.task_set.log(f"Cannot extract dashboard id from URL: {dashboard_url}", logging.WARNING)
+            return False
+
+        render_start = render_start or time.time()
+
+        # Метаданные и список чартов браузер запрашивает одновременно
+        metadata, charts = [
+            gevent.spawn(
+                self.task_set._retry_request, self.task_set.client.get, url=url, name=name, timeout=30
+            )
+            for url, name in (
+                (f"/api/v1/dashboard/{dashboard_id}", "Dashboard metadata"),
+                (f"/api/v1/dashboard/{dashboard_id}/charts", "Dashboard charts"),
+            )
+        ]
+        gevent.joinall([metadata, charts])
+        metadata_resp, charts_resp = metadata.value, charts.value
+        if not metadata_resp or not metadata_resp.ok or not charts_resp or not charts_resp.ok:
+            self.task_set.log(f"Failed to fetch dashboard {dashboard_id} definition", logging.ERROR)
+            return False
+
+        chart_ids = [chart.get("id") for chart in charts_resp.json().get("result", []) if chart.get("id")]
+        if not chart_ids:
+            self.task_set.log(f"Dashboard {dashboard_id} has no charts", logging.WARNING)
+            return True
+
+        first_chart_at = last_chart_at = None
+        failed_charts = 0
+        pool = Pool(settings.get("parallelism", 6))
+
+        for loaded in pool.imap_unordered(self._load_chart, chart_ids):
+            now = time.time()
+            if first_chart_at is None:
+                first_chart_at = now
+            last_chart_at = now
+            if not loaded:
+                failed_charts += 1
+
+        DASHBOARD_TIME_TO_FIRST_CHART.observe(first_chart_at - render_start)
+        DASHBOARD_TIME_TO_LAST_CHART.observe(last_chart_at - render_start)
+
+        self.task_set.log(
+            f"Dashboard {dashboard_id} rendered: {len(chart_ids) - failed_charts}/{len(chart_ids)} charts, "
+            f"first chart {first_chart_at - render_start:.2f}s, last chart {last_chart_at - render_start:.2f}s"
+        )
+        return failed_charts == 0
+
+    def _load_chart(self, chart_id):
+        settings = CONFIG.get("dashboard_render", {})
+        timeout = settings.get("chart_timeout", 60)
+
+        if chart_id not in self._legacy_charts:
+            # 400 ожидаем у чартов без query_context: это не ошибка, а переход на explore_json
+            resp = self.task_set._retry_request(
+                self.task_set.client.get,
+                url=f"/api/v1/chart/{chart_id}/data/?format=json&type=full",
+                name="Chart data",
+                expected_statuses=(400,),
+                timeout=timeout,
+            )
+            if resp is None or resp.status_code != 400:
+                loaded = bool(resp and resp.ok)
+                DASHBOARD_CHART_LOADS.labels(status="success" if loaded else "failed").inc()
+                return loaded
+            self._legacy_charts.add(chart_id)
+
+        resp = self.task_set._retry_request(
+            self.task_set.client.post,
+            url="/superset/explore_json/",
+            name="Chart data (explore_json)",
+            data={"form_data": json.dumps({"slice_id": chart_id})},
+            timeout=timeout,
+        )
+        loaded = bool(resp and resp.ok)
+        DASHBOARD_CHART_LOADS.labels(status="success" if loaded else "failed").inc()
+        return loaded
@@ -0,0 +1,383 @@
+"""CSV dataset pool and scans done once per worker outside the gevent loop"""
+
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import gevent
+import yaml
+from locust.runners import MasterRunner, WorkerRunner
+
+from common.aggregates import aggregate_spec, expected_aggregates, get_result_validation_settings, scan_aggregates, spec_hash
+from common.csv_utils import scan_csv
+from common.metrics import DATASET_AGGREGATE_DURATION, DATASET_SCAN_DURATION, DATASET_VALIDATION_DURATION
+from common.schema import SchemaValidator
+from config import CONFIG
+
+# Версия формата манифестов: манифесты другой версии пересканируются
+MANIFEST_VERSION = 3
+
+DATASET_INVALID = "dataset_invalid"
+
+
+def get_dataset_settings():
+    return CONFIG.get("dataset", {})
+
+
+def file_signature(file_path):
+    """(size, mtime) of the file or None if it does not exist"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def load_dataset_pool(settings=None):
+    """
+    Files of the dataset pool: [{"path", "weight", ...}].
+    dataset.pool.manifest (YAML list under datasets:) wins over dataset.pool.glob,
+    without either the pool is csv_file_path alone.
+    """
+    settings = (settings or get_dataset_settings()).get("pool") or {}
+
+    if settings.get("manifest"):
+        with open(settings["manifest"], "r", encoding="utf-8") as file:
+            entries = (yaml.safe_load(file) or {}).get("datasets", [])
+        base_dir = os.path.dirname(os.path.abspath(settings["manifest"]))
+        pool = [
+            dict(entry, path=os.path.join(base_dir, entry["path"]), weight=entry.get("weight", 1))
+            for entry in entries
+        ]
+    elif settings.get("glob"):
+        pool = [{"path": path, "weight": 1} for path in sorted(glob.glob(settings["glob"]))]
+    else:
+        pool = [{"path": CONFIG["csv_file_path"], "weight": 1}]
+
+    if not pool:
+        raise ValueError(f"Dataset pool is empty: {settings}")
+    return pool
+
+
+def parse_size(size):
+    """Bytes from 1048576, 512KB, 20MB or 1.5GB"""
+    if isinstance(size, (int, float)):
+        return int(size)
+    units = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+    for unit, factor in units.items():
+        if size.upper().endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def select_volume(dataset, rng=random):
+    """
+    Dataset narrowed to the data volume of one upload (dataset.volume) with exact
+    chunk and row counts; "selection" holds the arguments of select_chunks.
+    """
+    settings = get_dataset_settings().get("volume") or {}
+    mode = settings.get("mode", "full")
+    if mode == "full" or not dataset["total_chunks"] or not settings.get("sizes"):
+        return dataset
+
+    size = rng.choice(settings["sizes"])
+    chunk_rows, chunk_bytes = dataset["chunk_rows"], dataset["chunk_bytes"]
+    max_rows = None
+
+    if mode == "bytes":
+        # Целые чанки, не больше size байт (минимум один)
+        limit, total, count = parse_size(size), 0, 0
+        for size_bytes in chunk_bytes:
+            if count and total + size_bytes > limit:
+                break
+            total += size_bytes
+            count += 1
+        numbers = list(range(1, count + 1))
+    elif mode == "rows":
+        # Первые size строк: последний чанк обрезается при загрузке
+        limit, total, numbers = int(size), 0, []
+        for number, rows in enumerate(chunk_rows, 1):
+            if total >= limit:
+                break
+            numbers.append(number)
+            total += rows
+        max_rows = min(limit, total)
+    elif mode == "sample":
+        # Доля случайных чанков в исходном порядке
+        count = min(dataset["total_chunks"], max(1, round(float(size) * dataset["total_chunks"])))
+        numbers = sorted(rng.sample(range(1, dataset["total_chunks"] + 1), count))
+    else:
+        raise ValueError(f"Unknown dataset.volume mode: {mode}")
+
+    return dict(
+        dataset,
+        volume=size,
+        total_chunks=len(numbers),
+        total_lines=max_rows if max_rows is not None else sum(chunk_rows[number - 1] for number in numbers),
+        size_bytes=sum(chunk_bytes[number - 1] for number in numbers),
+        selection={"numbers": numbers, "header": dataset["header"], "max_rows": max_rows},
+    )
+
+
+def upload_timeout(dataset):
+    """Upload/processing timeout of the dataset: its own or timeout_small/timeout_large by chunk count"""
+    if dataset.get("timeout"):
+        return dataset["timeout"]
+    upload_control = CONFIG["upload_control"]
+    if dataset["total_chunks"] > upload_control["chunk_threshold"]:
+        return upload_control["timeout_large"]
+    return upload_control["timeout_small"]
+
+
+class DatasetCatalog:
+    """
+    Пул CSV датасетов и сведения о них (число чанков, строк, размер):
+    - пул задаётся манифестом с весами или glob, по умолчанию csv_file_path
+    - каждый файл сканируется один раз на worker в пуле потоков gevent
+      hub, event loop в это время продолжает отвечать на heartbeats
+    - результат сохраняется в манифест файла в dataset.manifest_dir и
+      переиспользуется следующими запусками, пока не изменились размер
+      или mtime файла
+    - пользователи ждут результат кооперативно и дальше получают его из кэша
+    - dataset.schema_validation: файлы проверяются по upload_columns до
+      начала теста, запуск с невалидным датасетом останавливается
+    - result_validation.aggregates: ожидаемые агрегаты файла считаются
+      одним проходом и хранятся в том же манифесте
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+        self._scans = {}
+        self._validations = {}
+        self._aggregates = {}
+        self._pool = None
+        self._random = random.Random(get_dataset_settings().get("pool", {}).get("seed"))
+
+    def setup(self, environment):
+        """Start scanning every dataset of the pool (call from events.init)"""
+        if isinstance(environment.runner, MasterRunner):
+            # Датасеты проверяют workers, master останавливает весь запуск
+            environment.runner.register_message(DATASET_INVALID, self._on_dataset_invalid)
+            return
+        self.prepare_pool()
+        environment.events.test_start.add_listener(lambda **kwargs: self.prepare_pool())
+
+        if get_dataset_settings().get("schema_validation", {}).get("enabled", False):
+            for entry in self.pool():
+                self.validate_schema(entry["path"])
+            environment.events.test_start.add_listener(self._on_test_start)
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = load_dataset_pool()
+            return self._pool
+
+    def prepare_pool(self):
+        aggregates = get_result_validation_settings().get("aggregates", False)
+        for entry in self.pool():
+            self.prepare(entry["path"])
+            if aggregates:
+                self.prepare_aggregates(entry["path"])
+
+    def prepare(self, file_path=None, chunk_size=None):
+        """Start the scan in a thread unless cached; returns gevent AsyncResult"""
+        file_path = file_path or self.pool()[0]["path"]
+        chunk_size = chunk_size or CONFIG["chunk_size"]
+        key = (file_path, chunk_size, file_signature(file_path))
+        return self._spawn(self._scans, key, self._scan, file_path, chunk_size)
+
+    def prepare_aggregates(self, file_path=None, chunk_size=None):
+        """Start the aggregates pass in a thread unless cached; returns gevent AsyncResult"""
+        file_path = file_path or self.pool()[0]["path"]
+        chunk_size = chunk_size or CONFIG["chunk_size"]
+        key = (file_path, chunk_size, file_signature(file_path))
+        # Упавший проход не перезапускается: каждая проверка запускала бы новый проход по файлу
+        return self._spawn(self._aggregates, key, self._aggregate, file_path, chunk_size, restart_failed=False)
+
+    def validate_schema(self, file_path):
+        """Start schema validation in a thread unless cached; returns gevent AsyncResult"""
+        key = (file_path, file_signature(file_path))
+        return self._spawn(self._validations, key, self._validate, file_path)
+
+    def get(self, file_path=None, chunk_size=None):
+        """scan_csv result for the file; waits cooperatively for the scan"""
+        timeout = get_dataset_settings().get("scan_timeout", 600)
+        return self.prepare(file_path, chunk_size).get(timeout=timeout)
+
+    def expected_aggregates(self, dataset):
+        """Aggregates expected in the table after uploading the dataset; waits cooperatively for the pass"""
+        timeout = get_result_validation_settings().get("timeout", 600)
+        return expected_aggregates(self.prepare_aggregates(dataset["path"]).get(timeout=timeout), dataset)
+
+    def choose(self):
+        """Dataset for one iteration drawn from the pool by weight, narrowed to a data volume"""
+        pool = self.pool()
+        entry = self._random.choices(pool, weights=[entry["weight"] for entry in pool])[0]
+        return select_volume(dict(entry, **self.get(entry["path"])), self._random)
+
+    def summary(self):
+        """Pool description for run records: source, total bytes and rows"""
+        settings = get_dataset_settings().get("pool") or {}
+        datasets = [self.get(entry["path"]) for entry in self.pool()]
+        return {
+            "path": settings.get("manifest") or settings.get("glob") or CONFIG["csv_file_path"],
+            "size_bytes": sum(dataset["size_bytes"] for dataset in datasets),
+            "total_lines": sum(dataset["total_lines"] for dataset in datasets),
+        }
+
+    def _spawn(self, tasks, key, function, *args, restart_failed=True):
+        """function(*args) in the hub thread pool, once per key; failed runs are restarted unless restart_failed=False"""
+        with self._lock:
+            task = tasks.get(key)
+            if task is None or (restart_failed and task.ready() and not task.successful()):
+                task = gevent.get_hub().threadpool.spawn(function, *args)
+                tasks[key] = task
+        return task
+
+    def _scan(self, file_path, chunk_size):
+        # Выполняется в отдельном потоке: без обращений к gevent
+        signature = file_signature(file_path)
+        info = self._read_manifest(file_path, signature).get("chunks", {}).get(str(chunk_size))
+        # Манифесты прежних версий без case_id_digits пересканируются
+        if info is not None and "case_id_digits" in info:
+            return info
+
+        start_time = time.time()
+        info = scan_csv(file_path, chunk_size, CONFIG.get("upload_settings", {}).get("delimiter", ","))
+        duration = time.time() - start_time
+        DATASET_SCAN_DURATION.set(duration)
+        print(
+            f"Dataset scanned: {file_path} - {info['total_chunks']} chunks, "
+            f"{info['total_lines']} rows in {duration:.1f}s"
+        )
+        self._update_manifest(file_path, signature, "chunks", str(chunk_size), info)
+        return info
+
+    def _validate(self, file_path):
+        # Выполняется в отдельном потоке: без обращений к gevent
+        settings = get_dataset_settings().get("schema_validation", {})
+        validator = SchemaValidator()
+        signature = file_signature(file_path)
+        result = self._read_manifest(file_path, signature).get("schema", {}).get(validator.schema_hash)
+        if result is not None:
+            return result
+
+        start_time = time.time()
+        result = validator.validate(
+            file_path,
+            max_errors=settings.get("max_errors", 10),
+            processes=settings.get("processes", 1) or os.cpu_count(),
+        )
+        duration = time.time() - start_time
+        DATASET_VALIDATION_DURATION.set(duration)
+        print(f"Dataset validated: {file_path} - {result['rows']} rows, {len(result['errors'])} errors in {duration:.1f}s")
+        self._update_manifest(file_path, signature, "schema", validator.schema_hash, result)
+        return result
+
+    def _aggregate(self, file_path, chunk_size):
+        # Выполняется в отдельном потоке: без обращений к gevent
+        spec = aggregate_spec()
+        key = f"{chunk_size}:{spec_hash(spec)}"
+        signature = file_signature(file_path)
+        aggregates = self._read_manifest(file_path, signature).get("aggregates", {}).get(key)
+        if aggregates is not None:
+            return aggregates
+
+        start_time = time.time()
+        aggregates = scan_aggregates(file_path, chunk_size, spec)
+        duration = time.time() - start_time
+        DATASET_AGGREGATE_DURATION.set(duration)
+        print(f"Dataset aggregates computed: {file_path} - {len(aggregates['chunks'])} chunks in {duration:.1f}s")
+        self._update_manifest(file_path, signature, "aggregates", key, aggregates)
+        return aggregates
+
+    def _on_test_start(self, environment, **kwargs):
+        # Тест с невалидным датасетом останавливается до первой загрузки
+        timeout = get_dataset_settings().get("schema_validation", {}).get("timeout", 600)
+        errors = {}
+        for entry in self.pool():
+            try:
+                result = self.validate_schema(entry["path"]).get(timeout=timeout)
+            except gevent.Timeout:
+                # gevent.Timeout - BaseException, EventHook.fire его не перехватывает
+                errors[entry["path"]] = [f"schema validation did not finish in {timeout}s"]
+                continue
+            if not result["valid"]:
+                errors[entry["path"]] = result["errors"]
+        if not errors:
+            return
+
+        self._print_errors(errors)
+        environment.process_exit_code = 1
+        if isinstance(environment.runner, WorkerRunner):
+            # Сообщение уходит до quit: master успевает выставить код выхода
+            environment.runner.send_message(DATASET_INVALID, {"errors": errors})
+        gevent.spawn(environment.runner.quit)
+
+    def _on_dataset_invalid(self, environment, msg, **kwargs):
+        print(f"Worker {msg.node_id} rejected the run:")
+        self._print_errors(msg.data["errors"])
+        environment.process_exit_code = 1
+        gevent.spawn(environment.runner.quit)
+
+    @staticmethod
+    def _print_errors(errors):
+        for path, file_errors in errors.items():
+            print(f"Dataset {path} does not match upload_columns:")
+            for error in file_errors:
+                print(f"  {error}")
+
+    def _manifest_path(self, file_path):
+        directory = get_dataset_settings().get("manifest_dir")
+        if not directory:
+            return None
+        digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(directory, f"{os.path.basename(file_path)}.{digest}.json")
+
+    def _read_manifest(self, file_path, signature):
+        """Manifest of the file if it describes this version of the file, else {}"""
+        manifest_path = self._manifest_path(file_path)
+        if not manifest_path or signature is None or not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        if [manifest.get("size_bytes"), manifest.get("mtime")] != list(signature):
+            return {}
+        return manifest
+
+    def _update_manifest(self, file_path, signature, section, key, value):
+        """Store value under manifest[section][key], keeping the other sections"""
+        manifest_path = self._manifest_path(file_path)
+        if not manifest_path or signature is None:
+            return
+
+        with self._manifest_lock:
+            manifest = self._read_manifest(file_path, signature) or {
+                "version": MANIFEST_VERSION,
+                "path": os.path.abspath(file_path),
+                "size_bytes": signature[0],
+                "mtime": signature[1],
+            }
+            manifest.setdefault(section, {})[key] = value
+
+            # Запись через временный файл: манифест читают другие workers хоста
+            os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+            temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(manifest, file, ensure_ascii=False, indent=2)
+            os.replace(temp_path, manifest_path)
+
+
+dataset_catalog = DatasetCatalog()
@@ -0,0 +1,182 @@
+"""Flows provisioned before the measured window and leased by users"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+import gevent
+from gevent.event import Event
+from gevent.pool import Pool
+from locust.runners import MasterRunner
+
+from common.dataset import dataset_catalog
+from common.leasing import credential_leasing
+from common.managers import worker_index
+from common.metrics import FLOW_POOL_LEASES, FLOW_POOL_SIZE, FLOW_POOL_PROVISION_DURATION
+from config import CONFIG
+
+
+def get_flow_pool_settings():
+    return CONFIG.get("flow_pool", {})
+
+
+class FlowPool:
+    """
+    Пул готовых к загрузке flows:
+    - на test_start каждый worker (или local runner) в отдельном greenlet
+      создаёт flows_per_account flows для аккаунтов из flow_pool.accounts
+      (по умолчанию для всех users); цикл сообщений worker не блокируется
+    - аккаунты на время подготовки арендуются через credential_leasing,
+      как пользователями, и учитываются в max_sessions_per_account
+    - создание, параметры DAG, обновление конфига и id БД выполняются
+      параллельно, не больше parallelism запросов одновременно
+    - пользователь ждёт готовности пула (не дольше wait_timeout) и арендует
+      flow своего аккаунта; если пул пуст, flow создаётся в итерации, как раньше
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flows = defaultdict(deque)
+        self._ready = Event()
+        self._ready.set()
+        self._provisioner = None
+
+    @property
+    def enabled(self):
+        return get_flow_pool_settings().get("enabled", False)
+
+    def setup(self, environment):
+        """Register provisioning on test_start (call from events.init)"""
+        if isinstance(environment.runner, MasterRunner):
+            return
+        environment.events.test_start.add_listener(self._on_test_start)
+        environment.events.test_stop.add_listener(self._on_test_stop)
+
+    def acquire(self, username):
+        """Ready flow of the account or None; waits while the pool is being provisioned"""
+        if not self.enabled:
+            return None
+
+        self._ready.wait(get_flow_pool_settings().get("wait_timeout", 600))
+        with self._lock:
+            flows = self._flows.get(username)
+            flow = flows.popleft() if flows else None
+            self._update_gauge()
+
+        FLOW_POOL_LEASES.labels(result="hit" if flow else "miss").inc()
+        return flow
+
+    def provision(self, environment, leases=None):
+        """
+        Create the pool; blocks until every flow is ready or failed.
+        leases: AsyncResults of request_leases(), requested now by default
+        """
+        settings = get_flow_pool_settings()
+        leases = leases if leases is not None else self.request_leases()
+        total_chunks = dataset_catalog.get()["total_chunks"]
+        worker_id = worker_index(environment.runner)
+        pool = Pool(settings.get("parallelism", 10))
+        start_time = time.time()
+
+        # Сначала аренда, одна сессия и id БД на аккаунт, затем flows параллельно
+        try:
+            provisioners = [
+                provisioner
+                for provisioner in pool.imap_unordered(
+                    lambda lease: self._login(environment, lease), leases
+                )
+                if provisioner is not None
+            ]
+            jobs = [
+                provisioner
+                for provisioner in provisioners
+                for _ in range(settings.get("flows_per_account", 1))
+            ]
+            for flow in pool.imap_unordered(
+                    lambda provisioner: provisioner._provision_upload_flow(total_chunks, worker_id, provisioner.db_id),
+                    jobs
+            ):
+                if flow:
+                    with self._lock:
+                        self._flows[flow["username"]].append(flow)
+                        self._update_gauge()
+        finally:
+            pool.kill()
+            # Аренды возвращаются и тогда, когда подготовку прервали до их получения
+            for lease in leases:
+                lease.rawlink(lambda result: credential_leasing.release(result.value[0]))
+
+        FLOW_POOL_PROVISION_DURATION.set(time.time() - start_time)
+        print(
+            f"Flow pool ready: {self.size()}/{len(jobs)} flows for {len(provisioners)} accounts "
+            f"in {time.time() - start_time:.1f}s"
+        )
+
+    def request_leases(self):
+        """Queue a lease of every account of flow_pool.accounts (all users by default)"""
+        settings = get_flow_pool_settings()
+        return [
+            credential_leasing.request(account["username"])
+            for account in CONFIG["users"]
+            if not settings.get("accounts") or account["username"] in settings["accounts"]
+        ]
+
+    def size(self):
+        with self._lock:
+            return sum(len(flows) for flows in self._flows.values())
+
+    def clear(self):
+        with self._lock:
+            self._flows.clear()
+            self._update_gauge()
+
+    def _login(self, environment, lease):
+        # Локальный импорт: common.api импортирует этот модуль
+        from common.api import open_api_session
+
+        _, credentials = lease.get()
+        if not credentials:
+            print("Flow pool: account lease timed out")
+            return None
+
+        provisioner = open_api_session(environment, credentials)
+        if provisioner is None:
+            return None
+
+        provisioner.db_id = provisioner._get_user_database_id()
+        if not provisioner.db_id:
+            provisioner.log(f"Flow pool: database not found for {credentials['username']}", logging.ERROR)
+            return None
+        return provisioner
+
+    def _update_gauge(self):
+        FLOW_POOL_SIZE.set(sum(len(flows) for flows in self._flows.values()))
+
+    def _on_test_start(self, environment, **kwargs):
+        self._stop_provisioning()
+        self.clear()
+        if self.enabled:
+            # Аренда запрашивается здесь, раньше аренды пользователей, а подготовка
+            # идёт в фоне: обработчик test_start worker'а не должен её ждать
+            self._ready.clear()
+            self._provisioner = gevent.spawn(self._provision_in_background, environment, self.request_leases())
+
+    def _on_test_stop(self, environment, **kwargs):
+        self._stop_provisioning()
+        self.clear()
+
+    def _provision_in_background(self, environment, leases):
+        try:
+            self.provision(environment, leases)
+        finally:
+            self._ready.set()
+
+    def _stop_provisioning(self):
+        if self._provisioner is not None:
+            self._provisioner.kill(block=True)
+            self._provisioner = None
+        self._ready.set()
+
+
+flow_pool = FlowPool()
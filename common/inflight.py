@@ -0,0 +1,112 @@
+"""Admission control by the number of server-side jobs in flight"""
+
+import threading
+import time
+
+from common.cluster import register_worker_slot
+from common.metrics import INFLIGHT_JOBS, INFLIGHT_TARGET, ADMISSION_WAIT
+from config import CONFIG
+
+INFLIGHT_TARGET_SLOT = "inflight_target_slot"
+
+
+def get_inflight_settings():
+    return CONFIG.get("inflight_control", {})
+
+
+class InflightController:
+    """
+    Держит постоянным число ETL/PM запусков, выполняющихся на стенде:
+    - допущенная итерация занимает место до своего окончания: от загрузки
+      через file run до PM run, без окна между ними
+    - новая итерация допускается, пока допущенных итераций меньше target
+    - run_id регистрируются после _start_file_processing/_start_pm_flow
+      и снимаются по окончании мониторинга статуса (метрики INFLIGHT_JOBS)
+    - target меняется по schedule и делится master'ом между workers:
+      остаток от деления достаётся первым workers
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._jobs = {}
+        self._admitted = set()
+        self._slot = (0, 1)
+        self._started_at = None
+
+    @property
+    def enabled(self):
+        return get_inflight_settings().get("enabled", False)
+
+    def setup(self, environment):
+        """Register cluster coordination handlers (call from events.init)"""
+        register_worker_slot(environment, INFLIGHT_TARGET_SLOT, self._on_slot)
+        environment.events.test_start.add_listener(self._on_test_start)
+
+    def admit(self):
+        """Block until a new iteration fits under the target; returns its admission for release()"""
+        wait_start = time.time()
+        with self._condition:
+            if self._started_at is None:
+                self._started_at = wait_start
+
+            while len(self._admitted) >= self._current_target():
+                # Периодически просыпаемся, чтобы подхватить новый target из schedule
+                self._condition.wait(timeout=1)
+
+            admission = object()
+            self._admitted.add(admission)
+
+        ADMISSION_WAIT.observe(time.time() - wait_start)
+        return admission
+
+    def release(self, admission):
+        """The admitted iteration is over, its runs included"""
+        with self._condition:
+            self._admitted.discard(admission)
+            self._condition.notify_all()
+
+    def job_started(self, run_id, kind):
+        with self._condition:
+            self._jobs[run_id] = kind
+            self._update_gauges()
+
+    def job_finished(self, run_id):
+        with self._condition:
+            if self._jobs.pop(run_id, None) is not None:
+                self._update_gauges()
+                self._condition.notify_all()
+
+    def _current_target(self):
+        settings = get_inflight_settings()
+        target = settings.get("target", 1)
+
+        elapsed = time.time() - self._started_at
+        segment_end = 0
+        for segment in settings.get("schedule") or []:
+            # После окончания schedule остаётся target последнего сегмента
+            target = segment["target"]
+            segment_end += segment["duration"]
+            if elapsed < segment_end:
+                break
+
+        index, count = self._slot
+        target = target // count + (1 if index < target % count else 0)
+        INFLIGHT_TARGET.set(target)
+        return target
+
+    def _update_gauges(self):
+        for kind in ("file", "pm"):
+            INFLIGHT_JOBS.labels(kind=kind).set(
+                sum(1 for job_kind in self._jobs.values() if job_kind == kind)
+            )
+
+    def _on_test_start(self, environment, **kwargs):
+        with self._condition:
+            self._started_at = None
+
+    def _on_slot(self, index, count):
+        with self._condition:
+            self._slot = (index, count)
+
+
+inflight_controller = InflightController()
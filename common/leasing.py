@@ -0,0 +1,316 @@
+"""Cluster-wide credential leasing across Locust workers"""
+
+import threading
+import time
+import uuid
+from collections import deque
+
+import gevent
+from gevent.event import AsyncResult
+from locust.runners import STATE_MISSING, MasterRunner, WorkerRunner
+
+from common.metrics import CREDENTIAL_LEASES, CREDENTIAL_LEASE_WAIT
+from config import CONFIG
+
+LEASE_REQUEST = "credential_lease_request"
+LEASE_GRANT = "credential_lease_grant"
+LEASE_RELEASE = "credential_lease_release"
+
+
+class CredentialLeasePool:
+    """
+    Учёт аренды аккаунтов из CONFIG["users"]:
+    - выдаёт наименее загруженный аккаунт (при равенстве - по кругу)
+      или аккаунт с заданным индексом
+    - соблюдает лимит одновременных сессий на аккаунт (0 = без лимита)
+    """
+
+    def __init__(self, accounts_count, max_sessions_per_account=0):
+        self._lock = threading.Lock()
+        self._active = [0] * accounts_count
+        self._max_sessions = max_sessions_per_account
+        self._leases = {}
+        self._cursor = 0
+
+    def acquire(self, holder=None, index=None):
+        """Returns (lease_id, account_index) or None if every account (or the given one) is at its cap"""
+        with self._lock:
+            accounts_count = len(self._active)
+            candidates = (
+                [index] if index is not None
+                else [(self._cursor + offset) % accounts_count for offset in range(accounts_count)]
+            )
+            best = None
+            for candidate in candidates:
+                if self._max_sessions and self._active[candidate] >= self._max_sessions:
+                    continue
+                if best is None or self._active[candidate] < self._active[best]:
+                    best = candidate
+
+            if best is None:
+                return None
+
+            if index is None:
+                self._cursor = (best + 1) % accounts_count
+            self._active[best] += 1
+            lease_id = uuid.uuid4().hex
+            self._leases[lease_id] = (best, holder)
+            return lease_id, best
+
+    def release(self, lease_id):
+        """Return a lease; unknown lease ids are ignored"""
+        with self._lock:
+            lease = self._leases.pop(lease_id, None)
+            if lease is None:
+                return None
+            self._active[lease[0]] -= 1
+            return lease[0]
+
+    def release_holder(self, holder):
+        """Return every lease of the holder; returns the account indexes released"""
+        with self._lock:
+            lease_ids = [lease_id for lease_id, lease in self._leases.items() if lease[1] == holder]
+            indexes = []
+            for lease_id in lease_ids:
+                index = self._leases.pop(lease_id)[0]
+                self._active[index] -= 1
+                indexes.append(index)
+            return indexes
+
+    def holders(self):
+        with self._lock:
+            return {lease[1] for lease in self._leases.values()}
+
+    def active_sessions(self, index):
+        with self._lock:
+            return self._active[index]
+
+    def reset(self):
+        with self._lock:
+            self._active = [0] * len(self._active)
+            self._leases = {}
+            self._cursor = 0
+
+
+class CredentialLeasing:
+    """
+    Сервис аренды учётных данных:
+    - на master (или local runner) хранит единый CredentialLeasePool
+    - worker запрашивает аренду сообщением и ждёт ответа кооперативно
+    - пока все аккаунты заняты, запросы стоят в очереди на master
+    - аренды worker'а, который вышел или пропал по heartbeat, master
+      возвращает в пул сам
+    """
+
+    def __init__(self):
+        self._environment = None
+        self._pool = None
+        self._waiting = deque()
+        self._pending = {}
+        self._reclaimer = None
+
+    def setup(self, environment):
+        """Register master/worker message handlers (call from events.init)"""
+        self._environment = environment
+        self._pool = self._create_pool()
+        runner = environment.runner
+
+        if isinstance(runner, MasterRunner):
+            runner.register_message(LEASE_REQUEST, self._on_lease_request)
+            runner.register_message(LEASE_RELEASE, self._on_lease_release)
+            self._reclaimer = gevent.spawn(self._reclaim_loop, runner)
+            environment.events.quitting.add_listener(self._on_quitting)
+        elif isinstance(runner, WorkerRunner):
+            runner.register_message(LEASE_GRANT, self._on_lease_grant)
+
+        environment.events.test_start.add_listener(self._on_test_start)
+
+    def acquire(self, username=None):
+        """
+        Lease credentials for one virtual user (or of the given account):
+        returns (lease_id, creds) or (None, None)
+        """
+        settings = CONFIG.get("credential_leasing", {})
+        timeout = settings.get("acquire_timeout", 300)
+        start_time = time.time()
+        index = _account_index(username)
+
+        runner = self._environment.runner if self._environment else None
+        if isinstance(runner, WorkerRunner):
+            lease = self._wait_grant(self._send_request(runner, index), timeout)
+        else:
+            lease = self._acquire_local(timeout, index=index)
+
+        CREDENTIAL_LEASE_WAIT.observe(time.time() - start_time)
+        return _credentials(lease)
+
+    def request(self, username=None):
+        """
+        Queue a lease right away and wait for it later: AsyncResult of (lease_id, creds).
+        Requested from a test_start listener, the lease is served before those of the users.
+        """
+        timeout = CONFIG.get("credential_leasing", {}).get("acquire_timeout", 300)
+        index = _account_index(username)
+        result = AsyncResult()
+
+        runner = self._environment.runner if self._environment else None
+        if isinstance(runner, WorkerRunner):
+            request_id = self._send_request(runner, index)
+            gevent.spawn(lambda: result.set(_credentials(self._wait_grant(request_id, timeout))))
+        else:
+            lease = self._acquire_local(0, index=index)
+            if lease is not None:
+                result.set(_credentials(lease))
+            else:
+                gevent.spawn(lambda: result.set(_credentials(self._acquire_local(timeout, index=index))))
+        return result
+
+    def release(self, lease_id):
+        """Return a lease taken by acquire()"""
+        if not lease_id:
+            return
+
+        runner = self._environment.runner if self._environment else None
+        if isinstance(runner, WorkerRunner):
+            runner.send_message(LEASE_RELEASE, {"lease_id": lease_id})
+        else:
+            self._release_local(lease_id)
+
+    def _create_pool(self):
+        settings = CONFIG.get("credential_leasing", {})
+        return CredentialLeasePool(
+            len(CONFIG["users"]),
+            max_sessions_per_account=settings.get("max_sessions_per_account", 0),
+        )
+
+    def _acquire_local(self, timeout, holder=None, index=None):
+        if self._pool is None:
+            self._pool = self._create_pool()
+
+        deadline = time.time() + timeout
+        while True:
+            lease = self._pool.acquire(holder, index)
+            if lease is not None:
+                self._update_gauge(lease[1])
+                return lease
+            if time.time() >= deadline:
+                return None
+            time.sleep(1)
+
+    def _release_local(self, lease_id):
+        if self._pool is None:
+            return
+        index = self._pool.release(lease_id)
+        if index is not None:
+            self._update_gauge(index)
+
+    def _send_request(self, runner, index=None):
+        request_id = uuid.uuid4().hex
+        self._pending[request_id] = AsyncResult()
+        runner.send_message(LEASE_REQUEST, {"request_id": request_id, "index": index})
+        return request_id
+
+    def _wait_grant(self, request_id, timeout):
+        try:
+            grant = self._pending[request_id].get(timeout=timeout)
+        except Exception:
+            return None
+        finally:
+            self._pending.pop(request_id, None)
+
+        return grant["lease_id"], grant["index"]
+
+    def _update_gauge(self, index):
+        CREDENTIAL_LEASES.labels(username=CONFIG["users"][index]["username"]).set(
+            self._pool.active_sessions(index)
+        )
+
+    # Обработчики сообщений master
+    def _on_lease_request(self, environment, msg, **kwargs):
+        index = msg.data.get("index")
+        lease = self._pool.acquire(holder=msg.node_id, index=index)
+        if lease is None:
+            self._waiting.append((msg.node_id, msg.data["request_id"], index))
+            return
+        self._send_grant(environment.runner, msg.node_id, msg.data["request_id"], lease)
+
+    def _on_lease_release(self, environment, msg, **kwargs):
+        self._release_local(msg.data["lease_id"])
+        self._grant_waiting(environment.runner)
+
+    def _grant_waiting(self, runner):
+        # Отдаём освободившиеся места ожидающим запросам в порядке очереди;
+        # запрос конкретного аккаунта не задерживает остальные
+        waiting = deque()
+        for node_id, request_id, index in self._waiting:
+            lease = self._pool.acquire(holder=node_id, index=index)
+            if lease is None:
+                waiting.append((node_id, request_id, index))
+                continue
+            self._send_grant(runner, node_id, request_id, lease)
+        self._waiting = waiting
+
+    def _reclaim_loop(self, runner):
+        interval = CONFIG.get("credential_leasing", {}).get("reclaim_interval", 5)
+        while True:
+            gevent.sleep(interval)
+            self._reclaim(runner)
+
+    def _reclaim(self, runner):
+        """Release the leases of workers that quit or went missing"""
+        alive = {client.id for client in runner.clients.all if client.state != STATE_MISSING}
+        gone = {holder for holder in self._pool.holders() if holder not in alive}
+        if not gone:
+            return
+
+        for holder in gone:
+            for index in self._pool.release_holder(holder):
+                self._update_gauge(index)
+        self._waiting = deque(request for request in self._waiting if request[0] not in gone)
+        self._grant_waiting(runner)
+
+    def _on_quitting(self, **kwargs):
+        if self._reclaimer is not None:
+            self._reclaimer.kill(block=False)
+            self._reclaimer = None
+
+    def _send_grant(self, runner, node_id, request_id, lease):
+        self._update_gauge(lease[1])
+        runner.send_message(
+            LEASE_GRANT,
+            {"request_id": request_id, "lease_id": lease[0], "index": lease[1]},
+            client_id=node_id,
+        )
+
+    # Обработчик сообщений worker
+    def _on_lease_grant(self, environment, msg, **kwargs):
+        result = self._pending.get(msg.data["request_id"])
+        if result is None:
+            # Пользователь уже перестал ждать - сразу возвращаем аренду
+            environment.runner.send_message(LEASE_RELEASE, {"lease_id": msg.data["lease_id"]})
+            return
+        result.set(msg.data)
+
+    def _on_test_start(self, environment, **kwargs):
+        if isinstance(environment.runner, WorkerRunner):
+            return
+        self._waiting.clear()
+        if self._pool is not None:
+            self._pool.reset()
+
+
+def _account_index(username):
+    if username is None:
+        return None
+    return next(index for index, user in enumerate(CONFIG["users"]) if user["username"] == username)
+
+
+def _credentials(lease):
+    """(lease_id, creds) of a (lease_id, account_index) lease, (None, None) without a lease"""
+    if lease is None:
+        return None, None
+    lease_id, index = lease
+    return lease_id, CONFIG["users"][index]
+
+
+credential_leasing = CredentialLeasing()
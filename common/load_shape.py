@@ -0,0 +1,130 @@
+"""Config-driven load shape: staged ramps, spikes, plateaus and soak periods"""
+
+import time
+
+from locust import LoadTestShape
+
+from common.metrics import LOAD_STAGE, LOAD_STAGE_START, LOAD_TARGET_USERS
+from config import CONFIG
+
+STAGE_TYPES = ("ramp", "plateau", "spike", "soak")
+
+
+def get_load_profile():
+    return CONFIG.get("load_profile", {})
+
+
+def max_profile_users():
+    """Peak number of users over all stages of the load profile"""
+    stages = get_load_profile().get("stages", [])
+    return max((stage.get("users", 0) for stage in stages), default=1)
+
+
+class ConfigLoadShape(LoadTestShape):
+    """
+    Профиль нагрузки из секции load_profile конфига. Типы этапов:
+    - ramp: рост от уровня предыдущего этапа до users, ступенями
+      по step_users каждые step_duration секунд (без ступеней - через spawn_rate)
+    - plateau / soak: постоянное число users на duration секунд
+    - spike: резкий скачок до users с высоким spawn_rate
+    Для этапа можно задать user_classes: {ClassName: weight}. Locust берёт
+    веса из атрибута weight классов, поэтому на этапе они подменяются, а на
+    этапах без user_classes возвращаются веса из конфига.
+    """
+
+    def __init__(self):
+        super().__init__()
+        profile = get_load_profile()
+        self.stages = profile.get("stages", [])
+        self.default_spawn_rate = profile.get("default_spawn_rate", 1)
+        self._current_stage_index = None
+        self._configured_weights = None
+
+        for stage in self.stages:
+            if stage.get("type", "plateau") not in STAGE_TYPES:
+                raise ValueError(f"Unknown load profile stage type: {stage.get('type')}")
+
+    def tick(self):
+        run_time = self.get_run_time()
+
+        stage_start = 0
+        previous_users = 0
+        for index, stage in enumerate(self.stages):
+            duration = stage.get("duration", 0)
+            if run_time < stage_start + duration:
+                self._report_stage(index, stage)
+                users = self._stage_users(stage, run_time - stage_start, previous_users)
+                spawn_rate = self._stage_spawn_rate(stage)
+                LOAD_TARGET_USERS.set(users)
+
+                user_classes = self._stage_user_classes(stage)
+                if user_classes:
+                    return users, spawn_rate, user_classes
+                return users, spawn_rate
+
+            stage_start += duration
+            previous_users = stage.get("users", 0)
+
+        return None
+
+    def _stage_users(self, stage, elapsed, previous_users):
+        target = stage.get("users", 0)
+        if stage.get("type", "plateau") != "ramp":
+            return target
+
+        step_users = stage.get("step_users")
+        step_duration = stage.get("step_duration")
+        if not step_users or not step_duration:
+            return target
+
+        steps = int(elapsed // step_duration) + 1
+        if target >= previous_users:
+            return min(target, previous_users + steps * step_users)
+        return max(target, previous_users - steps * step_users)
+
+    def _stage_spawn_rate(self, stage):
+        if "spawn_rate" in stage:
+            return stage["spawn_rate"]
+        if stage.get("type") == "spike":
+            # Spike без явного spawn_rate выходит на пик примерно за секунду
+            return max(stage.get("users", 1), 1)
+        return self.default_spawn_rate
+
+    def _stage_user_classes(self, stage):
+        if self.runner is None:
+            return None
+        if self._configured_weights is None:
+            self._configured_weights = {
+                name: user_class.weight for name, user_class in self.runner.user_classes_by_name.items()
+            }
+
+        weights = stage.get("user_classes")
+        if not weights:
+            self._restore_weights()
+            return None
+
+        user_classes = []
+        for class_name, weight in weights.items():
+            user_class = self.runner.user_classes_by_name.get(class_name)
+            if user_class is None:
+                raise ValueError(f"Unknown user class in load profile: {class_name}")
+            user_class.weight = weight
+            user_classes.append(user_class)
+        return user_classes
+
+    def _restore_weights(self):
+        for name, weight in self._configured_weights.items():
+            self.runner.user_classes_by_name[name].weight = weight
+
+    def _report_stage(self, index, stage):
+        if index == self._current_stage_index:
+            return
+
+        self._current_stage_index = index
+        stage_name = stage.get("name", f"stage_{index + 1}")
+        LOAD_STAGE.set(index + 1)
+        LOAD_STAGE_START.labels(stage=stage_name).set(time.time())
+        print(
+            f"Load profile stage {index + 1}/{len(self.stages)}: {stage_name} "
+            f"({stage.get('type', 'plateau')}, {stage.get('users', 0)} users, {stage.get('duration', 0)}s)"
+        )
@@ -16,23 +16,48 @@ class FlowManager:
             return worker_id * 100000 + cls._counter
 
 
-class UserPool:
-    _lock = Lock()
-    _index = 0
+def worker_index(runner):
+    """Index of this worker assigned by master; 0 for a local run or before the worker connected"""
+    return max(getattr(runner, "worker_index", 0), 0)
 
-    @classmethod
-    def get_credentials(cls):
-        with cls._lock:
-            creds = CONFIG["users"][cls._index % len(CONFIG["users"])]
-            cls._index += 1
-            return creds
+
+def split_users(user_classes, total_users):
+    """
+    {class name: users} of total_users spread like Locust does:
+    fixed_count first, the rest by the configured weight (largest remainder)
+    """
+    counts = {}
+    for user_class in user_classes:
+        if getattr(user_class, "fixed_count", 0):
+            counts[user_class.__name__] = user_class.fixed_count
+    rest = max(total_users - sum(counts.values()), 0)
+
+    weighted = [user_class for user_class in user_classes if user_class.__name__ not in counts]
+    weights = {user_class.__name__: _configured_weight(user_class) for user_class in weighted}
+    total_weight = sum(weights.values())
+    if not weighted or not total_weight:
+        return counts
+
+    shares = [(name, rest * weight / total_weight) for name, weight in weights.items()]
+    for name, share in shares:
+        counts[name] = int(share)
+    remainder = rest - sum(counts[name] for name, _ in shares)
+    for name, share in sorted(shares, key=lambda item: item[1] - int(item[1]), reverse=True)[:remainder]:
+        counts[name] += 1
+    return counts
+
+
+def _configured_weight(user_class):
+    """Weight from the config, not the one a load profile stage set"""
+    return getattr(user_class, "config_weight", getattr(user_class, "weight", 1))
 
 
 class StopManager:
     """
     Менеджер для контроля выполнения:
-    - Отслеживает сколько пользователей завершили все свои итерации
-    - Останавливает тест когда ВСЕ пользователи завершили
+    - Отслеживает по каждому сценарию (классу пользователей), сколько
+      его пользователей завершили все свои итерации
+    - Останавливает тест когда ВСЕ пользователи сценариев с лимитом итераций завершили
     """
     _instance = None
     _lock = threading.Lock()
@@ -49,29 +74,31 @@ class StopManager:
         if not StopManager._initialized:
             self._lock = threading.Lock()
             self._iterations_per_user = CONFIG.get("max_iterations", 1)
-            self._total_users = 1
-            self._completed_users = 0
+            self._total_users = {}
+            self._completed_users = {}
             self._user_iterations = {}
             self._should_stop = False
             self._stop_called = False
             StopManager._initialized = True
 
     def setup_scenario(self, total_users):
-        """Настройка сценария при запуске теста"""
+        """
+        Настройка сценариев при запуске теста
+        total_users - {сценарий: число пользователей} сценариев с лимитом итераций
+        """
         with self._lock:
-            if total_users is None:
-                total_users = 1
-
-            self._total_users = total_users
-            self._completed_users = 0
+            self._total_users = {scenario: users for scenario, users in (total_users or {}).items() if users}
+            self._completed_users = {scenario: 0 for scenario in self._total_users}
             self._user_iterations = {}
             self._should_stop = False
             self._stop_called = False
             self._iterations_per_user = CONFIG.get("max_iterations", 1)
 
-    def user_completed_iteration(self, user_id):
+    def user_completed_iteration(self, user_id, max_iterations=None, scenario=None):
         """
         Пользователь завершил одну итерацию
+        max_iterations - лимит сценария пользователя (по умолчанию общий)
+        scenario - имя класса пользователей, в котором считается завершение
         Возвращает: (user_finished, global_stop)
         """
         with self._lock:
@@ -80,12 +107,15 @@ class StopManager:
 
             self._user_iterations[user_id] += 1
 
-            user_finished = self._user_iterations[user_id] >= self._iterations_per_user
+            iterations_limit = max_iterations or self._iterations_per_user
+            user_finished = self._user_iterations[user_id] == iterations_limit
 
             if user_finished:
-                self._completed_users += 1
+                self._completed_users[scenario] = self._completed_users.get(scenario, 0) + 1
 
-            global_stop = self._completed_users >= self._total_users
+            global_stop = bool(self._total_users) and all(
+                self._completed_users.get(name, 0) >= users for name, users in self._total_users.items()
+            )
 
             if global_stop and not self._should_stop:
                 self._should_stop = True
@@ -108,8 +138,12 @@ class StopManager:
         with self._lock:
             total_iterations = sum(self._user_iterations.values())
             return {
-                "completed_users": self._completed_users,
-                "total_users": self._total_users,
+                "completed_users": sum(self._completed_users.get(name, 0) for name in self._total_users),
+                "total_users": sum(self._total_users.values()),
+                "scenarios": {
+                    name: {"completed_users": self._completed_users.get(name, 0), "total_users": users}
+                    for name, users in self._total_users.items()
+                },
                 "iterations_per_user": self._iterations_per_user,
                 "total_iterations": total_iterations,
                 "user_iterations": dict(self._user_iterations),
@@ -118,4 +152,4 @@ class StopManager:
             }
 
 
-stop_manager = StopManager()
\ No newline at end of file
+stop_manager = StopManager()
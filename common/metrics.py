@@ -19,6 +19,12 @@ AUTH_ATTEMPTS = Counter(
     ["username", "success"],
 )
 
+SESSION_CACHE_LOOKUPS = Counter(
+    "superset_loadtest_session_cache_lookups_total",
+    "Authenticated session cache lookups",
+    ["result"],
+)
+
 CHUNK_UPLOADS = Counter(
     "superset_loadtest_chunk_uploads_total",
     "Total chunk uploads",
@@ -29,6 +35,50 @@ FLOW_CREATIONS = Counter(
     "superset_loadtest_flow_creations_total", "Total flow creations", ["status"]
 )
 
+ARRIVALS_STARTED = Counter(
+    "superset_loadtest_arrivals_started_total",
+    "Flow iterations started by the open-model arrival scheduler",
+)
+
+DASHBOARD_CHART_LOADS = Counter(
+    "superset_loadtest_dashboard_chart_loads_total",
+    "Chart data requests made while rendering dashboards",
+    ["status"],
+)
+
+FLOW_POOL_LEASES = Counter(
+    "superset_loadtest_flow_pool_leases_total",
+    "Flows requested from the pre-provisioned pool (hit) or created inline (miss)",
+    ["result"],
+)
+
+CLEANUP_DELETIONS = Counter(
+    "superset_loadtest_cleanup_deletions_total",
+    "Objects deleted by run cleanup",
+    ["kind", "status"],
+)
+
+UPLOADED_BYTES = Counter(
+    "superset_loadtest_uploaded_bytes_total",
+    "Bytes of CSV chunks uploaded successfully",
+)
+
+UPLOADED_PARTS = Counter(
+    "superset_loadtest_uploaded_parts_total",
+    "CSV chunks uploaded successfully",
+)
+
+PAGE_CACHE_READ_BYTES = Counter(
+    "superset_loadtest_page_cache_read_bytes_total",
+    "Dataset bytes read by the page cache reader, from page cache (hit) or disk (miss)",
+    ["result"],
+)
+
+HUB_BLOCKED_SECONDS = Counter(
+    "superset_loadtest_hub_blocked_seconds_total",
+    "Time the gevent hub was blocked longer than hub_blocked_threshold",
+)
+
 # Gauges
 ACTIVE_USERS = Gauge(
     "superset_loadtest_active_users", "Number of currently active users"
@@ -50,6 +100,94 @@ SESSION_STATUS = Gauge(
     ["username"],
 )
 
+CREDENTIAL_LEASES = Gauge(
+    "superset_loadtest_credential_leases",
+    "Number of virtual users currently leasing an account",
+    ["username"],
+)
+
+LOAD_STAGE = Gauge(
+    "superset_loadtest_load_stage", "Index of the current load profile stage (1-based)"
+)
+
+LOAD_STAGE_START = Gauge(
+    "superset_loadtest_load_stage_start_timestamp_seconds",
+    "Unix time when a load profile stage started",
+    ["stage"],
+)
+
+LOAD_TARGET_USERS = Gauge(
+    "superset_loadtest_load_target_users", "Target user count of the load profile"
+)
+
+ARRIVALS_IN_FLIGHT = Gauge(
+    "superset_loadtest_arrivals_in_flight",
+    "Flow iterations admitted by the arrival scheduler and still running",
+)
+
+ARRIVAL_TARGET_RATE = Gauge(
+    "superset_loadtest_arrival_target_rate",
+    "Target arrival rate of this worker in flows per minute",
+)
+
+INFLIGHT_JOBS = Gauge(
+    "superset_loadtest_inflight_jobs",
+    "ETL/PM runs started by this worker and still being monitored",
+    ["kind"],
+)
+
+INFLIGHT_TARGET = Gauge(
+    "superset_loadtest_inflight_target",
+    "Target number of in-flight runs for this worker",
+)
+
+PIPELINE_IN_FLIGHT = Gauge(
+    "superset_loadtest_pipeline_in_flight",
+    "Flows in the per-user pipeline (uploading or being processed)",
+)
+
+FLOW_POOL_SIZE = Gauge(
+    "superset_loadtest_flow_pool_size",
+    "Ready flows left in the pre-provisioned pool of this worker",
+)
+
+FLOW_POOL_PROVISION_DURATION = Gauge(
+    "superset_loadtest_flow_pool_provision_seconds",
+    "Duration of the last flow pool provisioning phase",
+)
+
+DATASET_SCAN_DURATION = Gauge(
+    "superset_loadtest_dataset_scan_seconds",
+    "Duration of the last CSV dataset scan on this worker",
+)
+
+DATASET_VALIDATION_DURATION = Gauge(
+    "superset_loadtest_dataset_validation_seconds",
+    "Duration of the last CSV dataset schema validation on this worker",
+)
+
+DATASET_AGGREGATE_DURATION = Gauge(
+    "superset_loadtest_dataset_aggregate_seconds",
+    "Duration of the last pass computing expected aggregates of a CSV dataset on this worker",
+)
+
+PAGE_CACHE_HIT_RATIO = Gauge(
+    "superset_loadtest_page_cache_hit_ratio",
+    "Share of dataset bytes served from page cache since the worker started",
+)
+
+UPLOAD_THROUGHPUT_BYTES = Gauge(
+    "superset_loadtest_upload_throughput_bytes_per_second",
+    "Sustained chunk upload throughput over the throughput window",
+    ["scope"],
+)
+
+UPLOAD_THROUGHPUT_PARTS = Gauge(
+    "superset_loadtest_upload_throughput_parts_per_second",
+    "Sustained chunk upload rate over the throughput window",
+    ["scope"],
+)
+
 # Histograms
 REQUEST_DURATION = Histogram(
     "superset_loadtest_request_duration_seconds",
@@ -70,12 +208,81 @@ CHUNK_UPLOAD_DURATION = Histogram(
     buckets=[0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0],
 )
 
+CREDENTIAL_LEASE_WAIT = Histogram(
+    "superset_loadtest_credential_lease_wait_seconds",
+    "Time spent waiting for a credential lease",
+    buckets=[0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0],
+)
+
+THROTTLE_DELAY = Histogram(
+    "superset_loadtest_throttle_delay_seconds",
+    "Client-side rate limiter delay before sending a request",
+    ["endpoint_class"],
+    buckets=[0.0, 0.01, 0.1, 0.5, 1.0, 5.0, 30.0],
+)
+
+ARRIVAL_LATENESS = Histogram(
+    "superset_loadtest_arrival_lateness_seconds",
+    "Delay between scheduled arrival and actual start of a flow iteration",
+    buckets=[0.0, 0.1, 1.0, 5.0, 30.0, 60.0, 300.0, 900.0],
+)
+
+CHUNK_READ_WAIT = Histogram(
+    "superset_loadtest_chunk_read_wait_seconds",
+    "Time an upload waited for the next CSV chunk to be read from disk",
+    buckets=[0.0, 0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0],
+)
+
+CONVOY_WAIT = Histogram(
+    "superset_loadtest_convoy_wait_seconds",
+    "Time a dataset reader waited for followers in convoy mode",
+    buckets=[0.0, 0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0],
+)
+
+HUB_LOOP_LAG = Histogram(
+    "superset_loadtest_hub_loop_lag_seconds",
+    "Delay of the gevent hub monitor wakeup past its interval",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0],
+)
+
+ADMISSION_WAIT = Histogram(
+    "superset_loadtest_admission_wait_seconds",
+    "Time an iteration waited for the in-flight jobs controller",
+    buckets=[0.0, 1.0, 5.0, 30.0, 60.0, 300.0, 900.0, 3600.0],
+)
+
 FLOW_PROCESSING_DURATION = Histogram(
     "superset_loadtest_flow_processing_duration_seconds",
     "Flow processing duration in seconds",
     ["flow_id"],
 )
 
+DASHBOARD_TIME_TO_FIRST_CHART = Histogram(
+    "superset_loadtest_dashboard_time_to_first_chart_seconds",
+    "Time from opening a dashboard until its first chart data arrived",
+    buckets=[0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0],
+)
+
+DASHBOARD_TIME_TO_LAST_CHART = Histogram(
+    "superset_loadtest_dashboard_time_to_last_chart_seconds",
+    "Time from opening a dashboard until all its chart data arrived",
+    buckets=[0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0],
+)
+
+PIPELINE_STAGE_DURATION = Histogram(
+    "superset_loadtest_pipeline_stage_duration_seconds",
+    "Duration of a Process Mining iteration stage",
+    ["stage"],
+    buckets=[1.0, 5.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0],
+)
+
+PM_ONLY_DURATION = Histogram(
+    "superset_loadtest_pm_only_duration_seconds",
+    "PM-only run duration from DAG params to final status",
+    ["table_name", "status"],
+    buckets=[10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0],
+)
+
 # Database metrics
 COUNT_VALIDATION_RESULT = Gauge(
     "superset_loadtest_COUNT_VALIDATION_RESULT",
@@ -83,12 +290,20 @@ COUNT_VALIDATION_RESULT = Gauge(
     ["flow_id"],
 )
 
+AGGREGATE_MISMATCHES = Counter(
+    "superset_loadtest_aggregate_mismatches_total",
+    "Loaded tables whose aggregate differs from the value expected from the dataset",
+    ["aggregate"],
+)
+
 DB_ROW_COUNT = Gauge(
     "superset_loadtest_db_row_count", "Number of rows in target table", ["flow_id"]
 )
 
 EXPECTED_ROWS = Gauge(
-    "superset_loadtest_expected_rows", "Expected number of rows from CSV"
+    "superset_loadtest_expected_rows",
+    "Expected number of rows from CSV",
+    ["flow_id"],
 )
 
 
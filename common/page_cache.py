@@ -0,0 +1,208 @@
+"""Page-cache-aware reading of CSV datasets larger than RAM"""
+
+import codecs
+import io
+import os
+import threading
+import time
+
+import gevent
+from gevent.event import Event
+from locust.runners import MasterRunner
+
+from common.csv_utils import split_text_chunks
+from common.metrics import CONVOY_WAIT, PAGE_CACHE_HIT_RATIO, PAGE_CACHE_READ_BYTES
+from config import CONFIG
+
+
+def get_page_cache_settings():
+    return CONFIG.get("page_cache", {})
+
+
+class FileReaders:
+    """Позиции активных читателей одного файла"""
+
+    def __init__(self):
+        self.positions = {}
+        self.changed = Event()
+        self.dropped_upto = 0
+
+    def notify(self):
+        changed, self.changed = self.changed, Event()
+        changed.set()
+
+
+class PageCacheReader:
+    """
+    Чтение CSV с учётом page cache:
+    - POSIX_FADV_SEQUENTIAL при открытии: ядро читает вперёд агрессивнее
+    - блоки читаются в пуле потоков gevent hub, следующий - пока
+      отправляется текущий
+    - перед чтением блока проба preadv(RWF_NOWAIT) возвращает только
+      данные из page cache: так считается доля попаданий
+    - drop_behind: POSIX_FADV_DONTNEED для страниц позади самого
+      отстающего читателя файла, они не вытесняют нужные остальным
+    - convoy: читатель не уходит дальше convoy_window от читателей,
+      идущих следом в пределах окна; группа читает одни страницы из кэша
+
+    Чанки совпадают с split_csv_generator: байты декодируются как в
+    текстовом режиме open() и режутся по chunk_size символов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._probe = hasattr(os, "preadv") and hasattr(os, "RWF_NOWAIT")
+        self._hit_bytes = 0
+        self._miss_bytes = 0
+
+    @property
+    def enabled(self):
+        return get_page_cache_settings().get("enabled", False)
+
+    def setup(self, environment):
+        """Print the hit ratio at test_stop (call from events.init)"""
+        if not isinstance(environment.runner, MasterRunner):
+            environment.events.test_stop.add_listener(self._on_test_stop)
+
+    def chunks(self, file_path, chunk_size=4 * 1024 * 1024):
+        """CSV chunks of complete lines, same as split_csv_generator"""
+        if not os.path.exists(file_path):
+            yield None
+            return
+
+        settings = get_page_cache_settings()
+        block_size = settings.get("block_size") or chunk_size
+        threadpool = gevent.get_hub().threadpool
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+        reader = object()
+        readers = self._join(file_path, reader)
+        fd = os.open(file_path, os.O_RDONLY)
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        state = {"offset": 0, "text": "", "eof": False}
+        pending = None
+
+        def read_block(offset):
+            self._wait_for_followers(readers, reader, offset, block_size, settings)
+            return threadpool.spawn(self._read_block, fd, offset, block_size)
+
+        def read(size):
+            nonlocal pending
+            while len(state["text"]) < size and not state["eof"]:
+                data = pending.get()
+                pending = None
+                state["offset"] += len(data)
+                self._advance(readers, reader, state["offset"], fd, block_size, settings)
+                if data:
+                    state["text"] += decoder.decode(data)
+                    pending = read_block(state["offset"])
+                else:
+                    state["text"] += decoder.decode(b"", final=True)
+                    state["eof"] = True
+            text, state["text"] = state["text"][:size], state["text"][size:]
+            return text
+
+        try:
+            pending = read_block(0)
+            yield from split_text_chunks(read, chunk_size)
+        finally:
+            self._leave(file_path, readers, reader)
+            # Файл нельзя закрыть, пока блок читается в потоке
+            if pending is not None:
+                pending.rawlink(lambda result: os.close(fd))
+            else:
+                os.close(fd)
+
+    def hit_ratio(self):
+        with self._lock:
+            total = self._hit_bytes + self._miss_bytes
+            return self._hit_bytes / total if total else 0.0
+
+    def _read_block(self, fd, offset, size):
+        # Выполняется в отдельном потоке: без обращений к gevent
+        cached = b""
+        if self._probe:
+            buffer = bytearray(size)
+            try:
+                cached = bytes(buffer[:os.preadv(fd, [buffer], offset, os.RWF_NOWAIT)])
+            except BlockingIOError:
+                pass
+            except OSError:
+                # Файловая система не поддерживает RWF_NOWAIT
+                self._probe = False
+
+        data = cached
+        if len(cached) < size:
+            data += os.pread(fd, size - len(cached), offset + len(cached))
+        if self._probe:
+            self._count(len(cached), len(data) - len(cached))
+        return data
+
+    def _count(self, hit_bytes, miss_bytes):
+        if hit_bytes:
+            PAGE_CACHE_READ_BYTES.labels(result="hit").inc(hit_bytes)
+        if miss_bytes:
+            PAGE_CACHE_READ_BYTES.labels(result="miss").inc(miss_bytes)
+        with self._lock:
+            self._hit_bytes += hit_bytes
+            self._miss_bytes += miss_bytes
+        PAGE_CACHE_HIT_RATIO.set(self.hit_ratio())
+
+    def _join(self, file_path, reader):
+        with self._lock:
+            readers = self._files.setdefault(file_path, FileReaders())
+            readers.positions[reader] = 0
+        readers.notify()
+        return readers
+
+    def _leave(self, file_path, readers, reader):
+        with self._lock:
+            readers.positions.pop(reader, None)
+            if not readers.positions and self._files.get(file_path) is readers:
+                del self._files[file_path]
+        readers.notify()
+
+    def _wait_for_followers(self, readers, reader, offset, size, settings):
+        """Wait while reading the block would leave a follower behind the convoy window"""
+        if not settings.get("convoy", False):
+            return
+
+        window = settings.get("convoy_window", 256 * 1024 * 1024)
+        wait_start = time.time()
+        deadline = wait_start + settings.get("convoy_max_wait", 5)
+        while True:
+            changed = readers.changed
+            followers = [
+                position for other, position in list(readers.positions.items())
+                if other is not reader and offset - window <= position < offset + size - window
+            ]
+            remaining = deadline - time.time()
+            if not followers or remaining <= 0:
+                break
+            changed.wait(remaining)
+        CONVOY_WAIT.observe(time.time() - wait_start)
+
+    def _advance(self, readers, reader, offset, fd, size, settings):
+        readers.positions[reader] = offset
+        readers.notify()
+        if not settings.get("drop_behind", False) or not hasattr(os, "posix_fadvise"):
+            return
+
+        # Страницы позади самого отстающего читателя больше не нужны этому проходу
+        tail = min(readers.positions.values())
+        readers.dropped_upto = min(readers.dropped_upto, tail)
+        if tail - readers.dropped_upto >= size:
+            os.posix_fadvise(fd, readers.dropped_upto, tail - readers.dropped_upto, os.POSIX_FADV_DONTNEED)
+            readers.dropped_upto = tail
+
+    def _on_test_stop(self, environment, **kwargs):
+        if self.enabled and (self._hit_bytes or self._miss_bytes):
+            print(
+                f"Page cache: hit ratio {self.hit_ratio():.1%}, "
+                f"{self._hit_bytes / 1024 ** 2:.0f} MB from cache, {self._miss_bytes / 1024 ** 2:.0f} MB from disk"
+            )
+
+
+page_cache_reader = PageCacheReader()
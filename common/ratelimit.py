@@ -0,0 +1,123 @@
+"""Token-bucket rate limiting of requests per endpoint class"""
+
+import threading
+import time
+
+from common.cluster import register_worker_share
+from common.metrics import THROTTLE_DELAY
+from config import CONFIG
+
+RATE_LIMIT_SHARE = "rate_limit_share"
+
+LOGIN = "login"
+FLOW_MANAGEMENT = "flow_management"
+CHUNK_UPLOAD = "chunk_upload"
+STATUS_POLL = "status_poll"
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием:
+    - rate токенов в секунду, не больше burst накопленных
+    - запрос сразу резервирует токен и спит ровно до момента его появления,
+      поэтому ожидающие обслуживаются в порядке прихода
+    """
+
+    def __init__(self, rate, burst):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self._rate = rate
+
+    def acquire(self):
+        """Take one token, sleeping if needed; returns seconds waited"""
+        with self._lock:
+            if self._rate <= 0:
+                return 0.0
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate > 0:
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class RateLimiter:
+    """
+    Общие для всех пользователей worker'а лимиты по классам эндпоинтов.
+    В режиме scope: cluster master делит заданный rate между workers поровну.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = None
+        self._share = 1.0
+
+    def setup(self, environment):
+        """Register cluster coordination handlers (call from events.init)"""
+        register_worker_share(environment, RATE_LIMIT_SHARE, self._on_share)
+
+    def throttle(self, endpoint_class):
+        """Wait for a token of the endpoint class; returns seconds waited"""
+        if not endpoint_class or not CONFIG.get("rate_limits", {}).get("enabled", False):
+            return 0.0
+
+        bucket = self._get_buckets().get(endpoint_class)
+        if bucket is None:
+            return 0.0
+
+        wait = bucket.acquire()
+        THROTTLE_DELAY.labels(endpoint_class=endpoint_class).observe(wait)
+        return wait
+
+    def set_share(self, share):
+        with self._lock:
+            self._share = share
+            for endpoint_class, bucket in self._get_buckets().items():
+                bucket.set_rate(self._bucket_settings(endpoint_class).get("rate", 0) * share)
+
+    def _get_buckets(self):
+        if self._buckets is None:
+            buckets = {}
+            for endpoint_class, settings in CONFIG.get("rate_limits", {}).get("buckets", {}).items():
+                buckets[endpoint_class] = TokenBucket(
+                    settings.get("rate", 0) * self._share,
+                    settings.get("burst", 1),
+                )
+            self._buckets = buckets
+        return self._buckets
+
+    @staticmethod
+    def _bucket_settings(endpoint_class):
+        return CONFIG.get("rate_limits", {}).get("buckets", {}).get(endpoint_class, {})
+
+    def _on_share(self, share):
+        if CONFIG.get("rate_limits", {}).get("scope", "worker") == "cluster":
+            self.set_share(share)
+
+
+def endpoint_class_for(url):
+    """Map a request URL to its rate limit bucket"""
+    if "/etl/api/v1/file/upload" in url:
+        return CHUNK_UPLOAD
+    if "/file/status/" in url or "/flow/status/" in url:
+        return STATUS_POLL
+    if "/etl/api/v1/flow" in url or "/etl/api/v1/file/" in url:
+        return FLOW_MANAGEMENT
+    return None
+
+
+rate_limiter = RateLimiter()
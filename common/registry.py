@@ -0,0 +1,142 @@
+"""Local persistent registries of objects created by earlier runs"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from locust.runners import MasterRunner, WorkerRunner
+
+from common.managers import worker_index
+from config import CONFIG
+
+RUN_ID_MESSAGE = "run_id"
+
+
+class LocalRegistry:
+    """
+    Append-only JSON lines файл на хосте генератора нагрузки:
+    - записи добавляются строкой целиком, поэтому файл можно писать
+      из нескольких workers одного хоста
+    - битые (недописанные) строки при чтении пропускаются
+    - удаление дописывает надгробие {"removed": фильтр}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        record = {"created_at": time.time(), **record}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+    def load(self, **filters):
+        """All records whose fields equal the given filters, except removed ones"""
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        # Надгробия по набору полей фильтра: {поля: {значения: номер строки последнего}}
+        tombstones = defaultdict(dict)
+        with open(self.path, "r", encoding="utf-8") as file:
+            for position, line in enumerate(file):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("removed"):
+                    fields = tuple(sorted(record["removed"]))
+                    tombstones[fields][_values(record["removed"], fields)] = position
+                elif _matches(record, filters):
+                    records.append((position, record))
+
+        return [
+            record for position, record in records
+            if not any(removed.get(_values(record, fields), -1) > position for fields, removed in tombstones.items())
+        ]
+
+    def remove(self, **filters):
+        """Append a tombstone: load() skips earlier records matching the filters"""
+        self.add({"removed": filters})
+
+
+def _matches(record, filters):
+    return all(record.get(key) == value for key, value in filters.items())
+
+
+def _values(record, fields):
+    """Hashable key of the record's values of fields"""
+    return json.dumps([record.get(field) for field in fields])
+
+
+class RunLedger(LocalRegistry):
+    """
+    Журнал созданных на стенде объектов (flows, таблицы, дашборды) для очистки:
+    - каждый объект записывается с run_id, аккаунтом-владельцем и индексом
+      worker, который его создал
+    - удаление дописывает запись-надгробие deleted: true
+    - run_id запуска задаёт переменная окружения RUN_ID, иначе время старта;
+      master рассылает свой run_id workers при старте теста
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.run_id = os.getenv("RUN_ID") or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._runner = None
+
+    def setup(self, environment):
+        """Share the master's run_id with the workers (call from events.init before other setups)"""
+        runner = self._runner = environment.runner
+        if isinstance(runner, MasterRunner):
+            environment.events.test_start.add_listener(
+                lambda environment, **kwargs: environment.runner.send_message(RUN_ID_MESSAGE, self.run_id)
+            )
+        elif isinstance(runner, WorkerRunner):
+            runner.register_message(RUN_ID_MESSAGE, self._on_run_id)
+
+    def _on_run_id(self, environment, msg, **kwargs):
+        self.run_id = msg.data
+
+    def record(self, kind, object_id, **fields):
+        self.add({
+            "run_id": self.run_id, "worker": worker_index(self._runner),
+            "kind": kind, "object_id": object_id, **fields,
+        })
+
+    def mark_deleted(self, record):
+        self.add({
+            "run_id": record.get("run_id"),
+            "kind": record["kind"],
+            "object_id": record["object_id"],
+            "deleted": True,
+        })
+
+    def pending(self, run_id=None, worker=None):
+        """Objects not deleted yet, one record per object; run_id/worker=None - of all runs/workers"""
+        records = {}
+        deleted = set()
+        filters = {"run_id": run_id} if run_id else {}
+        for record in self.load(**filters):
+            key = (record.get("kind"), record.get("object_id"))
+            if record.get("deleted"):
+                deleted.add(key)
+            elif worker is None or record.get("worker", 0) == worker:
+                records.setdefault(key, record)
+        return [record for key, record in records.items() if key not in deleted]
+
+
+def get_registry_path(name, default):
+    return CONFIG.get("registries", {}).get(name, default)
+
+
+dashboard_registry = LocalRegistry(get_registry_path("dashboards", "./registry/dashboards.jsonl"))
+table_registry = LocalRegistry(get_registry_path("tables", "./registry/tables.jsonl"))
+run_ledger = RunLedger(get_registry_path("ledger", "./registry/ledger.jsonl"))
@@ -0,0 +1,331 @@
+"""Local SQLite store of run results and cross-run comparison"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import gevent
+from gevent.threadpool import ThreadPool
+from locust.runners import MasterRunner
+
+from common.dataset import dataset_catalog
+from common.registry import run_ledger
+from config import CONFIG
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL,
+    finished_at REAL,
+    base_url TEXT,
+    config_hash TEXT,
+    dataset_path TEXT,
+    dataset_bytes INTEGER,
+    dataset_rows INTEGER,
+    scenarios TEXT
+);
+CREATE TABLE IF NOT EXISTS phase_timings (
+    run_id TEXT,
+    scenario TEXT,
+    phase TEXT,
+    duration REAL,
+    success INTEGER,
+    recorded_at REAL
+);
+CREATE INDEX IF NOT EXISTS phase_timings_run ON phase_timings (run_id, phase);
+CREATE TABLE IF NOT EXISTS baselines (
+    name TEXT PRIMARY KEY,
+    run_id TEXT
+);
+"""
+
+INSERT_PHASES = (
+    "INSERT INTO phase_timings (run_id, scenario, phase, duration, success, recorded_at) VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def get_results_settings():
+    return CONFIG.get("results", {})
+
+
+def config_hash():
+    """Hash of the configuration without credentials"""
+    config = {key: value for key, value in CONFIG.items() if key != "users"}
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResultsStore:
+    """
+    Результаты запусков в SQLite:
+    - runs: стенд, хэш конфига, размер датасета, сценарии
+    - phase_timings: длительность и исход каждой фазы итерации
+      (chunk_upload, file_processing, pm_processing, dashboard, iteration, ...)
+    Записи копятся в буфере и пишутся пачками в отдельном потоке ОС
+    (пул из одного потока, одно соединение на запуск), чтобы ожидание
+    блокировки файла не останавливало gevent. Ошибки записи логируются,
+    пачка отбрасывается. Workers одного хоста пишут в один файл под run_id,
+    полученным от master (run_ledger.run_id).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._schema_ready = False
+        self._connection = None
+        self._writer = None
+
+    @property
+    def enabled(self):
+        return get_results_settings().get("enabled", False)
+
+    def setup(self, environment):
+        """Register run start/stop hooks (call from events.init)"""
+        if not self.enabled or isinstance(environment.runner, MasterRunner):
+            return
+        environment.events.test_start.add_listener(self._on_test_start)
+        environment.events.test_stop.add_listener(self._on_test_stop)
+        environment.events.quitting.add_listener(self._on_quitting)
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            connection.executescript(SCHEMA)
+            self._schema_ready = True
+        return connection
+
+    def start_run(self):
+        dataset = dataset_catalog.summary()
+        scenarios = [
+            name for name, settings in (CONFIG.get("scenarios") or {}).items()
+            if (settings or {}).get("enabled", True)
+        ]
+        self._submit(
+            "INSERT OR IGNORE INTO runs (run_id, started_at, base_url, config_hash, dataset_path, "
+            "dataset_bytes, dataset_rows, scenarios) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_ledger.run_id, time.time(), CONFIG["api"]["base_url"], config_hash(), dataset["path"],
+              dataset["size_bytes"], dataset["total_lines"], json.dumps(scenarios))],
+        )
+
+    def finish_run(self):
+        self.flush()
+        self._submit("UPDATE runs SET finished_at = ? WHERE run_id = ?", [(time.time(), run_ledger.run_id)])
+        self.drain()
+
+    def record(self, scenario, phase, duration, success=True):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._buffer.append((run_ledger.run_id, scenario, phase, duration, int(bool(success)), time.time()))
+            if len(self._buffer) < get_results_settings().get("batch_size", 500):
+                return
+            rows, self._buffer = self._buffer, []
+        self._submit(INSERT_PHASES, rows)
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if rows:
+            self._submit(INSERT_PHASES, rows)
+
+    def drain(self, timeout=60):
+        """Wait until the writer thread has stored everything submitted so far"""
+        if self._writer is None:
+            return
+        try:
+            self._writer.spawn(lambda: None).get(timeout=timeout)
+        except gevent.Timeout:
+            print(f"Results store: writes still pending after {timeout}s")
+
+    def _submit(self, sql, rows):
+        """Queue a write to the writer thread without blocking the calling greenlet"""
+        if self._writer is None:
+            self._writer = ThreadPool(1)
+        self._writer.spawn(self._execute_logged, sql, rows)
+
+    def _execute_logged(self, sql, rows):
+        try:
+            self._execute(sql, rows)
+        except sqlite3.Error as error:
+            print(f"Results store: dropped {len(rows)} rows: {error}")
+
+    def _execute(self, sql, rows):
+        """Runs on the writer thread: one connection for the whole run"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        with self._connection:
+            self._connection.executemany(sql, rows)
+
+    def _write(self, rows):
+        self._execute(INSERT_PHASES, rows)
+
+    # Чтение для CLI
+    def runs(self):
+        with self.connect() as connection:
+            return connection.execute(
+                "SELECT r.run_id, r.started_at, r.base_url, r.config_hash, r.dataset_bytes, "
+                "COUNT(p.phase), AVG(p.success) FROM runs r "
+                "LEFT JOIN phase_timings p ON p.run_id = r.run_id AND p.phase = 'iteration' "
+                "GROUP BY r.run_id ORDER BY r.started_at"
+            ).fetchall()
+
+    def run_info(self, run_id):
+        with self.connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            return dict(row) if row else None
+
+    def phase_samples(self, run_id):
+        """{phase: ([durations of successful phases], successes, total)}"""
+        samples = {}
+        with self.connect() as connection:
+            for phase, duration, success in connection.execute(
+                    "SELECT phase, duration, success FROM phase_timings WHERE run_id = ?", (run_id,)
+            ):
+                durations, successes, total = samples.get(phase, ([], 0, 0))
+                if success:
+                    durations.append(duration)
+                samples[phase] = (durations, successes + success, total + 1)
+        return samples
+
+    def set_baseline(self, name, run_id):
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO baselines (name, run_id) VALUES (?, ?)", (name, run_id))
+
+    def baseline(self, name):
+        with self.connect() as connection:
+            row = connection.execute("SELECT run_id FROM baselines WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def _on_test_start(self, environment, **kwargs):
+        self.start_run()
+
+    def _on_test_stop(self, environment, **kwargs):
+        self.finish_run()
+
+    def _on_quitting(self, **kwargs):
+        self.flush()
+        self.drain()
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile, q in [0, 100]"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def mann_whitney_u(baseline, candidate):
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation with tie correction)"""
+    n1, n2 = len(baseline), len(candidate)
+    if n1 < 2 or n2 < 2:
+        return None
+
+    ranked = sorted([(value, 0) for value in baseline] + [(value, 1) for value in candidate])
+    ranks = [0.0] * len(ranked)
+    tie_term = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2.0 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2.0) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def two_proportion_p(successes1, total1, successes2, total2):
+    """Two-sided p-value of the two-proportion z-test"""
+    if not total1 or not total2:
+        return None
+    pooled = (successes1 + successes2) / (total1 + total2)
+    variance = pooled * (1 - pooled) * (1 / total1 + 1 / total2)
+    if variance <= 0:
+        return 1.0
+    z = abs(successes1 / total1 - successes2 / total2) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
+
+
+def compare_runs(store, baseline_run, candidate_run, alpha=0.05, tolerance=0.05):
+    """
+    Per-phase comparison rows and overall verdict.
+    A phase regresses when the difference is significant (p < alpha)
+    and the median duration grew (or success rate fell) by more than tolerance,
+    or when the candidate has no successful samples of a phase the baseline has.
+    """
+    baseline = store.phase_samples(baseline_run)
+    candidate = store.phase_samples(candidate_run)
+    rows = []
+    regressions = 0
+
+    for phase in sorted(set(baseline) & set(candidate)):
+        base_durations, base_successes, base_total = baseline[phase]
+        cand_durations, cand_successes, cand_total = candidate[phase]
+
+        base_median = percentile(base_durations, 50)
+        cand_median = percentile(cand_durations, 50)
+        change = None
+        if base_median and cand_median is not None:
+            change = (cand_median - base_median) / base_median
+        p_value = mann_whitney_u(base_durations, cand_durations)
+
+        base_rate = base_successes / base_total
+        cand_rate = cand_successes / cand_total
+        rate_p = two_proportion_p(base_successes, base_total, cand_successes, cand_total)
+
+        verdict = "ok"
+        if p_value is not None and p_value < alpha and change is not None:
+            if change > tolerance:
+                verdict = "REGRESSION"
+            elif change < -tolerance:
+                verdict = "improvement"
+        if rate_p is not None and rate_p < alpha and base_rate - cand_rate > tolerance:
+            verdict = "REGRESSION"
+        if base_durations and not cand_durations:
+            # Фаза ни разу не завершилась успешно: длительности не с чем сравнивать
+            verdict = "REGRESSION"
+        if verdict == "REGRESSION":
+            regressions += 1
+
+        rows.append({
+            "phase": phase,
+            "baseline_n": len(base_durations),
+            "candidate_n": len(cand_durations),
+            "baseline_median": base_median,
+            "candidate_median": cand_median,
+            "baseline_p95": percentile(base_durations, 95),
+            "candidate_p95": percentile(cand_durations, 95),
+            "change": change,
+            "p_value": p_value,
+            "baseline_success": base_rate,
+            "candidate_success": cand_rate,
+            "verdict": verdict,
+        })
+
+    return rows, regressions
+
+
+results_store = ResultsStore(get_results_settings().get("path", "./results/results.sqlite"))
@@ -0,0 +1,212 @@
+"""Streaming validation of CSV datasets against upload_columns"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from config import CONFIG
+
+# Токены date_format (Java SimpleDateFormat) -> регулярные выражения
+DATE_TOKENS = [
+    ("yyyy", r"\d{4}"),
+    ("MM", r"(?:0[1-9]|1[0-2])"),
+    ("dd", r"(?:0[1-9]|[12]\d|3[01])"),
+    ("HH", r"(?:[01]\d|2[0-3])"),
+    ("mm", r"[0-5]\d"),
+    ("ss", r"[0-5]\d"),
+    ("SSS", r"\d{3}"),
+]
+
+VALUE_PATTERNS = {
+    "int": r"-?\d+",
+    "float": r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?",
+}
+
+
+def date_pattern(date_format):
+    """Regex of the values of a date_format like yyyy-MM-dd HH:mm:ss"""
+    pattern = ""
+    position = 0
+    while position < len(date_format):
+        for token, token_pattern in DATE_TOKENS:
+            if date_format.startswith(token, position):
+                pattern += token_pattern
+                position += len(token)
+                break
+        else:
+            pattern += re.escape(date_format[position])
+            position += 1
+    return pattern
+
+
+def value_pattern(column, delimiter=","):
+    """Regex of one value of the column; empty values (NULL) are allowed"""
+    if column.get("column_type") == "date" and column.get("date_format"):
+        return date_pattern(column["date_format"])
+    if column.get("column_type") in VALUE_PATTERNS:
+        return VALUE_PATTERNS[column["column_type"]]
+    # Строка: без разделителя или в кавычках, без переводов строк внутри
+    separator = re.escape(delimiter)
+    return rf'[^{separator}"\n]*|"(?:[^"\n]|"")*"'
+
+
+def read_lines(file_path, block_size, start=0, end=None):
+    """Blocks of complete lines of the byte range [start, end) of the file"""
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        remaining = (end if end is not None else os.path.getsize(file_path)) - start
+        leftover = b""
+        while True:
+            block = file.read(min(block_size, remaining)) if remaining > 0 else b""
+            remaining -= len(block)
+            if not block:
+                if leftover:
+                    yield leftover
+                return
+            block = leftover + block
+            last_newline = block.rfind(b"\n")
+            if last_newline == -1:
+                leftover = block
+                continue
+            leftover = block[last_newline + 1:]
+            yield block[:last_newline + 1]
+
+
+def line_boundaries(file_path, parts):
+    """Offsets splitting the file into about parts ranges of whole lines"""
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, "rb") as file:
+        for part in range(1, parts):
+            file.seek(max(size * part // parts, boundaries[-1]))
+            file.readline()
+            if file.tell() >= size:
+                break
+            boundaries.append(file.tell())
+    return boundaries + [size]
+
+
+def validate_range(file_path, start, end, columns, delimiter, block_size, max_errors):
+    """Validate one byte range; runs in a worker process"""
+    return SchemaValidator(columns, delimiter).validate_range(file_path, start, end, block_size, max_errors)
+
+
+class SchemaValidator:
+    """
+    Проверка CSV по upload_columns без разбора строк в Python:
+    - одно регулярное выражение по байтам описывает всю строку (число
+      колонок, типы, date_format); число совпадений по блоку целиком
+      сравнивается с числом строк блока
+    - построчный разбор только в блоке с ошибками, чтобы показать
+      номер строки, колонку и значение
+    - кодировка UTF-8 проверяется декодированием блока
+    - processes > 1: файл делится на диапазоны целых строк, которые
+      проверяются в отдельных процессах
+    """
+
+    def __init__(self, columns=None, delimiter=None):
+        self.columns = columns if columns is not None else CONFIG.get("upload_columns", [])
+        self.delimiter = delimiter or CONFIG.get("upload_settings", {}).get("delimiter", ",")
+        self.header = self.delimiter.join(column["column_name"] for column in self.columns)
+        self._values = [
+            re.compile(f"(?:{value_pattern(column, self.delimiter)})?") for column in self.columns
+        ]
+        row = re.escape(self.delimiter).join(
+            f"(?:{value_pattern(column, self.delimiter)})?" for column in self.columns
+        )
+        self._row = re.compile(f"^{row}$".encode("utf-8"), re.MULTILINE)
+        self._row_text = re.compile(row)
+
+    @property
+    def schema_hash(self):
+        """Key of the validation result in the dataset manifest"""
+        schema = json.dumps([self.columns, self.delimiter], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(schema.encode("utf-8")).hexdigest()[:12]
+
+    def validate(self, file_path, block_size=16 * 1024 * 1024, max_errors=10, processes=1):
+        """{"valid", "rows", "errors"}; errors are "line N: ..." messages, at most max_errors"""
+        if not os.path.exists(file_path):
+            return {"valid": False, "rows": 0, "errors": [f"File not found: {file_path}"]}
+
+        errors = []
+        with open(file_path, "rb") as file:
+            header = file.readline()
+            data_start = file.tell()
+        header = header.rstrip(b"\n").rstrip(b"\r").decode("utf-8", "replace")
+        if header != self.header:
+            errors.append(f"line 1: header {header[:200]!r} does not match upload_columns {self.header!r}")
+
+        boundaries = line_boundaries(file_path, max(1, processes) * 4)
+        boundaries[0] = data_start
+        ranges = list(zip(boundaries, boundaries[1:]))
+
+        if processes > 1 and len(ranges) > 1:
+            # spawn: процесс Locust пропатчен gevent, fork небезопасен
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+                results = list(executor.map(
+                    validate_range, *zip(*[
+                        (file_path, start, end, self.columns, self.delimiter, block_size, max_errors)
+                        for start, end in ranges
+                    ])
+                ))
+        else:
+            results = [self.validate_range(file_path, start, end, block_size, max_errors) for start, end in ranges]
+
+        # Номера строк: диапазоны считают строки данных с нуля, строка 1 - заголовок
+        rows = 0
+        for range_rows, range_errors in results:
+            errors.extend(f"line {rows + 2 + index}: {message}" for index, message in range_errors)
+            rows += range_rows
+        return {"valid": not errors, "rows": rows, "errors": errors[:max_errors]}
+
+    def validate_range(self, file_path, start, end, block_size=16 * 1024 * 1024, max_errors=10):
+        """
+        (data rows, [(row index in the range, message)]) of the byte range;
+        after max_errors the rest of the range is only counted
+        """
+        errors = []
+        rows = 0
+        for block in read_lines(file_path, block_size, start, end):
+            if b"\r" in block:
+                block = block.replace(b"\r\n", b"\n")
+            block_rows = block.count(b"\n") + (0 if block.endswith(b"\n") else 1)
+            if len(errors) >= max_errors:
+                rows += block_rows
+                continue
+            try:
+                text = block.decode("utf-8")
+            except UnicodeDecodeError as error:
+                errors.append((rows + block.count(b"\n", 0, error.start), f"invalid UTF-8 ({error.reason})"))
+            else:
+                if len(self._row.findall(block)) != block_rows:
+                    errors.extend(
+                        (rows + index, message) for index, message in self._row_errors(text, max_errors - len(errors))
+                    )
+            rows += block_rows
+        return rows, errors
+
+    def _row_errors(self, text, limit):
+        errors = []
+        lines = text.split("\n")
+        if lines and not lines[-1]:
+            lines.pop()
+        for index, line in enumerate(lines):
+            if len(errors) >= limit:
+                break
+            if self._row_text.fullmatch(line):
+                continue
+
+            values = line.split(self.delimiter)
+            if len(values) != len(self.columns):
+                errors.append((index, f"{len(values)} columns, expected {len(self.columns)}"))
+                continue
+            for column, value, pattern in zip(self.columns, values, self._values):
+                if not pattern.fullmatch(value):
+                    expected = column.get("date_format") or column.get("column_type")
+                    errors.append((index, f"{column['column_name']}={value[:100]!r} is not {expected}"))
+                    break
+        return errors
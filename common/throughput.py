@@ -0,0 +1,110 @@
+"""Sustained upload throughput per worker and for the whole cluster"""
+
+import threading
+import time
+from collections import deque
+
+from locust.runners import MasterRunner, WorkerRunner
+
+from common.metrics import UPLOADED_BYTES, UPLOADED_PARTS, UPLOAD_THROUGHPUT_BYTES, UPLOAD_THROUGHPUT_PARTS
+from config import CONFIG
+
+
+class ThroughputMeter:
+    """Bytes/s and parts/s over a sliding window"""
+
+    def __init__(self, window=60):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = deque()
+        self.total_bytes = 0
+        self.total_parts = 0
+        self.started_at = None
+
+    def add(self, size_bytes, parts=1):
+        now = time.time()
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = now
+            self._samples.append((now, size_bytes, parts))
+            self.total_bytes += size_bytes
+            self.total_parts += parts
+            self._trim(now)
+
+    def rates(self):
+        """(bytes/s, parts/s) over the window"""
+        now = time.time()
+        with self._lock:
+            self._trim(now)
+            if not self._samples:
+                return 0.0, 0.0
+            elapsed = min(self._window, max(now - self.started_at, 1.0))
+            return (
+                sum(sample[1] for sample in self._samples) / elapsed,
+                sum(sample[2] for sample in self._samples) / elapsed,
+            )
+
+    def _trim(self, now):
+        while self._samples and now - self._samples[0][0] > self._window:
+            self._samples.popleft()
+
+
+class UploadThroughput:
+    """
+    Учёт загруженных чанков:
+    - на worker - окно по собственным загрузкам
+    - worker отправляет приращения в report_to_master, master считает
+      окно по всему кластеру
+    """
+
+    def __init__(self):
+        window = CONFIG.get("throughput", {}).get("window", 60)
+        self.worker = ThroughputMeter(window)
+        self.cluster = ThroughputMeter(window)
+        self._unreported = [0, 0]
+        self._lock = threading.Lock()
+
+    def setup(self, environment):
+        """Register worker report hooks (call from events.init)"""
+        if isinstance(environment.runner, WorkerRunner):
+            environment.events.report_to_master.add_listener(self._on_report_to_master)
+        elif isinstance(environment.runner, MasterRunner):
+            environment.events.worker_report.add_listener(self._on_worker_report)
+        environment.events.test_stop.add_listener(self._on_test_stop)
+
+    def add(self, size_bytes, parts=1):
+        UPLOADED_BYTES.inc(size_bytes)
+        UPLOADED_PARTS.inc(parts)
+        self.worker.add(size_bytes, parts)
+        with self._lock:
+            self._unreported[0] += size_bytes
+            self._unreported[1] += parts
+        self._update_gauges("worker", self.worker)
+
+    def _update_gauges(self, scope, meter):
+        bytes_rate, parts_rate = meter.rates()
+        UPLOAD_THROUGHPUT_BYTES.labels(scope=scope).set(bytes_rate)
+        UPLOAD_THROUGHPUT_PARTS.labels(scope=scope).set(parts_rate)
+
+    def _on_report_to_master(self, client_id, data, **kwargs):
+        with self._lock:
+            data["uploaded_bytes"], data["uploaded_parts"] = self._unreported
+            self._unreported = [0, 0]
+
+    def _on_worker_report(self, client_id, data, **kwargs):
+        if data.get("uploaded_parts"):
+            self.cluster.add(data["uploaded_bytes"], data["uploaded_parts"])
+        self._update_gauges("cluster", self.cluster)
+
+    def _on_test_stop(self, environment, **kwargs):
+        meter = self.cluster if isinstance(environment.runner, MasterRunner) else self.worker
+        if not meter.total_parts:
+            return
+        elapsed = max(time.time() - meter.started_at, 1.0)
+        print(
+            f"Upload throughput: {meter.total_bytes / 1024 ** 2:.1f} MB in {meter.total_parts} parts, "
+            f"{meter.total_bytes / 1024 ** 2 / elapsed:.2f} MB/s, {meter.total_parts / elapsed:.2f} parts/s"
+        )
+
+
+upload_throughput = UploadThroughput()
@@ -0,0 +1,70 @@
+"""Transforms applied to CSV chunks while they stream to /file/upload"""
+
+from config import CONFIG
+
+
+# Знаков, которые всегда помещаются в колонку case_id по её column_type
+CASE_ID_TYPE_DIGITS = {"int": 9, "bigint": 18}
+
+
+def get_upload_transform_settings():
+    return CONFIG.get("upload_transform", {})
+
+
+def case_id_max_digits():
+    """upload_transform.case_id_max_digits or the digits of the case_id column type, None - not a number"""
+    settings = get_upload_transform_settings()
+    if settings.get("case_id_max_digits"):
+        return settings["case_id_max_digits"]
+    columns = CONFIG.get("upload_columns") or [{}]
+    return CASE_ID_TYPE_DIGITS.get(columns[0].get("column_type"))
+
+
+def prefix_case_ids(data, prefix, has_header=False):
+    """
+    CSV bytes with prefix prepended to the first column (case_id) of every row:
+    case_id c of n digits becomes prefix * 10^n + c. One bytes.replace pass,
+    no CSV parsing; rows must not be empty and case_id must not be quoted.
+    """
+    if not data:
+        return data
+
+    # Перевод строки в конце чанка не начинает новую строку данных
+    trailing = b"\n" if data.endswith(b"\n") else b""
+    body = data[:len(data) - len(trailing)].replace(b"\n", b"\n" + prefix)
+    if not has_header:
+        body = prefix + body
+    return body + trailing
+
+
+def case_id_prefix_transform(prefix):
+    """Chunk transform: case_id prefixed, chunk_text becomes UTF-8 bytes"""
+    prefix = str(prefix).encode("ascii")
+
+    def transform(chunk):
+        if not chunk:
+            return chunk
+        # Первый чанк начинается с заголовка CSV
+        data = prefix_case_ids(chunk["chunk_text"].encode("utf-8"), prefix, has_header=chunk["chunk_number"] == 1)
+        return dict(chunk, chunk_text=data, size_bytes=len(data))
+
+    return transform
+
+
+def chunk_transform(flow_id, dataset=None):
+    """
+    Transform for the chunks of the dataset uploaded to the flow or None if upload_transform is off.
+    ValueError if flow_id digits + the widest case_id of the dataset do not fit the case_id column.
+    """
+    if not get_upload_transform_settings().get("case_id_prefix", False):
+        return None
+
+    prefix = int(flow_id)
+    max_digits = case_id_max_digits()
+    case_id_digits = (dataset or {}).get("case_id_digits")
+    if max_digits and case_id_digits is not None and len(str(prefix)) + case_id_digits > max_digits:
+        raise ValueError(
+            f"case_id prefix {prefix} with case_id of up to {case_id_digits} digits "
+            f"does not fit {max_digits} digits of the case_id column"
+        )
+    return case_id_prefix_transform(prefix)
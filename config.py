@@ -131,6 +131,22 @@ def get_fallback_config() -> Dict[str, Any]:
             "chunk_threshold": 200,
             "pool_interval": 5,
         },
+        "credential_leasing": {
+            "max_sessions_per_account": 0,
+            "acquire_timeout": 300,
+            "reclaim_interval": 5,
+        },
+        "session_cache": {
+            "enabled": True,
+            "max_age": 1800,
+        },
+        "rate_limits": {
+            "enabled": False,
+            "scope": "worker",
+            "buckets": {
+                "login": {"rate": 5, "burst": 5},
+            },
+        },
         "max_iterations": max_iterations,
         "log_verbose": True,
         "log_debug": False,
@@ -1,16 +1,40 @@
-import locust.runners
-locust.runners.MASTER_HEARTBEAT_TIMEOUT = 900
-locust.runners.HEARTBEAT_INTERVAL = 750
+from locust import events
 
-from locust import HttpUser, between
+from common.arrivals import arrival_scheduler
+from common.chunk_io import hub_monitor
+from common.cleanup import run_cleanup
+from common.dataset import dataset_catalog
+from common.flow_pool import flow_pool
+from common.inflight import inflight_controller
+from common.leasing import credential_leasing
+from common.page_cache import page_cache_reader
+from common.ratelimit import rate_limiter
+from common.registry import run_ledger
+from common.results import results_store
+from common.throughput import upload_throughput
+from config import CONFIG
+from scenario.registry import build_user_classes
 
+if CONFIG.get("load_profile", {}).get("enabled", False):
+    # Locust использует LoadTestShape, если класс есть в locustfile
+    from common.load_shape import ConfigLoadShape
 
-from config import CONFIG
-from scenarios.load_test import LoadFlow
-from scenarios.process_metrics import ProcessMetricsCalculator
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    run_ledger.setup(environment)
+    hub_monitor.setup(environment)
+    dataset_catalog.setup(environment)
+    credential_leasing.setup(environment)
+    rate_limiter.setup(environment)
+    arrival_scheduler.setup(environment)
+    inflight_controller.setup(environment)
+    upload_throughput.setup(environment)
+    page_cache_reader.setup(environment)
+    flow_pool.setup(environment)
+    run_cleanup.setup(environment)
+    results_store.setup(environment)
 
 
-class SupersetUser(HttpUser):
-    host = CONFIG["api"]["base_url"]
-    tasks = [ProcessMetricsCalculator]
-    wait_time = between(min_wait=1, max_wait=5)
\ No newline at end of file
+# Классы пользователей <Name>User генерируются из секции scenarios конфига
+globals().update(build_user_classes())
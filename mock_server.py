@@ -0,0 +1,431 @@
+"""Local stand-in for the ETL/Superset stand used to benchmark the harness itself
+
+Implements every endpoint the Api calls with configurable latency, error rates
+and processing durations (section mock_server of the config).
+
+Each process keeps its own uploads, tables and aggregates, so row count and
+aggregate validation are only reliable with --processes 1; use more processes
+to measure throughput with validation failures ignored.
+
+Examples:
+    python mock_server.py --port 8088 --processes 4
+    BASE_URL=http://127.0.0.1:8088 locust -f locustfile.py
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import socket
+import time
+from urllib.parse import parse_qs, unquote
+
+import gevent
+from gevent.pywsgi import WSGIServer
+
+from common.aggregates import AggregateAccumulator, aggregate_name, aggregate_spec, combine
+from config import CONFIG
+
+PM_BLOCK_ID = "spm_dashboard_creation_v_0_2[0]"
+
+FLOW_ID_RE = re.compile(r"^/etl/api/v1/flow/(\d+)$")
+FLOW_TRIGGER_RE = re.compile(r"^/etl/api/v1/flow/(\d+)/trigger$")
+DASHBOARD_API_RE = re.compile(r"^/api/v1/dashboard/(\d+)(/charts)?$")
+ARTEFACT_FLOW_RE = re.compile(r"col:flow_id,opr:eq,value:'(\d+)'")
+COUNT_SQL_RE = re.compile(r'COUNT\(\*\)\s+FROM\s+"([^"]+)"\."([^"]+)"', re.IGNORECASE)
+AGGREGATE_SQL_RE = re.compile(r'COUNT\(\*\)\s+AS\s+"count".*?FROM\s+"([^"]+)"\."([^"]+)"', re.IGNORECASE | re.DOTALL)
+ALIAS_SQL_RE = re.compile(r'AS\s+"([^"]+)"', re.IGNORECASE)
+DROP_SQL_RE = re.compile(r'DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?"([^"]+)"\."([^"]+)"', re.IGNORECASE)
+SCHEMA_SQL_RE = re.compile(r"table_schema\s*=\s*'([^']+)'", re.IGNORECASE)
+
+LOGIN_PAGE = (
+    b"<html><body><form id=\"kc-form-login\" method=\"post\" "
+    b"action=\"/login-actions/authenticate?session_code=mock&amp;execution=mock\">"
+    b"<input name=\"username\"/><input name=\"password\" type=\"password\"/></form></body></html>"
+)
+DASHBOARD_PAGE = b"<html><head><title>Dashboard</title></head><body><div id=\"app\"></div></body></html>"
+
+
+def get_mock_settings():
+    return CONFIG.get("mock_server", {})
+
+
+def sample(distribution):
+    """Seconds drawn from a distribution section: constant, uniform, exponential or lognormal"""
+    if not distribution:
+        return 0.0
+    kind = distribution.get("type", "constant")
+    if kind == "constant":
+        return distribution.get("value", 0.0)
+    if kind == "uniform":
+        return random.uniform(distribution.get("min", 0.0), distribution.get("max", 0.0))
+    if kind == "exponential":
+        mean = distribution.get("mean", 0.0)
+        return random.expovariate(1.0 / mean) if mean > 0 else 0.0
+    if kind == "lognormal":
+        return random.lognormvariate(math.log(distribution.get("median", 0.001)), distribution.get("sigma", 0.5))
+    raise ValueError(f"Unknown distribution type: {kind}")
+
+
+def endpoint_class(method, path):
+    """Latency and error rate group of a request"""
+    if path == "/" or path.startswith("/login") or path.startswith("/superset/welcome"):
+        return "login"
+    if path == "/etl/api/v1/file/upload":
+        return "chunk_upload"
+    if path.startswith("/etl/api/v1/file/status/") or path.startswith("/etl/api/v1/flow/status/"):
+        return "status_poll"
+    if path.startswith("/api/v1/sqllab/"):
+        return "sqllab"
+    if path.startswith("/api/v1/chart/") or path.startswith("/superset/explore_json"):
+        return "chart_data"
+    if path.startswith("/superset/dashboard/") or path.startswith("/api/v1/dashboard"):
+        return "dashboard"
+    return "flow_management"
+
+
+def parse_multipart(body, content_type):
+    """Fields of a multipart/form-data body: name -> bytes"""
+    boundary = content_type.split("boundary=", 1)[-1].strip().strip('"').encode("latin-1")
+    fields = {}
+    for part in body.split(b"--" + boundary):
+        headers_end = part.find(b"\r\n\r\n")
+        if headers_end == -1:
+            continue
+        headers = part[:headers_end]
+        name_start = headers.find(b'name="')
+        if name_start == -1:
+            continue
+        name_end = headers.find(b'"', name_start + 6)
+        fields[headers[name_start + 6:name_end].decode("latin-1")] = part[headers_end + 4:-2]
+    return fields
+
+
+class RunClock:
+    """
+    Статус запусков без общего состояния: время старта, длительность и исход
+    закодированы в run_id, поэтому статус отдаёт любой процесс сервера.
+    """
+
+    @staticmethod
+    def new_run(kind, flow_id):
+        settings = get_mock_settings().get("processing", {}).get(kind, {})
+        duration = sample(settings.get("duration", {"type": "constant", "value": 5}))
+        outcome = "failed" if random.random() < settings.get("failure_rate", 0.0) else "success"
+        prefix = "spm_dashboard_creation__manual__" if kind == "pm" else "file__"
+        return f"{prefix}{flow_id}_{int(time.time() * 1000)}_{int(duration * 1000)}_{outcome}"
+
+    @staticmethod
+    def status(run_id):
+        try:
+            flow_id, started_ms, duration_ms, outcome = run_id.rsplit("__", 1)[-1].rsplit("_", 3)
+            started_ms, duration_ms = int(started_ms), int(duration_ms)
+        except ValueError:
+            return None, None
+        if time.time() * 1000 < started_ms + duration_ms:
+            return flow_id, "running"
+        return flow_id, outcome
+
+
+class MockStand:
+    """
+    WSGI-приложение стенда. Состояние (flows, загрузки, таблицы) хранится
+    в памяти процесса и между процессами не делится: чанки одной загрузки
+    и запрос проверки строк могут прийти в разные процессы (фоновые flows,
+    сервисные сессии, новые соединения), поэтому проверка результатов
+    достоверна только с одним процессом.
+    """
+
+    def __init__(self, process_index=0, processes=1):
+        self._ids = itertools.count(1_000_000 + process_index, processes)
+        self.flows = {}
+        self.uploads = {}
+        self.tables = {}
+        self.aggregates = {}
+        self.requests = 0
+
+    # WSGI
+    def __call__(self, environ, start_response):
+        self.requests += 1
+        method = environ["REQUEST_METHOD"]
+        path = environ.get("PATH_INFO", "/")
+        query = environ.get("QUERY_STRING", "")
+        settings = get_mock_settings()
+        group = endpoint_class(method, path)
+
+        delay = sample(settings.get("latency", {}).get(group) or settings.get("latency", {}).get("default"))
+        if delay > 0:
+            gevent.sleep(delay)
+
+        if random.random() < settings.get("error_rates", {}).get(group, 0.0):
+            return self._respond(start_response, "503 Service Unavailable", {"message": "Injected error"})
+
+        user = self._session_user(environ)
+        if user is None and (path.startswith("/api/") or path.startswith("/etl/")):
+            return self._respond(start_response, "401 Unauthorized", {"message": "Not authenticated"})
+
+        try:
+            return self._route(environ, start_response, method, path, query, user)
+        except Exception as error:
+            return self._respond(start_response, "500 Internal Server Error", {"message": str(error)})
+
+    def _route(self, environ, start_response, method, path, query, user):
+        # Логин
+        if path == "/" and method == "GET":
+            return self._respond(start_response, "200 OK", LOGIN_PAGE, content_type="text/html")
+        if path.startswith("/login-actions/authenticate") and method == "POST":
+            form = parse_qs(self._body(environ).decode("utf-8"))
+            username = form.get("username", ["anonymous"])[0]
+            cookie = f"session={username}|{int(time.time())}; Path=/; HttpOnly"
+            return self._respond(
+                start_response, "302 Found", b"",
+                headers=[("Location", "/superset/welcome/"), ("Set-Cookie", cookie)],
+            )
+        if path.startswith("/superset/welcome") or path.startswith("/superset/dashboard/"):
+            return self._respond(start_response, "200 OK", DASHBOARD_PAGE, content_type="text/html")
+
+        # Superset API
+        if path == "/api/v1/database/":
+            return self._respond(start_response, "200 OK", {"result": [{
+                "id": self._database_id(user),
+                "database_name": f"SberProcessMiningDB_{user.replace('_', '')}",
+            }]})
+        if path == "/api/v1/sqllab/execute/":
+            return self._respond(start_response, "200 OK", self._execute_sql(json.loads(self._body(environ))))
+        if path == "/api/v1/dashboard/" and method == "GET":
+            return self._respond(start_response, "200 OK", {"result": []})
+        match = DASHBOARD_API_RE.match(path.rstrip("/"))
+        if match:
+            if method == "DELETE":
+                return self._respond(start_response, "200 OK", {"message": "OK"})
+            if match.group(2):
+                charts = get_mock_settings().get("charts_per_dashboard", 6)
+                return self._respond(start_response, "200 OK", {"result": [
+                    {"id": int(match.group(1)) * 100 + index} for index in range(charts)
+                ]})
+            return self._respond(start_response, "200 OK", {"result": {"id": int(match.group(1))}})
+        if path.startswith("/api/v1/chart/") or path.startswith("/superset/explore_json"):
+            return self._respond(start_response, "200 OK", {"result": [{"rowcount": 1, "data": [{"value": 1}]}]})
+
+        # ETL API: flows
+        if path == "/etl/api/v1/flow/" and method == "POST":
+            flow = json.loads(self._body(environ))
+            flow_id = next(self._ids)
+            self.flows[flow_id] = {"id": flow_id, "label": flow.get("label", ""), "owner": user}
+            return self._respond(start_response, "201 Created", {"id": flow_id})
+        if path == "/etl/api/v1/flow/" and method == "GET":
+            return self._respond(start_response, "200 OK", {"result": [
+                flow for flow in self.flows.values() if flow["owner"] == user
+            ][:100]})
+        match = FLOW_ID_RE.match(path)
+        if match:
+            flow_id = int(match.group(1))
+            if method == "DELETE":
+                if self.flows.pop(flow_id, None) is None:
+                    return self._respond(start_response, "404 Not Found", {"message": "Not found"})
+            else:
+                self._body(environ)
+            return self._respond(start_response, "200 OK", {"id": flow_id})
+        if path.startswith("/etl/api/v1/flow/dag_params/v2/spm_file_loader_v2"):
+            return self._respond(start_response, "200 OK", {"result": [
+                ["target_connection", {"value": "mock_connection"}],
+                ["target_schema", {"value": f"schema_{user}"}],
+            ]})
+        if path.startswith("/etl/api/v1/flow/dag_params/v2/spm_dashboard_creation_v_0_2"):
+            return self._respond(start_response, "200 OK", {"result": [
+                ["source_connection", {"value": "mock_connection"}],
+                ["source_schema", {"value": f"schema_{user}"}],
+                ["storage_connection", {"value": "mock_storage"}],
+                ["compute_connection", {"value": "mock_compute"}],
+            ]})
+        match = FLOW_TRIGGER_RE.match(path)
+        if match:
+            self._body(environ)
+            run_id = RunClock.new_run("pm", match.group(1))
+            return self._respond(start_response, "202 Accepted", {"result": {"run_id": run_id}})
+        if path.startswith("/etl/api/v1/flow/status/"):
+            run_id = unquote(path[len("/etl/api/v1/flow/status/"):])
+            flow_id, status = RunClock.status(run_id)
+            if status is None:
+                return self._respond(start_response, "404 Not Found", {"message": "Unknown run"})
+            return self._respond(start_response, "200 OK", {"result": {
+                "status": status,
+                "flow_id": flow_id,
+                "blocks": [{"block_id": PM_BLOCK_ID, "status": status, "block_run_id": f"block__{run_id}"}],
+            }})
+        if path.startswith("/etl/api/v1/flowartefact/"):
+            match = ARTEFACT_FLOW_RE.search(unquote(query))
+            dashboard_id = int(match.group(1)) if match else next(self._ids)
+            return self._respond(start_response, "200 OK", {"result": [{
+                "event_type": "DASHBOARD_CREATED",
+                "object_id": dashboard_id,
+                "object_url": f"/superset/dashboard/{dashboard_id}/",
+            }]})
+
+        # ETL API: файлы
+        if path == "/etl/api/v1/file/start_upload":
+            upload = json.loads(self._body(environ))
+            self.uploads[upload["upload_id"]] = {
+                "schema": upload.get("schema"), "table_name": upload.get("table_name"), "parts": {},
+            }
+            return self._respond(start_response, "200 OK", {"status": "ok"})
+        if path == "/etl/api/v1/file/upload":
+            fields = parse_multipart(self._body(environ), environ.get("CONTENT_TYPE", ""))
+            upload = self.uploads.setdefault(
+                fields.get("upload_id", b"").decode("utf-8"), {"schema": None, "table_name": None, "parts": {}}
+            )
+            part_num = fields.get("part_num", b"0").decode("utf-8")
+            data = fields.get("file", b"")
+            upload["parts"][part_num] = data.count(b"\n")
+            if get_mock_settings().get("aggregates", False):
+                # Агрегаты части для проверки результата одним SQL-запросом
+                if "accumulator" not in upload:
+                    upload["accumulator"], upload["aggregates"] = AggregateAccumulator(aggregate_spec()), {}
+                upload["aggregates"][part_num] = upload["accumulator"].add(
+                    data.decode("utf-8"), has_header=part_num == "1"
+                )
+            return self._respond(start_response, "200 OK", {"status": "ok"})
+        if path == "/etl/api/v1/file/finalize":
+            finalize = json.loads(self._body(environ))
+            upload = self.uploads.pop(finalize.get("upload_id"), None)
+            if upload and upload["table_name"]:
+                # Первая строка первого чанка - заголовок CSV
+                self.tables[(upload["schema"], upload["table_name"])] = max(0, sum(upload["parts"].values()) - 1)
+                if "accumulator" in upload:
+                    aggregates = upload["accumulator"].distinct_counts()
+                    for function, column in aggregate_spec():
+                        if function != "distinct":
+                            name = aggregate_name(function, column)
+                            aggregates[name] = combine(function, [part[name] for part in upload["aggregates"].values()])
+                    self.aggregates[(upload["schema"], upload["table_name"])] = aggregates
+            return self._respond(start_response, "200 OK", {"status": "ok"})
+        if path == "/etl/api/v1/file/start":
+            start = json.loads(self._body(environ))
+            return self._respond(start_response, "200 OK", {"run_id": RunClock.new_run("file", start.get("flow_id", 0))})
+        if path.startswith("/etl/api/v1/file/status/"):
+            _, status = RunClock.status(unquote(path[len("/etl/api/v1/file/status/"):]))
+            if status is None:
+                return self._respond(start_response, "404 Not Found", {"message": "Unknown run"})
+            return self._respond(start_response, "200 OK", {
+                "status": status, "error": "Injected processing failure" if status == "failed" else None,
+            })
+
+        return self._respond(start_response, "404 Not Found", {"message": f"No mock for {method} {path}"})
+
+    def _execute_sql(self, payload):
+        sql = payload.get("sql", "")
+        match = COUNT_SQL_RE.search(sql)
+        if match:
+            return {"data": [{"count()": self.tables.get((match.group(1), match.group(2)), 0)}]}
+        match = AGGREGATE_SQL_RE.search(sql)
+        if match:
+            table = (match.group(1), match.group(2))
+            aggregates = self.aggregates.get(table, {})
+            row = {alias: aggregates.get(alias) for alias in ALIAS_SQL_RE.findall(sql)}
+            return {"data": [dict(row, count=self.tables.get(table, 0))]}
+        match = DROP_SQL_RE.search(sql)
+        if match:
+            self.tables.pop((match.group(1), match.group(2)), None)
+            self.aggregates.pop((match.group(1), match.group(2)), None)
+            return {"data": []}
+        match = SCHEMA_SQL_RE.search(sql)
+        if match:
+            return {"data": [
+                {"table_name": table_name} for schema, table_name in self.tables if schema == match.group(1)
+            ]}
+        return {"data": []}
+
+    @staticmethod
+    def _session_user(environ):
+        for cookie in environ.get("HTTP_COOKIE", "").split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name != "session" or "|" not in value:
+                continue
+            username, issued_at = value.rsplit("|", 1)
+            ttl = get_mock_settings().get("session_ttl", 0)
+            if ttl and time.time() - int(issued_at) > ttl:
+                return None
+            return username
+        return None
+
+    @staticmethod
+    def _database_id(username):
+        return sum(username.encode("utf-8")) % 1000 + 1
+
+    @staticmethod
+    def _body(environ):
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        return environ["wsgi.input"].read(length) if length else b""
+
+    @staticmethod
+    def _respond(start_response, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        start_response(status, [
+            ("Content-Type", content_type),
+            ("Content-Length", str(len(body))),
+            *(headers or []),
+        ])
+        return [body]
+
+
+class NoDelayWSGIServer(WSGIServer):
+    """WSGIServer that disables Nagle: headers and body go out in separate writes"""
+
+    def handle(self, sock, address):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().handle(sock, address)
+
+
+def serve(listener, process_index, processes, stats_interval):
+    stand = MockStand(process_index, processes)
+    server = NoDelayWSGIServer(listener, stand, log=None, error_log=None)
+
+    if stats_interval:
+        def report():
+            previous = 0
+            while True:
+                gevent.sleep(stats_interval)
+                current = stand.requests
+                print(f"[mock {os.getpid()}] {(current - previous) / stats_interval:.0f} req/s")
+                previous = current
+
+        gevent.spawn(report)
+
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the ETL/Superset stand")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--processes", type=int, default=1, help="Pre-forked server processes, one per core")
+    parser.add_argument("--stats-interval", type=float, default=0, help="Print req/s per process every N seconds")
+    args = parser.parse_args()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(4096)
+    print(f"Mock stand listening on http://{args.host}:{args.port} with {args.processes} processes")
+    if args.processes > 1:
+        print("WARNING: state is per process, row count and aggregate validation need --processes 1")
+
+    # Процессы принимают соединения с общего сокета
+    for process_index in range(1, args.processes):
+        if os.fork() == 0:
+            gevent.reinit()
+            serve(listener, process_index, args.processes, args.stats_interval)
+            return
+    serve(listener, 0, args.processes, args.stats_interval)
+
+
+if __name__ == "__main__":
+    main()
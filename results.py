@@ -0,0 +1,103 @@
+"""Run results: list stored runs, manage baselines and compare runs
+
+Examples:
+    python results.py list
+    python results.py baseline release-1.4 20250101_120000
+    python results.py compare 20250108_120000 --baseline release-1.4
+    python results.py compare 20250108_120000 --against 20250101_120000 --alpha 0.01
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from common.results import compare_runs, results_store
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def list_runs(args):
+    print(f"{'run_id':<20} {'started':<20} {'config':<10} {'dataset MB':>10} {'iterations':>10} {'success':>8}  base_url")
+    for run_id, started_at, base_url, config_hash, dataset_bytes, iterations, success_rate in results_store.runs():
+        started = datetime.fromtimestamp(started_at).strftime("%Y-%m-%d %H:%M:%S") if started_at else "-"
+        success = "-" if success_rate is None else f"{success_rate:.1%}"
+        print(
+            f"{run_id:<20} {started:<20} {(config_hash or '')[:8]:<10} "
+            f"{(dataset_bytes or 0) / 1024 ** 2:>10.1f} {iterations:>10} {success:>8}  {base_url}"
+        )
+
+
+def set_baseline(args):
+    if not results_store.run_info(args.run_id):
+        sys.exit(f"Unknown run: {args.run_id}")
+    results_store.set_baseline(args.name, args.run_id)
+    print(f"Baseline {args.name} -> {args.run_id}")
+
+
+def compare(args):
+    baseline_run = args.against or results_store.baseline(args.baseline)
+    if not baseline_run:
+        sys.exit(f"Unknown baseline: {args.baseline}")
+
+    baseline_info = results_store.run_info(baseline_run)
+    candidate_info = results_store.run_info(args.run_id)
+    if not baseline_info or not candidate_info:
+        sys.exit("Both runs must exist in the results store")
+
+    for field in ("base_url", "config_hash", "dataset_bytes"):
+        if baseline_info[field] != candidate_info[field]:
+            print(f"WARNING: runs differ in {field}: {baseline_info[field]} vs {candidate_info[field]}")
+
+    rows, regressions = compare_runs(
+        results_store, baseline_run, args.run_id, alpha=args.alpha, tolerance=args.tolerance
+    )
+
+    print(f"Baseline {baseline_run} vs candidate {args.run_id} (alpha={args.alpha}, tolerance={args.tolerance:.0%})")
+    print(
+        f"{'phase':<16} {'n':>11} {'median, s':>19} {'p95, s':>19} {'change':>8} {'p-value':>8} "
+        f"{'success':>15}  verdict"
+    )
+    for row in rows:
+        change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+        p_value = "-" if row["p_value"] is None else f"{row['p_value']:.4f}"
+        print(
+            f"{row['phase']:<16} {row['baseline_n']:>5}/{row['candidate_n']:<5} "
+            f"{_format_seconds(row['baseline_median']):>9}/{_format_seconds(row['candidate_median']):<9} "
+            f"{_format_seconds(row['baseline_p95']):>9}/{_format_seconds(row['candidate_p95']):<9} "
+            f"{change:>8} {p_value:>8} "
+            f"{row['baseline_success']:>7.1%}/{row['candidate_success']:<7.1%}  {row['verdict']}"
+        )
+
+    print(f"Verdict: {'REGRESSION' if regressions else 'OK'} ({regressions} regressed phases)")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stored load test results and cross-run regression checks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List stored runs").set_defaults(handler=list_runs)
+
+    baseline = commands.add_parser("baseline", help="Mark a run as a named baseline")
+    baseline.add_argument("name")
+    baseline.add_argument("run_id")
+    baseline.set_defaults(handler=set_baseline)
+
+    comparison = commands.add_parser("compare", help="Compare a run with another run or a baseline")
+    comparison.add_argument("run_id", help="Candidate run")
+    against = comparison.add_mutually_exclusive_group()
+    against.add_argument("--against", help="Run to compare with")
+    against.add_argument("--baseline", default="default", help="Named baseline to compare with")
+    comparison.add_argument("--alpha", type=float, default=0.05, help="Significance level")
+    comparison.add_argument("--tolerance", type=float, default=0.05,
+                            help="Relative change of median duration or success rate to flag")
+    comparison.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
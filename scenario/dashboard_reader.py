@@ -0,0 +1,82 @@
+"""Locust tasks module for read-heavy dashboard load"""
+
+import itertools
+import logging
+import random
+import urllib3
+
+from locust import task
+
+from common.api import Api
+from common.registry import dashboard_registry
+from config import CONFIG
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class DashboardReader(Api):
+    """Открытие дашбордов, созданных в предыдущих запусках, из локального реестра"""
+
+    # Пул дашбордов на аккаунт: (записи, накопленные веса), грузится один раз на процесс
+    _pools = {}
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.max_user_iterations = getattr(self.user, "max_iterations", None)
+        self.dashboards = []
+        self.cum_weights = []
+
+    def on_start(self):
+        """Initialize user session, credentials and dashboard pool"""
+        super().on_start()
+        self.dashboards, self.cum_weights = self._get_pool()
+
+        self.log(f"Dashboard reader started. Dashboards in pool: {len(self.dashboards)}")
+
+    def _get_pool(self):
+        """
+        Дашборды стенда (и аккаунта при owner_only) с весами популярности:
+        вес дашборда ранга r равен 1 / r^popularity_skew (0 - равномерно).
+        Порядок рангов перемешивается с фиксированным seed, одинаково на всех workers.
+        """
+        settings = CONFIG.get("dashboard_pool", {})
+        owner_only = settings.get("owner_only", True)
+        pool_key = self.username if owner_only else None
+
+        if pool_key not in self._pools:
+            filters = {"base_url": CONFIG["api"]["base_url"]}
+            if owner_only:
+                filters["username"] = self.username
+
+            urls = sorted({record["dashboard_url"] for record in dashboard_registry.load(**filters)})
+            random.Random(settings.get("popularity_seed", 42)).shuffle(urls)
+
+            skew = settings.get("popularity_skew", 1.0)
+            weights = [1.0 / rank ** skew for rank in range(1, len(urls) + 1)]
+            DashboardReader._pools[pool_key] = (urls, list(itertools.accumulate(weights)))
+
+        return self._pools[pool_key]
+
+    @task
+    def open_random_dashboard(self):
+        """Основная задача: открыть случайный дашборд из пула"""
+        if not self.dashboards:
+            self.log("Dashboard pool is empty - stopping user", logging.ERROR)
+            self.user.stop()
+            return
+
+        if self.max_user_iterations and self.user_iteration_count >= self.max_user_iterations:
+            self.log(f"User reached iteration limit {self.max_user_iterations} - stopping")
+            self.user.stop()
+            return
+
+        self.user_iteration_count += 1
+        if not self.logged_in:
+            self.establish_session()
+            if not self.logged_in:
+                self.log("Failed to establish session", logging.ERROR)
+                return
+
+        dashboard_url = random.choices(self.dashboards, cum_weights=self.cum_weights)[0]
+        if not self._open_dashboard(dashboard_url):
+            self.log(f"Failed to load dashboard: {dashboard_url}", logging.WARNING)
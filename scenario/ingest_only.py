@@ -0,0 +1,132 @@
+"""Locust tasks module for saturating the chunk upload endpoints"""
+
+import itertools
+import logging
+import time
+import urllib3
+
+from locust import task
+
+from common.api import Api
+from common.chunk_io import read_chunks
+from common.csv_utils import slice_chunks
+from common.transforms import chunk_transform
+from config import CONFIG
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def get_ingest_settings():
+    return CONFIG.get("ingest_only", {})
+
+
+class IngestOnly(Api):
+    """
+    Только загрузка файла: start_upload -> чанки -> finalize.
+    Flows создаются один раз в on_start и переиспользуются,
+    обработка файла и PM не запускаются.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.flows = []
+        self.flow_cycle = None
+        self.max_user_iterations = getattr(self.user, "max_iterations", None)
+
+        self.first_chunk = get_ingest_settings().get("first_chunk", 1)
+        self._choose_ingest_dataset()
+
+    def on_start(self):
+        """Initialize user session, credentials and flow pool"""
+        super().on_start()
+        self.flows = self._provision_flows(get_ingest_settings().get("flows_per_user", 1))
+        self.flow_cycle = itertools.cycle(self.flows) if self.flows else None
+        self.log(f"Ingest-only user started. Flows in pool: {len(self.flows)}, chunks per upload: {self.total_chunks}")
+
+    def _choose_ingest_dataset(self):
+        """Dataset of the next upload from the pool and the number of its chunks to send"""
+        dataset = self._choose_dataset()
+        max_chunks = get_ingest_settings().get("max_chunks")
+        self.total_chunks = max(0, dataset["total_chunks"] - self.first_chunk + 1)
+        if max_chunks:
+            self.total_chunks = min(self.total_chunks, max_chunks)
+        return dataset
+
+    def _provision_flows(self, count):
+        """Flows reused by every upload of this user: leased from the flow pool or created now"""
+        flows = []
+        for _ in range(count):
+            flow = self._prepare_upload_flow(self.total_chunks)
+            if flow:
+                flows.append(flow)
+        return flows
+
+    @task
+    def upload_to_pooled_flow(self):
+        """Основная задача: загрузка среза датасета в следующий flow из пула"""
+        if not self.flows or not self.total_chunks:
+            self.log("No flows or no chunks to upload - stopping user", logging.ERROR)
+            self.user.stop()
+            return
+
+        if self.max_user_iterations and self.user_iteration_count >= self.max_user_iterations:
+            self.log(f"User reached iteration limit {self.max_user_iterations} - stopping")
+            self.user.stop()
+            return
+
+        self.user_iteration_count += 1
+        if not self._run_admitted(self._ingest_once):
+            self.log("Arrival schedule finished - stopping user")
+            self.user.stop()
+
+    def _ingest_once(self):
+        """Одна итерация: start_upload, чанки среза, finalize"""
+        if not self.logged_in:
+            self.establish_session()
+            if not self.logged_in:
+                self.log("Failed to establish session", logging.ERROR)
+                return
+
+        settings = get_ingest_settings()
+        dataset = self._choose_ingest_dataset()
+        flow = next(self.flow_cycle)
+        flow_id = flow["flow_id"]
+        timeout = settings.get("timeout", 60)
+        ingest_start = time.time()
+        if not self.total_chunks:
+            self.log(f"No chunks to upload from {dataset['path']}", logging.WARNING)
+            return
+
+        try:
+            # Датасет итерации может отличаться числом чанков от прошлой загрузки в этот flow
+            if not self._set_flow_chunks(flow, self.total_chunks):
+                return
+            if not self._start_file_upload(flow_id, flow["db_id"], flow["target_schema"], self.total_chunks, timeout):
+                return
+
+            chunks = slice_chunks(
+                read_chunks(
+                    dataset["path"], transform=chunk_transform(flow_id, dataset), selection=dataset.get("selection")
+                ),
+                first_chunk=self.first_chunk,
+                max_chunks=self.total_chunks,
+                header=dataset["header"],
+            )
+            uploaded_chunks = self._upload_chunks(
+                flow_id, flow["db_id"], flow["target_schema"], self.total_chunks, chunks=chunks
+            )
+            if uploaded_chunks != self.total_chunks:
+                self.log(f"Uploaded {uploaded_chunks}/{self.total_chunks} chunks to flow {flow_id}", logging.ERROR)
+
+            finalized = self._finalize_file_upload(flow_id, uploaded_chunks, timeout)
+            self._record_phase(
+                "iteration", time.time() - ingest_start, finalized and uploaded_chunks == self.total_chunks
+            )
+            if finalized:
+                self.log(
+                    f"Ingest to {flow['flow_name']} finished: {uploaded_chunks} chunks "
+                    f"in {time.time() - ingest_start:.2f}s"
+                )
+
+        except Exception as e:
+            self.log(f"Unexpected error in ingest-only run: {str(e)}", logging.ERROR)
@@ -0,0 +1,150 @@
+"""Locust tasks module for Process Mining load against pre-seeded tables"""
+
+import logging
+import re
+import threading
+import time
+import urllib3
+
+from locust import task
+
+from common.api import Api
+from common.managers import FlowManager
+from common.metrics import PM_ONLY_DURATION
+from common.registry import table_registry
+from config import CONFIG
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+TABLE_ID_RE = re.compile(r"^Tube_(\d+)$")
+
+
+class PmOnly(Api):
+    """Только блок 'Расчет метрик Process Mining' по уже загруженным таблицам Tube_<id>"""
+
+    # Таблицы на аккаунт и общий курсор ротации, загружаются один раз на процесс
+    _tables = {}
+    _cursor = 0
+    _cursor_lock = threading.Lock()
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.tables = []
+        self.max_user_iterations = getattr(self.user, "max_iterations", None)
+
+    def on_start(self):
+        """Initialize user session, credentials and table pool"""
+        super().on_start()
+        self.tables = self._get_tables()
+
+        self.log(f"PM-only user started. Tables in pool: {len(self.tables)}")
+
+    def _get_tables(self):
+        """
+        Таблицы аккаунта: из registries.tables (успешные загрузки прошлых запусков)
+        и из pm_only.tables в конфиге, упорядоченные по числу строк.
+        """
+        if self.username not in self._tables:
+            tables = {}
+            records = table_registry.load(base_url=CONFIG["api"]["base_url"], username=self.username)
+            for record in records + CONFIG.get("pm_only", {}).get("tables", []):
+                if record.get("username", self.username) != self.username:
+                    continue
+                match = TABLE_ID_RE.match(record.get("table_name", ""))
+                if not match:
+                    continue
+                tables[record["table_name"]] = {
+                    "table_name": record["table_name"],
+                    "flow_id": record.get("flow_id") or int(match.group(1)),
+                    "rows": record.get("rows", 0),
+                }
+            PmOnly._tables[self.username] = sorted(tables.values(), key=lambda table: table["rows"])
+
+        return self._tables[self.username]
+
+    def _next_table(self):
+        """Round-robin over tables of all sizes, shared by users of the process"""
+        with self._cursor_lock:
+            PmOnly._cursor += 1
+            return self.tables[PmOnly._cursor % len(self.tables)]
+
+    @task
+    def run_pm_on_table(self):
+        """Основная задача: PM flow по следующей таблице из пула"""
+        if not self.tables:
+            self.log("Table pool is empty - stopping user", logging.ERROR)
+            self.user.stop()
+            return
+
+        if self.max_user_iterations and self.user_iteration_count >= self.max_user_iterations:
+            self.log(f"User reached iteration limit {self.max_user_iterations} - stopping")
+            self.user.stop()
+            return
+
+        self.user_iteration_count += 1
+        if not self._run_admitted(self._run_pm_only):
+            self.log("Arrival schedule finished - stopping user")
+            self.user.stop()
+
+    def _run_pm_only(self):
+        """Одна итерация: параметры PM, PM flow, запуск и мониторинг"""
+        if not self.logged_in:
+            self.establish_session()
+            if not self.logged_in:
+                self.log("Failed to establish session", logging.ERROR)
+                return
+
+        table = self._next_table()
+        table_name = table["table_name"]
+        pm_start = time.time()
+
+        try:
+            # Как и в ProcessMetricsCalculator, параметры PM DAG берутся в контексте
+            # flow, загрузившего таблицу: PM flow создаётся уже с ними
+            source_connection, source_schema, storage_connection, compute_connection = self._get_dag_pm_params(
+                table["flow_id"]
+            )
+            if not all([source_connection, source_schema, storage_connection, compute_connection]):
+                self.log("Missing PM DAG parameters", logging.ERROR)
+                return
+
+            # Уникальное имя: по одной таблице запускается много PM flow
+            base_flow_name = f"{table_name}_{FlowManager.get_next_id(worker_id=self.worker_id)}"
+            pm_flow_name, pm_flow_id = self._create_pm_flow(
+                worker_id=self.worker_id,
+                source_connection=source_connection,
+                source_schema=source_schema,
+                storage_connection=storage_connection,
+                compute_connection=compute_connection,
+                table_name=table_name,
+                base_flow_name=base_flow_name
+            )
+            if not pm_flow_id:
+                self.log("Failed to create Process Mining flow", logging.ERROR)
+                return
+
+            pm_run_id = self._start_pm_flow(
+                pm_flow_id, source_connection, source_schema, storage_connection, compute_connection, table_name
+            )
+            if not pm_run_id:
+                self.log("Failed to start Process Mining flow", logging.ERROR)
+                return
+
+            pm_result = self._monitor_processing_status(
+                pm_run_id, CONFIG["upload_control"]["pm_timeout"], pm_flow_id, is_pm_flow=True
+            )
+            success = isinstance(pm_result, dict) and pm_result.get("success")
+            PM_ONLY_DURATION.labels(
+                table_name=table_name, status="success" if success else "failed"
+            ).observe(time.time() - pm_start)
+            self._record_phase("iteration", time.time() - pm_start, success)
+            if success:
+                self._register_pm_dashboard(pm_flow_id, pm_run_id, pm_result, table_name)
+
+            self.log(
+                f"PM-only run on {table_name} ({table['rows']} rows) "
+                f"{'completed' if success else 'failed'}: {pm_flow_name} (ID: {pm_flow_id})"
+            )
+
+        except Exception as e:
+            self.log(f"Unexpected error in PM-only run: {str(e)}", logging.ERROR)
@@ -1,16 +1,17 @@
 """Locust tasks module for Superset ETL flow testing"""
 
 import logging
-import random
 import time
 import urllib3
 
-from locust import task, between
+from gevent.lock import BoundedSemaphore
+from gevent.pool import Group
+from locust import task
 
-from common.auth import establish_session
 from common.api import Api
-from common.csv_utils import count_chunks, count_csv_lines
-from common.managers import UserPool
+from common.dataset import upload_timeout
+from common.managers import stop_manager
+from common.metrics import PIPELINE_IN_FLIGHT, PIPELINE_STAGE_DURATION
 from config import CONFIG
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -19,61 +20,62 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 class ProcessMetricsCalculator(Api):
     """Создание датасета и дашборда 'Расчет метрик Process Mining'"""
 
-    wait_time = between(min_wait=1, max_wait=5)
-
     def __init__(self, parent):
         super().__init__(parent)
-        self.user_id = f"user_{random.randint(10000, 99999)}"
-        self.session_id = f"{random.randint(1000, 9999)}"
-        self.logged_in = False
-        self.session_valid = False
-        self.total_chunks = count_chunks(CONFIG["csv_file_path"], CONFIG["chunk_size"])
-        self.total_lines = count_csv_lines(CONFIG["csv_file_path"])
-        self.worker_id = 0
-        self.username = None
-        self.password = None
+        self._choose_dataset()
         self.flow_id = None
-
-    def establish_session(self):
-        """Establish user session with authentication"""
-        success = establish_session(
-            client=self.client,
-            username=self.username,
-            password=self.password,
-            session_id=self.session_id,
-            log_function=self.log
-        )
-
-        if success:
-            self.logged_in = True
-            self.session_valid = True
-            self.log(f"Authentication successful for {self.username}")
-        else:
-            self.log("Authentication failed", logging.ERROR)
-            self.interrupt()
+        self.max_user_iterations = self.iteration_limit(self.user)
+
+        pipeline_settings = CONFIG.get("pipeline", {})
+        self.pipeline_enabled = pipeline_settings.get("enabled", False)
+        self.pipeline = Group()
+        self.pipeline_slots = BoundedSemaphore(pipeline_settings.get("max_in_flight", 2))
+
+    @classmethod
+    def iteration_limit(cls, user_class):
+        """
+        None - без ограничения, иначе scenarios.ProcessMetricsCalculator.max_iterations;
+        в конвейерном режиме по умолчанию общий max_iterations
+        """
+        limit = getattr(user_class, "max_iterations", None)
+        if not limit and CONFIG.get("pipeline", {}).get("enabled", False):
+            limit = CONFIG.get("max_iterations", 1)
+        return limit
 
     def on_start(self):
         """Initialize user session and credentials"""
-        runner = getattr(self, "environment", None)
-        if runner:
-            runner = getattr(runner, "runner", None)
-            self.worker_id = getattr(runner, "worker_id", 0) if runner else 0
-
-        creds = UserPool.get_credentials()
-        self.username = creds["username"]
-        self.password = creds["password"]
-        self.client.verify = False
-        self.establish_session()
+        super().on_start()
+        self._setup_stop_manager()
 
         self.log("User started for dashboard metrics process mining")
 
     def on_stop(self):
         """Clean up when user stops"""
-        self.log("User stopping")
+        self.pipeline.kill()
+        super().on_stop()
 
     @task
     def create_and_upload_pm(self):
         """Основная задача: создание flow с загрузкой файла и отдельного PM flow"""
+        if self.max_user_iterations and self.user_iteration_count >= self.max_user_iterations:
+            # Дожидаемся хвоста конвейера, чтобы итерации успели завершиться
+            self.pipeline.join()
+            self.log(f"User reached iteration limit {self.max_user_iterations} - stopping")
+            self.user.stop()
+            return
+
+        self.user_iteration_count += 1
+        if self.pipeline_enabled:
+            # Ворота допуска освобождает фоновое завершение flow
+            admitted = self._run_admitted(self._start_pipelined_pm, deferred=True)
+        else:
+            admitted = self._run_admitted(self._create_and_upload_pm)
+        if not admitted:
+            self.log("Arrival schedule finished - stopping user")
+            self.user.stop()
+
+    def _create_and_upload_pm(self):
+        """Одна итерация: загрузка файла, PM flow и открытие дашборда"""
 
         if not self.logged_in:
             self.establish_session()
@@ -81,168 +83,241 @@ class ProcessMetricsCalculator(Api):
                 self.log("Failed to establish session", logging.ERROR)
                 return
 
-        self.log("Starting flow creation and upload process")
-
+        iteration_start = time.time()
+        success = False
         try:
-            # 1. Создание flow для загрузки файла
-            flow_name, flow_id = self._create_flow(worker_id=self.worker_id)
-            self.flow_id = flow_id
-
-            if not flow_id:
-                self.log("Failed to create flow", logging.ERROR)
-                return
-
-            self.log(f"File flow created: {flow_name} (ID: {flow_id})")
-
-            # 2. Получение параметров DAG
-            target_connection, target_schema = self._get_dag_import_params(flow_id)
-            if not target_connection or not target_schema:
-                self.log("Missing DAG parameters", logging.ERROR)
-                return
-
-            # 3. Обновление flow перед загрузкой
-            update_resp = self._update_flow(
-                flow_id,
-                flow_name,
-                target_connection,
-                target_schema,
-                file_uploaded=False,
-                count_chunks_val=self.total_chunks,
-            )
-            if not update_resp or not update_resp.ok:
-                self.log("Failed to update flow before upload", logging.ERROR)
-                return
-
-            # 4. Получение ID базы данных пользователя
-            db_id = self._get_user_database_id()
-            if not db_id:
-                self.log("User database not found", logging.ERROR)
-                return
-
-            if self.total_chunks == 0:
-                self.log("No chunks to upload", logging.WARNING)
-                return
-
-            timeout = (
-                CONFIG["upload_control"]["timeout_large"]
-                if self.total_chunks > CONFIG["upload_control"]["chunk_threshold"]
-                else CONFIG["upload_control"]["timeout_small"]
-            )
-
-            # 5. Начало загрузки
-            if not self._start_file_upload(flow_id, db_id, target_schema, self.total_chunks, timeout):
-                return
+            uploaded_flow = self._upload_file_flow()
+            if uploaded_flow:
+                success = self._process_uploaded_flow(uploaded_flow)
 
-            # 6. Загрузка чанков
-            uploaded_chunks = self._upload_chunks(flow_id, db_id, target_schema, self.total_chunks)
-            self.log(f"Chunk upload completed: {uploaded_chunks}/{self.total_chunks} chunks")
-
-            # 7. Финализация загрузки
-            if not self._finalize_file_upload(flow_id, uploaded_chunks, timeout):
+        except Exception as e:
+            self.log(f"Unexpected error in flow processing: {str(e)}", logging.ERROR)
+
+        self._complete_iteration(iteration_start, success=success)
+
+    def _start_pipelined_pm(self, release):
+        """
+        Конвейерная итерация: загрузка выполняется в задаче пользователя,
+        мониторинг обработки, PM и дашборд - в фоновом greenlet, пока
+        пользователь уже грузит следующий файл (не больше max_in_flight flow).
+        Фоновый greenlet работает с копией _flow_view() со своей HTTP-сессией
+        и по окончании вызывает release() ворот допуска.
+        """
+        iteration_start = time.time()
+        if not self.logged_in:
+            self.establish_session()
+            if not self.logged_in:
+                self.log("Failed to establish session", logging.ERROR)
+                self._complete_iteration(iteration_start, success=False)
+                release()
                 return
 
-            # 8. Начало обработки
-            file_run_id = self._start_file_processing(flow_id, target_connection, target_schema,
-                                                 self.total_chunks, timeout)
-            if not file_run_id:
-                return
+        self.pipeline_slots.acquire()
+        PIPELINE_IN_FLIGHT.inc()
+        try:
+            uploaded_flow = self._upload_file_flow()
+        except Exception as e:
+            self.log(f"Unexpected error in flow upload: {str(e)}", logging.ERROR)
+            uploaded_flow = None
 
-            # 9. Мониторинг статуса обработки файла
-            file_processing_start = time.time()
-            success = self._monitor_processing_status(
-                file_run_id, timeout, flow_id, db_id, target_schema,
-                self.total_lines, file_processing_start, is_pm_flow=False
-            )
+        if not uploaded_flow:
+            self._release_pipeline_slot()
+            self._complete_iteration(iteration_start, success=False)
+            release()
+            return
 
-            if not success:
-                self.log("File processing failed", logging.ERROR)
-                return
+        self.pipeline.spawn(self._flow_view()._finish_pipelined_pm, uploaded_flow, iteration_start, release)
 
-            self.log(f"File processing completed successfully for flow {flow_id}")
+    def _finish_pipelined_pm(self, uploaded_flow, iteration_start, release):
+        success = False
+        try:
+            success = self._process_uploaded_flow(uploaded_flow)
+        except Exception as e:
+            self.log(f"Unexpected error in flow processing: {str(e)}", logging.ERROR)
+        finally:
+            self._release_pipeline_slot()
+            self._complete_iteration(iteration_start, success=success)
+            release()
+            self.client.close()
+
+    def _release_pipeline_slot(self):
+        PIPELINE_IN_FLIGHT.dec()
+        self.pipeline_slots.release()
+
+    def _complete_iteration(self, iteration_start, success):
+        """Count a finished iteration (pipelined or not) against max_iterations in StopManager"""
+        self._record_phase("iteration", time.time() - iteration_start, success)
+        if not self.max_user_iterations:
+            return
+        user_finished, global_stop = stop_manager.user_completed_iteration(
+            self.user_id, self.max_user_iterations, self.user.__class__.__name__
+        )
+        self.log(f"Iteration {'SUCCESS' if success else 'FAILED'}")
+
+        if global_stop:
+            stats = stop_manager.get_stats()
+            self._safe_stop_runner(f"All {stats['total_users']} users completed their iterations")
+
+    def _upload_file_flow(self):
+        """
+        Шаги 1-8: flow для загрузки файла, загрузка чанков и запуск обработки.
+        Возвращает параметры загруженного flow или None.
+        """
+        dataset = self._choose_dataset()
+        self.log(
+            f"Starting flow creation and upload process, dataset {dataset['path']}: "
+            f"{dataset['total_chunks']} chunks, {dataset['total_lines']} rows"
+        )
+        upload_start = time.time()
+
+        # 1-4. Готовый flow из пула или создание flow, параметры DAG, обновление и id БД
+        flow = self._prepare_upload_flow(self.total_chunks)
+        if not flow:
+            return None
+
+        flow_name, flow_id, db_id = flow["flow_name"], flow["flow_id"], flow["db_id"]
+        target_connection, target_schema = flow["target_connection"], flow["target_schema"]
+        self.flow_id = flow_id
+        self.log(f"File flow ready: {flow_name} (ID: {flow_id})")
+
+        if self.total_chunks == 0:
+            self.log("No chunks to upload", logging.WARNING)
+            return None
+
+        timeout = upload_timeout(self.dataset)
+
+        # 5. Начало загрузки
+        if not self._start_file_upload(flow_id, db_id, target_schema, self.total_chunks, timeout):
+            return None
+
+        # 6. Загрузка чанков
+        uploaded_chunks = self._upload_chunks(flow_id, db_id, target_schema, self.total_chunks)
+        self.log(f"Chunk upload completed: {uploaded_chunks}/{self.total_chunks} chunks")
+
+        # 7. Финализация загрузки
+        if not self._finalize_file_upload(flow_id, uploaded_chunks, timeout):
+            return None
+
+        # 8. Начало обработки
+        file_run_id = self._start_file_processing(flow_id, target_connection, target_schema,
+                                                  self.total_chunks, timeout)
+        if not file_run_id:
+            return None
+
+        upload_duration = time.time() - upload_start
+        PIPELINE_STAGE_DURATION.labels(stage="upload").observe(upload_duration)
+        self._record_phase("upload", upload_duration)
+        return {
+            "flow_name": flow_name,
+            "flow_id": flow_id,
+            "db_id": db_id,
+            "target_schema": target_schema,
+            "file_run_id": file_run_id,
+            "timeout": timeout,
+            "total_lines": dataset["total_lines"],
+            "dataset": dataset,
+        }
+
+    def _process_uploaded_flow(self, uploaded_flow):
+        """
+        Шаги 9-14: обработка файла, отдельный PM flow и открытие дашборда.
+        Возвращает True, если Process Mining завершился успешно.
+        """
+        flow_name = uploaded_flow["flow_name"]
+        flow_id = uploaded_flow["flow_id"]
+
+        # 9. Мониторинг статуса обработки файла
+        file_processing_start = time.time()
+        success = self._monitor_processing_status(
+            uploaded_flow["file_run_id"], uploaded_flow["timeout"], flow_id,
+            uploaded_flow["db_id"], uploaded_flow["target_schema"],
+            uploaded_flow["total_lines"], file_processing_start, is_pm_flow=False,
+            dataset=uploaded_flow["dataset"]
+        )
+        file_processing_duration = time.time() - file_processing_start
+        PIPELINE_STAGE_DURATION.labels(stage="file_processing").observe(file_processing_duration)
+        self._record_phase("file_processing", file_processing_duration, success)
+
+        if not success:
+            self.log("File processing failed", logging.ERROR)
+            return False
+
+        self.log(f"File processing completed successfully for flow {flow_id}")
+        pm_stage_start = time.time()
+
+        # 10. Получаем параметры для PM блока
+        source_connection, source_schema, storage_connection, compute_connection = self._get_dag_pm_params(flow_id)
+        if not all([source_connection, source_schema, storage_connection, compute_connection]):
+            self.log("Missing PM DAG parameters", logging.ERROR)
+            return False
+
+        # 11. Создаем отдельный flow только с Process Mining блоком
+        self.log("Creating separate Process Mining flow...")
+        table_name = f"Tube_{flow_id}"
+
+        pm_flow_name, pm_flow_id = self._create_pm_flow(
+            worker_id=self.worker_id,
+            source_connection=source_connection,
+            source_schema=source_schema,
+            storage_connection=storage_connection,
+            compute_connection=compute_connection,
+            table_name=table_name,
+            base_flow_name=flow_name
+        )
 
-            # 10. Получаем параметры для PM блока
-            source_connection, source_schema, storage_connection, compute_connection = self._get_dag_pm_params(flow_id)
-            if not all([source_connection, source_schema, storage_connection, compute_connection]):
-                self.log("Missing PM DAG parameters", logging.ERROR)
-                return
+        if not pm_flow_id:
+            self.log("Failed to create Process Mining flow", logging.ERROR)
+            return False
 
-            # 11. Создаем отдельный flow только с Process Mining блоком
-            self.log("Creating separate Process Mining flow...")
-            table_name = f"Tube_{flow_id}"
-
-            pm_flow_name, pm_flow_id = self._create_pm_flow(
-                worker_id=self.worker_id,
-                source_connection=source_connection,
-                source_schema=source_schema,
-                storage_connection=storage_connection,
-                compute_connection=compute_connection,
-                table_name=table_name,
-                base_flow_name=flow_name
-            )
-
-            if not pm_flow_id:
-                self.log("Failed to create Process Mining flow", logging.ERROR)
-                return
+        self.log(f"Successfully created PM flow: {pm_flow_name} (ID: {pm_flow_id})")
+        self.log(f"Process Mining will use existing table: {table_name}")
 
-            self.log(f"Successfully created PM flow: {pm_flow_name} (ID: {pm_flow_id})")
-            self.log(f"Process Mining will use existing table: {table_name}")
+        # 12. Запускаем Process Mining flow
+        self.log(f"Starting Process Mining flow {pm_flow_id}...")
+        pm_run_id = self._start_pm_flow(pm_flow_id, source_connection, source_schema, storage_connection, compute_connection, table_name)
 
-            # 12. Запускаем Process Mining flow
-            self.log(f"Starting Process Mining flow {pm_flow_id}...")
-            pm_run_id = self._start_pm_flow(pm_flow_id, source_connection, source_schema, storage_connection, compute_connection, table_name)
+        if not pm_run_id:
+            self.log("Failed to start Process Mining flow", logging.ERROR)
+            return False
 
-            if not pm_run_id:
-                self.log("Failed to start Process Mining flow", logging.ERROR)
-                return
+        # 13. Мониторинг статуса Process Mining
+        pm_timeout = CONFIG["upload_control"]["pm_timeout"]
+        pm_result = self._monitor_processing_status(
+            pm_run_id, pm_timeout, pm_flow_id, is_pm_flow=True
+        )
+        pm_processing_duration = time.time() - pm_stage_start
+        PIPELINE_STAGE_DURATION.labels(stage="pm_processing").observe(pm_processing_duration)
+        self._record_phase(
+            "pm_processing", pm_processing_duration, isinstance(pm_result, dict) and pm_result.get("success")
+        )
 
-            # 13. Мониторинг статуса Process Mining
-            pm_timeout = CONFIG["upload_control"]["pm_timeout"]
-            pm_result = self._monitor_processing_status(
-                pm_run_id, pm_timeout, pm_flow_id, is_pm_flow=True
-            )
-
-            # 14. Обработка результата PM flow и открытие дашборда
-            if isinstance(pm_result, dict) and pm_result.get("success"):
-                self.log(f"Process Mining completed successfully for flow {pm_flow_id}!")
-
-                # Получаем block_run_ids из результата мониторинга
-                block_run_ids = pm_result.get("block_run_ids", {})
-
-                # Определяем целевой блок
-                target_block_id = "spm_dashboard_creation_v_0_2[0]"
-                block_run_id = block_run_ids.get(target_block_id)
-
-                if block_run_id:
-                    # Получаем URL дашборда из артефактов
-                    self.log(f"Fetching dashboard URL for block {target_block_id}...")
-                    dashboard_url = self._get_dashboard_url_from_artefacts(
-                        pm_flow_id=pm_flow_id,
-                        block_id=target_block_id,
-                        block_run_id=block_run_id,
-                        run_id=pm_run_id
-                    )
-
-                    if dashboard_url:
-                        # Открываем дашборд
-                        self.log(f"Opening dashboard: {dashboard_url}")
-                        dashboard_loaded = self._open_dashboard(dashboard_url)
-
-                        if dashboard_loaded:
-                            self.log(f"Dashboard successfully loaded: {dashboard_url}")
-                        else:
-                            self.log(f"Failed to load dashboard: {dashboard_url}", logging.WARNING)
-                    else:
-                        self.log("Could not retrieve dashboard URL from artefacts", logging.WARNING)
+        # 14. Обработка результата PM flow и открытие дашборда
+        pm_success = isinstance(pm_result, dict) and pm_result.get("success")
+        if pm_success:
+            self.log(f"Process Mining completed successfully for flow {pm_flow_id}!")
+            dashboard_stage_start = time.time()
+
+            # URL дашборда из артефактов блока, запись в registry и run ledger
+            dashboard_url = self._register_pm_dashboard(pm_flow_id, pm_run_id, pm_result, table_name)
+            if dashboard_url:
+                # Открываем дашборд
+                self.log(f"Opening dashboard: {dashboard_url}")
+                dashboard_loaded = self._open_dashboard(dashboard_url)
+
+                if dashboard_loaded:
+                    self.log(f"Dashboard successfully loaded: {dashboard_url}")
                 else:
-                    self.log(f"block_run_id not found for block {target_block_id}", logging.WARNING)
+                    self.log(f"Failed to load dashboard: {dashboard_url}", logging.WARNING)
 
-            elif pm_result is True:
-                # Старый формат ответа (без block_run_ids)
-                self.log(f"Process Mining completed but no block_run_ids available", logging.WARNING)
-            else:
-                self.log(f"Process Mining failed for flow {pm_flow_id}", logging.ERROR)
+            dashboard_duration = time.time() - dashboard_stage_start
+            PIPELINE_STAGE_DURATION.labels(stage="dashboard").observe(dashboard_duration)
+            self._record_phase("dashboard", dashboard_duration)
 
-            self.log(f"Complete process finished. File flow: {flow_name} (ID: {flow_id}), PM flow: {pm_flow_name} (ID: {pm_flow_id})")
+        elif pm_result is True:
+            # Старый формат ответа (без block_run_ids)
+            self.log(f"Process Mining completed but no block_run_ids available", logging.WARNING)
+        else:
+            self.log(f"Process Mining failed for flow {pm_flow_id}", logging.ERROR)
 
-        except Exception as e:
-            self.log(f"Unexpected error in flow processing: {str(e)}", logging.ERROR)
\ No newline at end of file
+        self.log(f"Complete process finished. File flow: {flow_name} (ID: {flow_id}), PM flow: {pm_flow_name} (ID: {pm_flow_id})")
+        return bool(pm_success)
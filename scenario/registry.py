@@ -0,0 +1,86 @@
+"""Registry of scenarios and generation of Locust user classes from config"""
+
+import random
+
+from locust import HttpUser, between, constant, constant_pacing
+
+from common.arrivals import arrival_wait_time
+from config import CONFIG
+from scenario.dashboard_reader import DashboardReader
+from scenario.ingest_only import IngestOnly
+from scenario.load_test import LoadFlow
+from scenario.pm_only import PmOnly
+from scenario.process_metrics import ProcessMetricsCalculator
+
+# Имя сценария в конфиге -> TaskSet. Новые сценарии регистрируются здесь.
+SCENARIOS = {
+    "LoadFlow": LoadFlow,
+    "ProcessMetricsCalculator": ProcessMetricsCalculator,
+    "DashboardReader": DashboardReader,
+    "PmOnly": PmOnly,
+    "IngestOnly": IngestOnly,
+}
+
+DEFAULT_SCENARIOS = {
+    "ProcessMetricsCalculator": {"weight": 1},
+}
+
+
+def exponential(mean):
+    """Exponentially distributed think time with the given mean"""
+    return lambda instance: random.expovariate(1.0 / mean) if mean > 0 else 0
+
+
+def build_wait_time(settings):
+    """Build a Locust wait_time function from a scenario wait_time section"""
+    settings = settings or {"type": "between", "min": 1, "max": 5}
+    wait_type = settings.get("type", "between")
+
+    if wait_type == "between":
+        return between(settings.get("min", 1), settings.get("max", 5))
+    if wait_type == "constant":
+        return constant(settings.get("seconds", 0))
+    if wait_type == "constant_pacing":
+        return constant_pacing(settings.get("seconds", 0))
+    if wait_type == "exponential":
+        return exponential(settings.get("mean", 1))
+    raise ValueError(f"Unknown wait_time type: {wait_type}")
+
+
+def build_user_classes(scenarios=None):
+    """
+    Generate one HttpUser class per enabled scenario: <Name>User.
+    users > 0 gives a fixed user count, otherwise users are split by weight.
+    """
+    if scenarios is None:
+        scenarios = CONFIG.get("scenarios") or DEFAULT_SCENARIOS
+
+    user_classes = {}
+    for name, settings in scenarios.items():
+        settings = settings or {}
+        if not settings.get("enabled", True):
+            continue
+
+        task_set = SCENARIOS.get(name)
+        if task_set is None:
+            raise ValueError(f"Unknown scenario in config: {name}")
+
+        attributes = {
+            "host": CONFIG["api"]["base_url"],
+            "tasks": [task_set],
+            "wait_time": arrival_wait_time(build_wait_time(settings.get("wait_time"))),
+            "max_iterations": settings.get("max_iterations"),
+        }
+        if settings.get("users"):
+            attributes["fixed_count"] = settings["users"]
+        else:
+            attributes["weight"] = settings.get("weight", 1)
+            # weight меняют этапы load_profile, config_weight - всегда вес из конфига
+            attributes["config_weight"] = attributes["weight"]
+
+        class_name = f"{name}User"
+        user_classes[class_name] = type(class_name, (HttpUser,), attributes)
+
+    if not user_classes:
+        raise ValueError("No enabled scenarios in config")
+    return user_classes
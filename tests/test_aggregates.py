@@ -0,0 +1,35 @@
+"""Expected aggregates against SQL Lab values"""
+
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from common import aggregates
+from common.aggregates import aggregate_matches, upload_timezone
+
+MOSCOW = ZoneInfo("Europe/Moscow")
+
+
+def epoch_ms(value, tz):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz).timestamp() * 1000
+
+
+def test_epoch_dates_are_shown_in_the_upload_timezone():
+    actual = epoch_ms("2024-01-01 00:07:00", MOSCOW)
+
+    assert aggregate_matches("2024-01-01 00:07:00", actual, "yyyy-MM-dd HH:mm:ss", MOSCOW)
+    assert not aggregate_matches("2024-01-01 00:07:00", actual, "yyyy-MM-dd HH:mm:ss")
+
+
+def test_upload_timezone_from_config(monkeypatch):
+    monkeypatch.setitem(aggregates.CONFIG, "upload_settings", {"date_convert": True, "default_timezone": "Europe/Moscow"})
+    assert upload_timezone() == MOSCOW
+
+    monkeypatch.setitem(aggregates.CONFIG, "upload_settings", {"date_convert": False, "default_timezone": "Europe/Moscow"})
+    assert upload_timezone() == timezone.utc
+
+
+def test_numbers_and_strings():
+    assert aggregate_matches(10, "10")
+    assert aggregate_matches(0.1 + 0.2, 0.3)
+    assert not aggregate_matches(10, None)
+    assert aggregate_matches("2024-01-01 00:07:00", "2024-01-01T00:07:00.000")
@@ -0,0 +1,97 @@
+"""Chunk selection: slices, volume selections and row cuts"""
+
+from common.csv_utils import cut_rows, scan_csv, select_chunks, slice_chunks
+
+
+def make_chunks(*texts):
+    return [
+        {"chunk_number": number, "chunk_text": text, "size_bytes": len(text)}
+        for number, text in enumerate(texts, 1)
+    ]
+
+
+def test_slice_chunks_prepends_header_to_a_later_slice():
+    chunks = make_chunks("case_id\n1\n", "2\n", b"3\n")
+
+    sliced = list(slice_chunks(iter(chunks), first_chunk=2, header="case_id\n"))
+
+    assert [chunk["chunk_number"] for chunk in sliced] == [1, 2]
+    assert sliced[0]["chunk_text"] == "case_id\n2\n"
+    assert sliced[0]["size_bytes"] == 10
+    assert sliced[1]["chunk_text"] == b"3\n"
+
+
+def test_slice_chunks_header_of_transformed_bytes():
+    chunks = make_chunks("case_id\n1\n", b"72\n")
+
+    sliced = list(slice_chunks(iter(chunks), first_chunk=2, max_chunks=1, header="case_id\n"))
+
+    assert sliced == [{"chunk_number": 1, "chunk_text": b"case_id\n72\n", "size_bytes": 11}]
+
+
+def test_slice_chunks_from_first_chunk_keeps_its_header():
+    chunks = make_chunks("case_id\n1\n", "2\n", "3\n")
+
+    sliced = list(slice_chunks(iter(chunks), first_chunk=1, max_chunks=2, header="case_id\n"))
+
+    assert [chunk["chunk_text"] for chunk in sliced] == ["case_id\n1\n", "2\n"]
+
+
+def test_select_chunks_prepends_header_when_chunk_1_is_skipped():
+    chunks = make_chunks("h\n1\n2\n", "3\n4\n", "5\n6\n")
+
+    selected = list(select_chunks(iter(chunks), [2, 3], header="h\n"))
+
+    assert [chunk["chunk_number"] for chunk in selected] == [1, 2]
+    assert [chunk["chunk_text"] for chunk in selected] == ["h\n3\n4\n", "5\n6\n"]
+    assert selected[0]["size_bytes"] == 6
+
+
+def test_select_chunks_keeps_the_own_header_of_chunk_1():
+    chunks = make_chunks("h\n1\n2\n", "3\n4\n", "5\n6\n")
+
+    selected = list(select_chunks(iter(chunks), [1, 3], header="h\n"))
+
+    assert [chunk["chunk_text"] for chunk in selected] == ["h\n1\n2\n", "5\n6\n"]
+
+
+def test_select_chunks_cuts_to_max_rows():
+    chunks = make_chunks("h\n1\n2\n", "3\n4\n", "5\n6\n")
+
+    selected = list(select_chunks(iter(chunks), [1, 2], header="h\n", max_rows=3))
+
+    assert [chunk["chunk_text"] for chunk in selected] == ["h\n1\n2\n", "3\n"]
+    assert selected[1]["size_bytes"] == 2
+
+
+def test_select_chunks_stops_after_max_rows():
+    chunks = make_chunks("h\n1\n2\n", "3\n4\n")
+
+    selected = list(select_chunks(iter(chunks), [1, 2], header="h\n", max_rows=2))
+
+    assert [chunk["chunk_text"] for chunk in selected] == ["h\n1\n2\n"]
+
+
+def test_cut_rows():
+    assert cut_rows("h\n1\n2\n3\n", 2, has_header=True) == ("h\n1\n2\n", 2)
+    assert cut_rows("1\n2\n", 5) == ("1\n2\n", 2)
+    assert cut_rows("h\n", 1, has_header=True) == ("h\n", 0)
+    assert cut_rows("h", 1, has_header=True) == ("h", 0)
+
+
+def test_cut_rows_without_trailing_newline():
+    assert cut_rows("1\n2\n3", 3) == ("1\n2\n3", 3)
+    assert cut_rows("1\n2\n3", 2) == ("1\n2\n", 2)
+
+
+def test_scan_csv_counts_rows_without_trailing_newline(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("case_id,a\n1,x\n22,y\n333,z", encoding="utf-8")
+
+    info = scan_csv(str(path), chunk_size=1024)
+
+    # Строка без перевода строки в конце файла уходит отдельным последним чанком
+    assert info["chunk_rows"] == [2, 1]
+    assert info["total_lines"] == 3
+    assert info["header"] == "case_id,a\n"
+    assert info["case_id_digits"] == 3
@@ -0,0 +1,96 @@
+"""Data volume selection: chunk numbers and exact row counts of one upload"""
+
+import random
+
+import pytest
+
+from common import dataset as dataset_module
+from common.csv_utils import scan_csv, select_chunks, split_csv_generator
+from common.dataset import parse_size, select_volume
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("case_id,a\n" + "".join(f"{index},value_{index:04d}\n" for index in range(1, 501)), encoding="utf-8")
+    return dict(scan_csv(str(path), chunk_size=1024), path=str(path))
+
+
+def set_volume(monkeypatch, mode, sizes):
+    monkeypatch.setitem(dataset_module.CONFIG, "dataset", {"volume": {"mode": mode, "sizes": sizes}})
+
+
+def uploaded(dataset):
+    """Chunks the upload sends for the selection: (chunk texts, data rows)"""
+    chunks = list(select_chunks(split_csv_generator(dataset["path"], 1024), **dataset["selection"]))
+    texts = [chunk["chunk_text"] for chunk in chunks]
+    rows = sum(text.count("\n") for text in texts) - 1
+    return texts, rows
+
+
+def test_parse_size():
+    assert parse_size("512KB") == 512 * 1024
+    assert parse_size("1.5GB") == int(1.5 * 1024 ** 3)
+    assert parse_size("1000") == 1000
+    assert parse_size(2048) == 2048
+
+
+def test_full_mode_keeps_the_dataset(monkeypatch, dataset):
+    set_volume(monkeypatch, "full", ["1KB"])
+    assert select_volume(dataset) is dataset
+
+
+def test_rows_mode_cuts_exactly(monkeypatch, dataset):
+    set_volume(monkeypatch, "rows", [130])
+
+    selected = select_volume(dataset)
+    texts, rows = uploaded(selected)
+
+    assert selected["total_lines"] == rows == 130
+    assert selected["total_chunks"] == len(texts)
+    assert texts[0].startswith("case_id,a\n")
+    assert texts[-1].endswith("130,value_0130\n")
+
+
+def test_rows_mode_larger_than_the_dataset(monkeypatch, dataset):
+    set_volume(monkeypatch, "rows", [10_000])
+
+    selected = select_volume(dataset)
+
+    assert selected["total_lines"] == uploaded(selected)[1] == 500
+    assert selected["total_chunks"] == dataset["total_chunks"]
+
+
+def test_bytes_mode_takes_whole_chunks(monkeypatch, dataset):
+    set_volume(monkeypatch, "bytes", ["3KB"])
+
+    selected = select_volume(dataset)
+    texts, rows = uploaded(selected)
+
+    assert selected["selection"]["numbers"] == [1, 2, 3]
+    assert selected["size_bytes"] == sum(dataset["chunk_bytes"][:3]) <= 3 * 1024
+    assert selected["total_lines"] == rows == sum(dataset["chunk_rows"][:3])
+
+
+def test_bytes_mode_takes_at_least_one_chunk(monkeypatch, dataset):
+    set_volume(monkeypatch, "bytes", ["1"])
+    assert select_volume(dataset)["selection"]["numbers"] == [1]
+
+
+def test_sample_mode_keeps_header_and_order(monkeypatch, dataset):
+    set_volume(monkeypatch, "sample", [0.5])
+
+    selected = select_volume(dataset, random.Random(1))
+    numbers = selected["selection"]["numbers"]
+    texts, rows = uploaded(selected)
+
+    assert numbers == sorted(numbers)
+    assert len(numbers) == round(0.5 * dataset["total_chunks"])
+    assert texts[0].startswith("case_id,a\n")
+    assert selected["total_lines"] == rows
+
+
+def test_unknown_mode(monkeypatch, dataset):
+    set_volume(monkeypatch, "tail", [1])
+    with pytest.raises(ValueError):
+        select_volume(dataset)
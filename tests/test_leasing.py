@@ -0,0 +1,58 @@
+"""Account lease accounting"""
+
+from common.leasing import CredentialLeasePool
+
+
+def test_acquire_spreads_leases_over_accounts():
+    pool = CredentialLeasePool(3)
+
+    indexes = [pool.acquire()[1] for _ in range(6)]
+
+    assert indexes == [0, 1, 2, 0, 1, 2]
+    assert [pool.active_sessions(index) for index in range(3)] == [2, 2, 2]
+
+
+def test_acquire_prefers_the_least_loaded_account():
+    pool = CredentialLeasePool(3)
+    leases = [pool.acquire() for _ in range(3)]
+    pool.release(leases[1][0])
+
+    assert pool.acquire()[1] == 1
+
+
+def test_cap_per_account():
+    pool = CredentialLeasePool(2, max_sessions_per_account=1)
+
+    assert pool.acquire() is not None
+    assert pool.acquire() is not None
+    assert pool.acquire() is None
+
+
+def test_acquire_a_given_account():
+    pool = CredentialLeasePool(3, max_sessions_per_account=1)
+
+    assert pool.acquire(index=2)[1] == 2
+    assert pool.acquire(index=2) is None
+    # Заданный индекс не сдвигает очередь остальных
+    assert pool.acquire()[1] == 0
+
+
+def test_release():
+    pool = CredentialLeasePool(2, max_sessions_per_account=1)
+    lease_id, index = pool.acquire()
+
+    assert pool.release(lease_id) == index
+    assert pool.release(lease_id) is None
+    assert pool.release("unknown") is None
+    assert pool.active_sessions(index) == 0
+
+
+def test_release_holder():
+    pool = CredentialLeasePool(3)
+    pool.acquire(holder="worker-a")
+    pool.acquire(holder="worker-b")
+    pool.acquire(holder="worker-a")
+
+    assert sorted(pool.release_holder("worker-a")) == [0, 2]
+    assert pool.holders() == {"worker-b"}
+    assert [pool.active_sessions(index) for index in range(3)] == [0, 1, 0]
@@ -0,0 +1,69 @@
+"""Token bucket waits"""
+
+import pytest
+
+from common import ratelimit
+from common.ratelimit import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; time.sleep advances it"""
+    now = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(ratelimit.time, "sleep", sleep)
+    return now, sleeps
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock[1] == []
+
+
+def test_waits_for_the_next_token(clock):
+    bucket = TokenBucket(rate=2, burst=1)
+    bucket.acquire()
+
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock[1] == [pytest.approx(0.5)]
+
+
+def test_queued_requests_reserve_tokens_in_order(clock, monkeypatch):
+    bucket = TokenBucket(rate=4, burst=1)
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits == [0.0, pytest.approx(0.25), pytest.approx(0.5), pytest.approx(0.75)]
+
+
+def test_tokens_refill_up_to_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock[0][0] += 10
+
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_zero_rate_does_not_limit(clock):
+    bucket = TokenBucket(rate=0, burst=1)
+
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+
+
+def test_set_rate(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.acquire()
+    bucket.set_rate(10)
+
+    assert bucket.acquire() == pytest.approx(0.1)
@@ -0,0 +1,51 @@
+"""Local registries: tombstones and pending ledger objects"""
+
+import pytest
+
+from common.registry import LocalRegistry, RunLedger
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return LocalRegistry(str(tmp_path / "tables.jsonl"))
+
+
+def test_load_filters_records(registry):
+    registry.add({"table_name": "Tube_1", "username": "user_1"})
+    registry.add({"table_name": "Tube_2", "username": "user_2"})
+
+    assert [record["table_name"] for record in registry.load(username="user_2")] == ["Tube_2"]
+
+
+def test_remove_hides_only_earlier_records(registry):
+    registry.add({"table_name": "Tube_1", "schema": "a"})
+    registry.add({"table_name": "Tube_1", "schema": "b"})
+    registry.add({"table_name": "Tube_2", "schema": "a"})
+    registry.remove(table_name="Tube_1", schema="a")
+    registry.remove(table_name="Tube_2")
+    registry.add({"table_name": "Tube_2", "schema": "c"})
+
+    assert [(record["table_name"], record["schema"]) for record in registry.load()] == [
+        ("Tube_1", "b"),
+        ("Tube_2", "c"),
+    ]
+
+
+def test_load_skips_broken_lines(registry):
+    registry.add({"table_name": "Tube_1"})
+    with open(registry.path, "a", encoding="utf-8") as file:
+        file.write('{"table_name": "Tu')
+
+    assert len(registry.load()) == 1
+
+
+def test_pending_by_worker(tmp_path):
+    ledger = RunLedger(str(tmp_path / "ledger.jsonl"))
+    ledger.run_id = "run"
+    ledger.add({"run_id": "run", "worker": 0, "kind": "flow", "object_id": 1})
+    ledger.add({"run_id": "run", "worker": 1, "kind": "flow", "object_id": 2})
+    ledger.add({"run_id": "run", "worker": 1, "kind": "flow", "object_id": 3})
+    ledger.mark_deleted({"run_id": "run", "kind": "flow", "object_id": 3})
+
+    assert [record["object_id"] for record in ledger.pending("run")] == [1, 2]
+    assert [record["object_id"] for record in ledger.pending("run", worker=1)] == [2]
@@ -0,0 +1,120 @@
+"""Cross-run comparison: statistical helpers and compare_runs verdicts"""
+
+import math
+import time
+
+import pytest
+
+from common.results import INSERT_PHASES, ResultsStore, compare_runs, mann_whitney_u, percentile, two_proportion_p
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(str(tmp_path / "results.sqlite"))
+
+
+def add_samples(store, run_id, phase, durations, failures=0):
+    rows = [(run_id, "LoadFlow", phase, duration, 1, time.time()) for duration in durations]
+    rows += [(run_id, "LoadFlow", phase, 0.0, 0, time.time())] * failures
+    store._write(rows)
+
+
+def test_writer_thread_stores_rows_and_drops_failed_batches(store):
+    store._submit(INSERT_PHASES, [("run", "LoadFlow", "iteration", 1.0, 1, time.time())])
+    store._submit("INSERT INTO missing_table VALUES (?)", [(1,)])
+    store._submit(INSERT_PHASES, [("run", "LoadFlow", "iteration", 2.0, 0, time.time())])
+    store.drain()
+
+    assert store.phase_samples("run") == {"iteration": ([1.0], 1, 2)}
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 100) == 4
+
+
+def test_mann_whitney_u_needs_two_samples_per_group():
+    assert mann_whitney_u([1.0], [1.0, 2.0]) is None
+
+
+def test_mann_whitney_u_separated_groups():
+    # scipy.stats.mannwhitneyu(..., method="asymptotic") gives 0.01219
+    assert mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]) == pytest.approx(0.01219, abs=1e-4)
+
+
+def test_mann_whitney_u_identical_groups():
+    assert mann_whitney_u([1, 2, 3, 4], [1, 2, 3, 4]) == pytest.approx(1.0)
+    assert mann_whitney_u([5, 5, 5], [5, 5, 5]) == 1.0
+
+
+def test_two_proportion_p():
+    assert two_proportion_p(0, 0, 5, 10) is None
+    assert two_proportion_p(10, 10, 10, 10) == 1.0
+    assert two_proportion_p(90, 100, 70, 100) == pytest.approx(math.erfc(0.2 / math.sqrt(0.0032) / math.sqrt(2)))
+    assert two_proportion_p(90, 100, 70, 100) == pytest.approx(0.000407, abs=1e-5)
+
+
+def test_compare_runs_same_durations_is_ok(store):
+    add_samples(store, "base", "iteration", [1.0, 1.1, 1.2, 1.3, 1.4])
+    add_samples(store, "cand", "iteration", [1.0, 1.1, 1.2, 1.3, 1.4])
+
+    rows, regressions = compare_runs(store, "base", "cand")
+
+    assert regressions == 0
+    assert rows[0]["verdict"] == "ok"
+    assert rows[0]["change"] == 0
+
+
+def test_compare_runs_slower_candidate_regresses(store):
+    add_samples(store, "base", "iteration", [1.0 + i / 100 for i in range(20)])
+    add_samples(store, "cand", "iteration", [2.0 + i / 100 for i in range(20)])
+
+    rows, regressions = compare_runs(store, "base", "cand")
+
+    assert regressions == 1
+    assert rows[0]["verdict"] == "REGRESSION"
+    assert rows[0]["change"] > 0.9
+
+
+def test_compare_runs_faster_candidate_improves(store):
+    add_samples(store, "base", "iteration", [2.0 + i / 100 for i in range(20)])
+    add_samples(store, "cand", "iteration", [1.0 + i / 100 for i in range(20)])
+
+    rows, regressions = compare_runs(store, "base", "cand")
+
+    assert regressions == 0
+    assert rows[0]["verdict"] == "improvement"
+
+
+def test_compare_runs_candidate_with_only_failures_regresses(store):
+    add_samples(store, "base", "dashboard", [1.0, 1.1, 1.2])
+    add_samples(store, "cand", "dashboard", [], failures=3)
+
+    rows, regressions = compare_runs(store, "base", "cand")
+
+    assert regressions == 1
+    assert rows[0]["candidate_median"] is None
+    assert rows[0]["change"] is None
+    assert rows[0]["verdict"] == "REGRESSION"
+
+
+def test_compare_runs_lower_success_rate_regresses(store):
+    add_samples(store, "base", "iteration", [1.0] * 50)
+    add_samples(store, "cand", "iteration", [1.0] * 30, failures=20)
+
+    rows, regressions = compare_runs(store, "base", "cand")
+
+    assert regressions == 1
+    assert rows[0]["candidate_success"] == pytest.approx(0.6)
+
+
+def test_compare_runs_skips_phases_missing_in_one_run(store):
+    add_samples(store, "base", "iteration", [1.0, 1.1])
+    add_samples(store, "base", "pm_processing", [1.0, 1.1])
+    add_samples(store, "cand", "iteration", [1.0, 1.1])
+
+    rows, _ = compare_runs(store, "base", "cand")
+
+    assert [row["phase"] for row in rows] == ["iteration"]
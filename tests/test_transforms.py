@@ -0,0 +1,38 @@
+"""case_id prefix transform and its range check"""
+
+import pytest
+
+from common import transforms
+from common.transforms import chunk_transform, prefix_case_ids
+
+
+@pytest.fixture
+def prefix_on(monkeypatch):
+    monkeypatch.setitem(transforms.CONFIG, "upload_transform", {"case_id_prefix": True})
+    monkeypatch.setitem(transforms.CONFIG, "upload_columns", [{"column_name": "case_id", "column_type": "int"}])
+
+
+def test_prefix_case_ids_keeps_header_and_trailing_newline():
+    data = b"case_id,a\n1,x\n22,y\n"
+    assert prefix_case_ids(data, b"7", has_header=True) == b"case_id,a\n71,x\n722,y\n"
+    assert prefix_case_ids(b"1,x\n22,y", b"7") == b"71,x\n722,y"
+
+
+def test_chunk_transform_off_by_default(monkeypatch):
+    monkeypatch.setitem(transforms.CONFIG, "upload_transform", {})
+    assert chunk_transform(12, {"case_id_digits": 4}) is None
+
+
+def test_chunk_transform_checks_int_range(prefix_on):
+    assert chunk_transform(12345, {"case_id_digits": 4}) is not None
+    with pytest.raises(ValueError):
+        chunk_transform(123456, {"case_id_digits": 4})
+
+
+def test_chunk_transform_max_digits_from_config(prefix_on, monkeypatch):
+    monkeypatch.setitem(transforms.CONFIG, "upload_transform", {"case_id_prefix": True, "case_id_max_digits": 18})
+    transform = chunk_transform(1000009, {"case_id_digits": 6})
+
+    chunk = transform({"chunk_number": 2, "chunk_text": "5,x\n", "size_bytes": 4})
+    assert chunk["chunk_text"] == b"10000095,x\n"
+    assert chunk["size_bytes"] == 11